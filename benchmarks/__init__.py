@@ -0,0 +1,55 @@
+"""Standalone performance benchmarks.
+
+Each module is a script run from the project root, e.g.::
+
+    python -m benchmarks.checkout --threads 16
+
+Benchmarks run against a throwaway test database created the same way the
+test runner creates one, so they never touch ``db.sqlite3``.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    # A benchmark is one client sending thousands of requests; rate limits
+    # would turn most of them into 429s. benchmarks.throttling measures them.
+    os.environ.setdefault("THROTTLE_ENABLED", "false")
+    # Nor should thousands of request log lines go to the terminal.
+    os.environ.setdefault("REQUEST_LOG_LEVEL", "WARNING")
+    django.setup()
+
+
+@contextmanager
+def test_database(debug: bool | None = False):
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    # Like the test runner, run with DEBUG off by default: no query log, no
+    # debug toolbar. debug=None keeps the DEBUG of the settings profile.
+    setup_test_environment(debug=debug)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer():
+    """Yield a dict whose ``seconds`` key is filled in when the block exits."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
@@ -0,0 +1,219 @@
+"""WSGI vs. ASGI deployment of the borrowing endpoints under many clients.
+
+    python -m benchmarks.asgi --clients 500 --requests 5000 --wsgi-threads 32
+
+Each deployment runs in its own process with the production profile against
+a file-backed SQLite test database, served in-process through httpx's WSGI
+and ASGI transports. The WSGI run models a threaded server: every client
+has to wait for one of --wsgi-threads workers. The ASGI run routes to
+borrowings.async_views (it sets ASYNC_VIEWS=true) and serves
+all clients from one event loop. Every client sends its share of requests
+back to back. The traffic is a mix of borrowing list, borrowing detail and
+checkout calls, and latency includes the time spent waiting for a worker.
+The production profile needs CACHE_URL to name a Redis or memcached server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks import setup, test_database, timer
+
+DEPLOYMENTS = {"wsgi": "false", "asgi": "true"}
+BASE_URL = "http://testserver"
+
+
+def seed(books: int) -> dict:
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from books.models import Book
+    from borrowings.models import Borrowing
+    from users.serializers import TokenObtainPairSerializer
+
+    user = get_user_model().objects.create_user("user@bench.com", "bench-password")
+    book_ids = seed_books(books)
+    seed_borrowings(books * 5, book_ids, seed_users(99) + [user.id])
+    Book.objects.filter(id__in=book_ids[:100]).update(inventory=1_000_000)
+
+    token = TokenObtainPairSerializer.get_token(user).access_token
+    header = jwt_settings.AUTH_HEADER_NAME.removeprefix("HTTP_").replace("_", "-").title()
+    return {
+        "headers": {header: f"Bearer {token}"},
+        "book_ids": book_ids[:100],
+        "borrowing_ids": list(
+            Borrowing.objects.filter(user=user).values_list("id", flat=True)[:100]
+        ),
+    }
+
+
+def build_requests(fixtures: dict, count: int, write_ratio: float) -> list[tuple]:
+    from django.urls import reverse
+
+    expected_return_date = str(date.today() + timedelta(days=14))
+    writes_every = round(1 / write_ratio) if write_ratio else 0
+    requests = []
+    for i in range(count):
+        if writes_every and i % writes_every == 0:
+            book_id = fixtures["book_ids"][i % len(fixtures["book_ids"])]
+            requests.append((
+                "POST",
+                reverse("borrowings:borrowing-list-create"),
+                {"book": book_id, "expected_return_date": expected_return_date},
+            ))
+        elif i % 2:
+            borrowing_id = fixtures["borrowing_ids"][i % len(fixtures["borrowing_ids"])]
+            requests.append(("GET", reverse("borrowings:borrowing-detail", args=[borrowing_id]), None))
+        else:
+            requests.append(("GET", reverse("borrowings:borrowing-list-create"), None))
+    return requests
+
+
+def summarize(latencies: list[float], statuses: dict, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "latency_ms": {
+            "p50": round(quantiles[49] * 1000, 1),
+            "p95": round(quantiles[94] * 1000, 1),
+            "p99": round(quantiles[98] * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1),
+        },
+    }
+
+
+def run_wsgi(requests: list[tuple], headers: dict, clients: int, wsgi_threads: int) -> dict:
+    import httpx
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    workers = threading.Semaphore(wsgi_threads)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client(share: list[tuple]) -> None:
+        transport = httpx.WSGITransport(app=application)
+        with httpx.Client(transport=transport, base_url=BASE_URL, headers=headers) as http:
+            for method, path, data in share:
+                start = time.perf_counter()
+                with workers:
+                    response = http.request(method, path, json=data)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    with timer() as elapsed:
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(client, [requests[i::clients] for i in range(clients)]))
+    return summarize(latencies, statuses, elapsed["seconds"])
+
+
+def run_asgi(requests: list[tuple], headers: dict, clients: int) -> dict:
+    import httpx
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+    latencies = []
+    statuses = {}
+
+    async def client(http: httpx.AsyncClient, share: list[tuple]) -> None:
+        for method, path, data in share:
+            start = time.perf_counter()
+            response = await http.request(method, path, json=data)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def main() -> None:
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(
+            transport=transport, base_url=BASE_URL, headers=headers
+        ) as http:
+            await asyncio.gather(*(client(http, requests[i::clients]) for i in range(clients)))
+
+    with timer() as elapsed:
+        asyncio.run(main())
+    return summarize(latencies, statuses, elapsed["seconds"])
+
+
+def run_worker(args) -> None:
+    setup()
+    from django.conf import settings
+    from django.db import connections
+
+    with tempfile.TemporaryDirectory() as directory:
+        connections["default"].settings_dict["TEST"]["NAME"] = str(
+            Path(directory) / "bench.sqlite3"
+        )
+        with test_database():
+            fixtures = seed(args.books)
+            requests = build_requests(fixtures, args.requests, args.write_ratio)
+            connections.close_all()
+            if settings.ASYNC_VIEWS:
+                result = run_asgi(requests, fixtures["headers"], args.clients)
+            else:
+                result = run_wsgi(requests, fixtures["headers"], args.clients, args.wsgi_threads)
+            print(json.dumps({
+                "deployment": "asgi" if settings.ASYNC_VIEWS else "wsgi",
+                "clients": args.clients,
+                **({} if settings.ASYNC_VIEWS else {"wsgi_threads": args.wsgi_threads}),
+                **result,
+            }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--wsgi-threads", type=int, default=32)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--deployments", nargs="+", choices=DEPLOYMENTS, default=list(DEPLOYMENTS))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+    if not os.getenv("CACHE_URL"):
+        parser.error("the production profile needs CACHE_URL, e.g. redis://localhost:6379/1")
+
+    for deployment in args.deployments:
+        output = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.asgi", "--worker",
+                "--clients", str(args.clients),
+                "--requests", str(args.requests),
+                "--wsgi-threads", str(args.wsgi_threads),
+                "--write-ratio", str(args.write_ratio),
+                "--books", str(args.books),
+            ],
+            env={
+                **os.environ,
+                "DJANGO_ENV": "production",
+                "ASYNC_VIEWS": DEPLOYMENTS[deployment],
+            },
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        print(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Catalog search latency: full-text index vs. a LIKE '%term%' scan.
+
+    python -m benchmarks.book_search --books 500000
+
+Times `search_books` (the query behind `/api/books/?search=`) for the first
+page of results, with and without the matching COUNT the paginator runs,
+against an equivalent `icontains` filter.
+"""
+import argparse
+import json
+import statistics
+
+from benchmarks import setup, test_database, timer
+
+QUERIES = ("dragon", "silver moon", "tanaka", "mid", "forgotten kingdom winter")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=500_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import Q
+
+    from benchmarks.seed import seed_books
+    from books.models import Book
+    from books.search import search_books, search_terms
+
+    def like(query: str):
+        queryset = Book.objects.all()
+        for term in search_terms(query):
+            queryset = queryset.filter(Q(title__icontains=term) | Q(author__icontains=term))
+        return queryset
+
+    def measure(build, query: str) -> dict:
+        page, total = [], []
+        for _ in range(args.repeat):
+            queryset = build(query)
+            with timer() as elapsed:
+                list(queryset[: args.page_size])
+            page.append(elapsed["seconds"] * 1000)
+            with timer() as elapsed:
+                queryset.count()
+            total.append(elapsed["seconds"] * 1000)
+        return {
+            "page_ms": round(statistics.median(page), 2),
+            "count_ms": round(statistics.median(total), 2),
+        }
+
+    with test_database():
+        with timer() as seeded:
+            seed_books(args.books)
+        print(json.dumps({"seeded_books": args.books, "seconds": round(seeded["seconds"], 2)}))
+
+        for query in QUERIES:
+            print(json.dumps({
+                "query": query,
+                "matches": search_books(Book.objects.all(), query).count(),
+                "full_text": measure(lambda q: search_books(Book.objects.all(), q), query),
+                "like": measure(like, query),
+            }))
+
+
+if __name__ == "__main__":
+    main()
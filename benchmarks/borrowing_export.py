@@ -0,0 +1,68 @@
+"""Borrowing export throughput and peak memory by result size.
+
+    python -m benchmarks.borrowing_export --rows 1000000
+
+Streams `/api/borrowings/export/` for a staff user after each seeding step
+and reports the Python heap peak (tracemalloc) while the body is consumed.
+A streaming export keeps that peak flat as the row count grows. Tracing
+slows Python down several times over, so compare rows_per_second between
+steps rather than against other benchmarks.
+"""
+import argparse
+import json
+import tracemalloc
+
+from benchmarks import setup, test_database, timer
+
+STEPS = (10_000, 100_000, 1_000_000)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from borrowings.views import BorrowingExportView
+
+    view = BorrowingExportView.as_view()
+    factory = APIRequestFactory()
+
+    with test_database():
+        user_ids = seed_users(100)
+        book_ids = seed_books(1_000)
+        staff = get_user_model().objects.get(id=user_ids[-1])
+
+        seeded = 0
+        for step in STEPS:
+            step = min(step, args.rows)
+            if step <= seeded:
+                break
+            seed_borrowings(step - seeded, book_ids, user_ids, seed=step)
+            seeded = step
+
+            request = factory.get("/api/borrowings/export/", {"export_format": args.format})
+            force_authenticate(request, staff)
+            tracemalloc.start()
+            with timer() as elapsed:
+                response = view(request)
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(json.dumps({
+                "rows": seeded,
+                "seconds": round(elapsed["seconds"], 2),
+                "rows_per_second": round(seeded / elapsed["seconds"]),
+                "megabytes": round(size / 2**20, 1),
+                "peak_heap_mb": round(peak / 2**20, 2),
+            }))
+
+
+if __name__ == "__main__":
+    main()
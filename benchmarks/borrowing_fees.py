@@ -0,0 +1,48 @@
+"""Fee totals computed by the database vs. summed in Python.
+
+    python -m benchmarks.borrowing_fees --rows 1000000
+
+The Python side iterates borrowings with their book and calls
+`calculate_fees()` on each, which is what the totals would cost without
+database annotations.
+"""
+import argparse
+import json
+from datetime import date
+
+from benchmarks import setup, test_database, timer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    setup()
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from borrowings.fees import calculate_fees, fee_totals
+    from borrowings.models import Borrowing
+
+    today = date(2023, 1, 1)
+    with test_database():
+        seed_borrowings(args.rows, seed_books(1_000), seed_users(100))
+
+        with timer() as database:
+            totals = fee_totals(Borrowing.objects.all(), today)
+        with timer() as python:
+            total = sum(
+                calculate_fees(borrowing, today).total_fee
+                for borrowing in Borrowing.objects.select_related("book").iterator(chunk_size=2000)
+            )
+        assert total == totals["total_fee"], (total, totals)
+
+        print(json.dumps({
+            "rows": args.rows,
+            "total_fee": str(totals["total_fee"]),
+            "database_seconds": round(database["seconds"], 2),
+            "python_seconds": round(python["seconds"], 2),
+        }))
+
+
+if __name__ == "__main__":
+    main()
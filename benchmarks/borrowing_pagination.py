@@ -0,0 +1,88 @@
+"""Borrowing list latency by page depth: keyset cursor vs. LIMIT/OFFSET.
+
+    python -m benchmarks.borrowing_pagination --rows 1000000 --page-size 100
+
+Both paginators run behind `BorrowingListView` for a staff user. The keyset
+cursor for page N is computed up front (untimed), which is exactly what a
+client following `next` links would hold.
+"""
+import argparse
+import json
+import statistics
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks import setup, test_database, timer
+
+PAGES = (1, 10, 100, 1_000, 10_000)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework.pagination import Cursor, LimitOffsetPagination
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from borrowings.models import Borrowing
+    from borrowings.pagination import BorrowingCursorPagination
+    from borrowings.views import BorrowingListView
+
+    class OffsetBorrowingListView(BorrowingListView):
+        pagination_class = LimitOffsetPagination
+
+    keyset_view = BorrowingListView.as_view()
+    offset_view = OffsetBorrowingListView.as_view()
+    factory = APIRequestFactory()
+
+    with test_database():
+        user_ids = seed_users(100)
+        book_ids = seed_books(1_000)
+        with timer() as seeded:
+            seed_borrowings(args.rows, book_ids, user_ids)
+        staff = get_user_model().objects.get(id=user_ids[-1])
+        print(json.dumps({"seeded_rows": args.rows, "seconds": round(seeded["seconds"], 2)}))
+
+        def measure(view, params: dict) -> float:
+            samples = []
+            for _ in range(args.repeat):
+                request = factory.get("/api/borrowings/", params)
+                force_authenticate(request, staff)
+                with timer() as elapsed:
+                    response = view(request)
+                    response.render()
+                assert response.status_code == 200, response.content
+                samples.append(elapsed["seconds"] * 1000)
+            return round(statistics.median(samples), 2)
+
+        paginator = BorrowingCursorPagination()
+        paginator.base_url = "/api/borrowings/"
+        for page in PAGES:
+            offset = (page - 1) * args.page_size
+            if offset >= args.rows:
+                break
+
+            keyset_params = {"page_size": args.page_size}
+            if offset:
+                anchor = Borrowing.objects.order_by("borrow_date", "id")[offset - 1]
+                url = paginator.encode_cursor(
+                    Cursor(offset=0, reverse=False, position=paginator._get_position(anchor))
+                )
+                keyset_params["cursor"] = parse_qs(urlparse(url).query)["cursor"][0]
+
+            print(json.dumps({
+                "page": page,
+                "keyset_ms": measure(keyset_view, keyset_params),
+                "offset_ms": measure(
+                    offset_view, {"limit": args.page_size, "offset": offset}
+                ),
+            }))
+
+
+if __name__ == "__main__":
+    main()
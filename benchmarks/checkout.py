@@ -0,0 +1,123 @@
+"""Checkout throughput: read-modify-write inventory vs. guarded reservation.
+
+    python -m benchmarks.checkout --threads 16 --checkouts 2000 --inventory 1000
+
+The "legacy" strategy is the code `CreateBorrowingSerializer` used to run:
+read the book, decrement `inventory` in Python and `save()` it. Besides
+throughput the report shows how many checkouts it let through beyond the
+stock that was actually available.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks import setup, test_database, timer
+
+
+def legacy_checkout(book_id: int, user_id: int) -> bool:
+    from django.db import transaction
+
+    from books.models import Book
+    from borrowings.models import Borrowing
+
+    with transaction.atomic():
+        book = Book.objects.get(pk=book_id)
+        if book.inventory == 0:
+            return False
+        book.inventory -= 1
+        book.save()
+        Borrowing.objects.create(
+            book=book,
+            user_id=user_id,
+            expected_return_date=date.today() + timedelta(days=14),
+        )
+    return True
+
+
+def reserved_checkout(book_id: int, user_id: int) -> bool:
+    from django.db import transaction
+
+    from books.models import Book
+    from borrowings.models import Borrowing
+
+    with transaction.atomic():
+        if not Book.objects.filter(pk=book_id).reserve():
+            return False
+        Borrowing.objects.create(
+            book_id=book_id,
+            user_id=user_id,
+            expected_return_date=date.today() + timedelta(days=14),
+        )
+    return True
+
+
+STRATEGIES = {"legacy": legacy_checkout, "reserve": reserved_checkout}
+
+
+def run(strategy: str, threads: int, checkouts: int, inventory: int) -> dict:
+    from django.contrib.auth import get_user_model
+    from django.db import OperationalError, connection
+
+    from books.models import Book
+    from borrowings.models import Borrowing
+
+    checkout = STRATEGIES[strategy]
+    book = Book.objects.create(
+        title=f"{strategy} title", author="Author", inventory=inventory, daily_fee=1
+    )
+    user = get_user_model().objects.create(email=f"{strategy}@bench.com")
+    borrowed_before = Borrowing.objects.count()
+
+    def worker(count: int) -> tuple[int, int]:
+        succeeded = retries = 0
+        try:
+            for _ in range(count):
+                while True:
+                    try:
+                        succeeded += checkout(book.id, user.id)
+                        break
+                    except OperationalError:
+                        retries += 1
+                        time.sleep(0.0005)
+        finally:
+            connection.close()
+        return succeeded, retries
+
+    shares = [checkouts // threads + (i < checkouts % threads) for i in range(threads)]
+    with timer() as elapsed:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(worker, shares))
+
+    book.refresh_from_db()
+    succeeded = sum(result[0] for result in results)
+    borrowed = Borrowing.objects.count() - borrowed_before
+    return {
+        "strategy": strategy,
+        "threads": threads,
+        "attempts": checkouts,
+        "succeeded": succeeded,
+        "lock_retries": sum(result[1] for result in results),
+        "seconds": round(elapsed["seconds"], 3),
+        "checkouts_per_second": round(checkouts / elapsed["seconds"], 1),
+        "oversold": max(borrowed - inventory, 0),
+        "lost_inventory_updates": borrowed - (inventory - book.inventory),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--checkouts", type=int, default=2000)
+    parser.add_argument("--inventory", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        for strategy in STRATEGIES:
+            print(json.dumps(run(strategy, args.threads, args.checkouts, args.inventory)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Circulation dashboard: summary table vs. GROUP BY over borrowings.
+
+    python -m benchmarks.circulation --rows 1000000 --books 1000
+
+Times one full read of the per-book statistics from BookCirculation and
+the same statistics aggregated from the borrowings table on the fly.
+"""
+import argparse
+import json
+import statistics
+
+from benchmarks import setup, test_database, timer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--books", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import Count, Max, Q
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from borrowings.circulation import rebuild_circulation
+    from borrowings.models import BookCirculation, Borrowing
+
+    def median_ms(read) -> float:
+        samples = []
+        for _ in range(args.repeat):
+            with timer() as elapsed:
+                read()
+            samples.append(elapsed["seconds"] * 1000)
+        return round(statistics.median(samples), 1)
+
+    with test_database():
+        seed_borrowings(args.rows, seed_books(args.books), seed_users(100))
+        with timer() as rebuilt:
+            rebuild_circulation()
+
+        print(json.dumps({
+            "rows": args.rows,
+            "books": args.books,
+            "rebuild_seconds": round(rebuilt["seconds"], 2),
+            "summary_table_ms": median_ms(
+                lambda: list(BookCirculation.objects.select_related("book"))
+            ),
+            "group_by_ms": median_ms(
+                lambda: list(
+                    Borrowing.objects.order_by()
+                    .values("book_id")
+                    .annotate(
+                        total_borrows=Count("id"),
+                        currently_out=Count("id", filter=Q(actual_return_date__isnull=True)),
+                        last_borrowed=Max("borrow_date"),
+                    )
+                )
+            ),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Catalog import throughput for `manage.py import_books`.
+
+    python -m benchmarks.import_books --books 1000000
+
+Writes a synthetic CSV (or JSONL) file, imports it into an empty catalog,
+then imports it again so every row goes down the update path.
+"""
+import argparse
+import csv
+import json
+import random
+import resource
+import tempfile
+from pathlib import Path
+
+from benchmarks import setup, test_database, timer
+
+
+def write_catalog(path: Path, count: int, file_format: str) -> None:
+    from benchmarks.seed import SURNAMES, WORDS
+
+    rng = random.Random(0)
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if file_format == "csv":
+            writer.writerow(["title", "author", "cover", "inventory", "daily_fee"])
+        for i in range(count):
+            row = [
+                f"{' '.join(rng.sample(WORDS, 3)).title()} {i}",
+                f"{rng.choice(WORDS).title()} {rng.choice(SURNAMES)}",
+                rng.choice(["Hard", "Soft"]),
+                rng.randrange(0, 20),
+                f"{rng.uniform(0.5, 5):.2f}",
+            ]
+            if file_format == "csv":
+                writer.writerow(row)
+            else:
+                keys = ("title", "author", "cover", "inventory", "daily_fee")
+                file.write(json.dumps(dict(zip(keys, row))) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+
+    with tempfile.TemporaryDirectory() as directory, test_database():
+        path = Path(directory) / f"catalog.{args.format}"
+        write_catalog(path, args.books, args.format)
+
+        for phase in ("insert", "update"):
+            with timer() as elapsed:
+                call_command("import_books", str(path), batch_size=args.batch_size)
+            print(json.dumps({
+                "phase": phase,
+                "books": args.books,
+                "seconds": round(elapsed["seconds"], 1),
+                "rows_per_second": round(args.books / elapsed["seconds"]),
+                "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+            }))
+
+
+if __name__ == "__main__":
+    main()
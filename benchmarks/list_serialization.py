@@ -0,0 +1,71 @@
+"""List serialization: ModelSerializer vs. the values_list() field plan.
+
+    python -m benchmarks.list_serialization --rows 10000
+
+Serializes and renders the same 10k-row response both ways, for borrowings
+(with the list view's select_related) and for books, and checks that the
+rendered JSON is byte-identical. Both sides query the database on every
+repeat, as a request would.
+"""
+import argparse
+import json
+import statistics
+
+from benchmarks import setup, test_database, timer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from books.models import Book
+    from books.serializers import BookSerializer
+    from borrowings.models import Borrowing
+    from borrowings.serializers import BorrowingListSerializer
+    from config.field_plans import compile_field_plan
+
+    renderer = JSONRenderer()
+
+    def median_ms(render) -> tuple[float, bytes]:
+        samples = []
+        for _ in range(args.repeat):
+            with timer() as elapsed:
+                content = render()
+            samples.append(elapsed["seconds"] * 1000)
+        return round(statistics.median(samples), 1), content
+
+    with test_database():
+        seed_borrowings(args.rows, seed_books(args.rows), seed_users(100))
+        cases = {
+            "borrowings": (
+                Borrowing.objects.select_related("book", "user"), BorrowingListSerializer
+            ),
+            "books": (Book.objects.all(), BookSerializer),
+        }
+        for name, (queryset, serializer_class) in cases.items():
+            queryset = queryset[: args.rows]
+            plan = compile_field_plan(serializer_class)
+            serializer_ms, expected = median_ms(
+                lambda: renderer.render(serializer_class(queryset.all(), many=True).data)
+            )
+            plan_ms, content = median_ms(
+                lambda: renderer.render(plan.serialize(plan.values(queryset)))
+            )
+            assert content == expected, name
+            print(json.dumps({
+                "list": name,
+                "rows": args.rows,
+                "serializer_ms": serializer_ms,
+                "field_plan_ms": plan_ms,
+                "speedup": round(serializer_ms / plan_ms, 1),
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Throughput of `process_overdue` for a large backlog of overdue borrowings.
+
+    python -m benchmarks.overdue --rows 100000 --users 10000
+
+Seeds open borrowings that are all past due, runs the job once (every row
+reminded), then again (nothing left to do) to show the cost of a rerun.
+"""
+import argparse
+import json
+from datetime import date
+
+from benchmarks import setup, test_database, timer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from borrowings.overdue import process_overdue
+
+    with test_database():
+        user_ids = seed_users(args.users)
+        book_ids = seed_books(1_000)
+        seed_borrowings(args.rows, book_ids, user_ids, returned_ratio=0)
+
+        for run in ("first", "rerun"):
+            with CaptureQueriesContext(connection) as queries, timer() as elapsed:
+                report = process_overdue(today=date(2030, 1, 1))
+            print(json.dumps({
+                "run": run,
+                "users": report.users,
+                "borrowings": report.borrowings,
+                "seconds": round(elapsed["seconds"], 2),
+                "queries": len(queries),
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Render time and bytes on the wire: DRF's JSONRenderer vs. config.renderers.
+
+    python -m benchmarks.renderers --rows 10000
+
+Renders the same list data - books, and borrowings with the book and user
+expanded - with DRF's JSONRenderer, the orjson renderer and, if msgpack is
+installed, the MessagePack renderer, and checks that both JSON renderers
+produce identical bytes. Sizes are reported as rendered and compressed the
+way config.middleware.CompressionMiddleware would (gzip, and brotli if
+installed). Only rendering is timed; the data is built once.
+"""
+import argparse
+import json
+import statistics
+
+from benchmarks import setup, test_database, timer
+
+
+def compressed_sizes(content: bytes) -> dict:
+    from django.utils.text import compress_string
+
+    from config.middleware import CompressionMiddleware, brotli
+
+    sizes = {"gzip_bytes": len(compress_string(content))}
+    if brotli is not None:
+        quality = CompressionMiddleware.BROTLI_QUALITY
+        sizes["br_bytes"] = len(brotli.compress(content, quality=quality))
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from books.models import Book
+    from books.serializers import BookSerializer
+    from borrowings.models import Borrowing
+    from borrowings.serializers import BorrowingListSerializer
+    from config.field_plans import compile_field_plan
+    from config.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+
+    renderers = {"drf_json": JSONRenderer(), "orjson": ORJSONRenderer()}
+    if msgpack is not None:
+        renderers["msgpack"] = MessagePackRenderer()
+
+    def median_ms(render) -> tuple[float, bytes]:
+        samples = []
+        for _ in range(args.repeat):
+            with timer() as elapsed:
+                content = render()
+            samples.append(elapsed["seconds"] * 1000)
+        return round(statistics.median(samples), 2), content
+
+    with test_database():
+        seed_borrowings(args.rows, seed_books(args.rows), seed_users(100))
+        plan = compile_field_plan(BookSerializer)
+        cases = {
+            "books": plan.serialize(plan.values(Book.objects.all()[: args.rows])),
+            "borrowings": BorrowingListSerializer(
+                Borrowing.objects.select_related("book", "user")[: args.rows],
+                many=True,
+                expand=("book", "user"),
+            ).data,
+        }
+        for name, data in cases.items():
+            results = {}
+            for renderer_name, renderer in renderers.items():
+                ms, content = median_ms(lambda: renderer.render(data))
+                results[renderer_name] = (ms, content)
+                print(json.dumps({
+                    "list": name,
+                    "rows": args.rows,
+                    "renderer": renderer_name,
+                    "render_ms": ms,
+                    "bytes": len(content),
+                    **compressed_sizes(content),
+                }))
+            assert results["orjson"][1] == results["drf_json"][1], name
+            print(json.dumps({
+                "list": name,
+                "orjson_speedup": round(results["drf_json"][0] / results["orjson"][0], 1),
+            }))
+
+
+if __name__ == "__main__":
+    main()
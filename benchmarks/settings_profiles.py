@@ -0,0 +1,171 @@
+"""Requests per second under the development and production settings profiles.
+
+    python -m benchmarks.settings_profiles --threads 8 --requests 4000
+
+Each profile runs in its own process with DJANGO_ENV set, against a
+file-backed SQLite test database. Requests go straight through the WSGI
+handler with the request_started/request_finished signals intact, so the
+development profile really opens a database connection per request and the
+debug toolbar instruments every one of them. That is what the production
+profile's persistent connections and missing toolbar should save.
+
+The production profile needs CACHE_URL to name a Redis or memcached
+server, as it does in a deployment.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks import setup, test_database, timer
+
+PROFILES = ("development", "production")
+
+
+def seed(books: int) -> dict:
+    from django.contrib.auth import get_user_model
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from users.serializers import TokenObtainPairSerializer
+
+    user = get_user_model().objects.create_user("user@bench.com", "bench-password")
+    book_ids = seed_books(books)
+    seed_borrowings(books * 5, book_ids, seed_users(99) + [user.id])
+    token = TokenObtainPairSerializer.get_token(user).access_token
+    return {"book_id": book_ids[0], "token": str(token)}
+
+
+def build_environ(path: str, token: str) -> dict:
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+    path, _, query = path.partition("?")
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "testserver",
+        "REMOTE_ADDR": "127.0.0.1",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        jwt_settings.AUTH_HEADER_NAME: f"Bearer {token}",
+    }
+
+
+def measure(threads: int, requests: int, books: int) -> dict:
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connections
+    from django.urls import reverse
+
+    fixtures = seed(books)
+    application = get_wsgi_application()
+    paths = [
+        reverse("books:book-list") + "?ordering=title",
+        reverse("books:book-detail", args=[fixtures["book_id"]]),
+        reverse("borrowings:borrowing-list-create"),
+        reverse("users:manage"),
+    ]
+    statuses = {}
+
+    def start_response(status: str, headers: list) -> None:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def worker(count: int) -> None:
+        try:
+            for i in range(count):
+                response = application(
+                    build_environ(paths[i % len(paths)], fixtures["token"]), start_response
+                )
+                try:
+                    b"".join(response)
+                finally:
+                    # Sends request_finished, which closes connections older
+                    # than CONN_MAX_AGE, as a WSGI server would.
+                    response.close()
+        finally:
+            connections.close_all()
+
+    shares = [requests // threads + (i < requests % threads) for i in range(threads)]
+    with timer() as elapsed:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(worker, shares))
+
+    return {
+        "profile": settings.DJANGO_ENV,
+        "debug": settings.DEBUG,
+        "conn_max_age": settings.DATABASES["default"].get("CONN_MAX_AGE", 0),
+        "pragmas": settings.DATABASES["default"].get("PRAGMAS", {}),
+        "threads": threads,
+        "requests": requests,
+        "statuses": statuses,
+        "seconds": round(elapsed["seconds"], 3),
+        "requests_per_second": round(requests / elapsed["seconds"], 1),
+    }
+
+
+def run_worker(args) -> None:
+    setup()
+    from django.db import connections
+
+    with tempfile.TemporaryDirectory() as directory:
+        # An in-memory test database is never closed, which would hide the
+        # cost of opening a connection per request.
+        connections["default"].settings_dict["TEST"]["NAME"] = str(
+            Path(directory) / "bench.sqlite3"
+        )
+        with test_database(debug=None):
+            print(json.dumps(measure(args.threads, args.requests, args.books)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+    if "production" in args.profiles and not os.getenv("CACHE_URL"):
+        parser.error("the production profile needs CACHE_URL, e.g. redis://localhost:6379/1")
+
+    results = []
+    for profile in args.profiles:
+        output = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.settings_profiles", "--worker",
+                "--threads", str(args.threads),
+                "--requests", str(args.requests),
+                "--books", str(args.books),
+            ],
+            env={**os.environ, "DJANGO_ENV": profile},
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+        print(json.dumps(results[-1]))
+
+    if len(results) == 2:
+        speedup = results[1]["requests_per_second"] / results[0]["requests_per_second"]
+        print(json.dumps({"production_speedup": round(speedup, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""Latency, throughput and query counts for every API endpoint.
+
+    python -m benchmarks.suite --scale 100k --output benchmarks/results/100k.json
+    python -m benchmarks.suite --scale 100k --compare benchmarks/results/100k.json
+
+Seeds a throwaway database at the chosen scale (books and borrowings alike),
+then drives each endpoint of the `books`, `users` and `borrowings` URL
+namespaces in-process through the full middleware stack with real JWT
+credentials. Each scenario reports p50/p95/p99 latency, requests per second
+(sequential, so 1 / mean latency) and the median SQL query count.
+
+The run fails if an API route has no scenario, so new endpoints get
+benchmarked too. The admin, the browsable-API login and the debug toolbar
+are not part of the API and are not covered.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from itertools import count
+from pathlib import Path
+from typing import Callable
+
+from benchmarks import setup, test_database, timer
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+API_NAMESPACES = ("books", "users", "borrowings")
+PASSWORD = "Bench-password-1"
+
+
+@dataclass
+class Scenario:
+    url_name: str
+    method: str
+    user: str
+    build: Callable[[int], tuple[str, dict | None]]
+    label: str = ""
+    requests: int | None = None
+    expect: int = 200
+    samples: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return " ".join(filter(None, (self.method, self.url_name, self.label, f"as {self.user}")))
+
+
+def api_url_names() -> set[str]:
+    from django.urls import URLResolver, get_resolver
+
+    names = set()
+
+    def walk(patterns, namespace=None):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, pattern.namespace or namespace)
+            elif namespace in API_NAMESPACES and pattern.name:
+                names.add(f"{namespace}:{pattern.name}")
+
+    walk(get_resolver().url_patterns)
+    return names
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(samples: list[float], percent: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+def build_scenarios(fixtures: dict) -> list[Scenario]:
+    from django.db.models import F
+    from django.urls import reverse
+
+    from benchmarks.seed import WORDS
+    from books.cache import bump_catalog_version
+    from books.models import Book
+    from borrowings.models import BookCirculation, Borrowing, Hold
+
+    user, book_ids = fixtures["user"], fixtures["book_ids"]
+    own_borrowing_ids = fixtures["own_borrowing_ids"]
+    emails = count()
+    disposable = count()
+    due = (date.today() + timedelta(days=14)).isoformat()
+
+    def book(i: int) -> int:
+        return book_ids[i % len(book_ids)]
+
+    def restock(*ids: int) -> None:
+        Book.objects.filter(id__in=ids).update(inventory=F("inventory") + 1)
+
+    def new_borrowings(n: int) -> list[int]:
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(book_id=book(i), user=user, expected_return_date=due) for i in range(n)
+        )
+        BookCirculation.objects.record_checkouts(
+            Counter(borrowing.book_id for borrowing in borrowings), date.today()
+        )
+        return [borrowing.id for borrowing in borrowings]
+
+    def new_book(inventory: int = 1) -> int:
+        return Book.objects.create(
+            title=f"Disposable {next(disposable)}",
+            author="Bench",
+            cover="Soft",
+            inventory=inventory,
+            daily_fee="1.00",
+        ).id
+
+    def new_hold() -> int:
+        return Hold.objects.create(book_id=new_book(inventory=0), user=user).id
+
+    def get(path: str) -> Callable[[int], tuple[str, None]]:
+        return lambda i: (path, None)
+
+    def cold(path: str) -> Callable[[int], tuple[str, None]]:
+        """GET `path` right after a catalog write, so it misses the cache."""
+
+        def build(i: int) -> tuple[str, None]:
+            bump_catalog_version()
+            return path, None
+
+        return build
+
+    def checkout(i: int) -> tuple[str, dict]:
+        restock(book(i))
+        return reverse("borrowings:borrowing-list-create"), {
+            "book": book(i), "expected_return_date": due
+        }
+
+    def bulk_checkout(i: int) -> tuple[str, dict]:
+        ids = [book(i * 5 + n) for n in range(5)]
+        restock(*ids)
+        return reverse("borrowings:borrowing-bulk-create"), {
+            "books": ids, "expected_return_date": due
+        }
+
+    def return_one(i: int) -> tuple[str, dict]:
+        (borrowing_id,) = new_borrowings(1)
+        return reverse("borrowings:return-borrowing", args=[borrowing_id]), {
+            "actual_return_date": date.today().isoformat()
+        }
+
+    def return_to_hold(i: int) -> tuple[str, dict]:
+        book_id = new_book(inventory=0)
+        borrowing = Borrowing.objects.create(book_id=book_id, user=user, expected_return_date=due)
+        BookCirculation.objects.record_checkouts({book_id: 1}, date.today())
+        Hold.objects.create(book_id=book_id, user=user)
+        return reverse("borrowings:return-borrowing", args=[borrowing.id]), {
+            "actual_return_date": date.today().isoformat()
+        }
+
+    book_detail = reverse("books:book-detail", args=[book_ids[0]])
+    borrowing_detail = reverse("borrowings:borrowing-detail", args=[own_borrowing_ids[0]])
+    hold_detail = reverse("borrowings:hold-detail", args=[new_hold()])
+    return [
+        # Reads first, so writes do not invalidate the catalog cache under them.
+        Scenario("books:api-root", "GET", "anonymous", get(reverse("books:api-root"))),
+        Scenario("books:book-list", "GET", "anonymous", get(reverse("books:book-list"))),
+        Scenario(
+            "books:book-list", "GET", "anonymous", label="?search",
+            build=lambda i: (f"{reverse('books:book-list')}?search={WORDS[i % len(WORDS)]}", None),
+        ),
+        Scenario("books:book-detail", "GET", "anonymous", get(book_detail)),
+        # The scenarios above mostly time cache hits; these time the misses
+        # every reader pays once after each catalog write.
+        Scenario(
+            "books:book-list", "GET", "anonymous", label="cold",
+            build=cold(reverse("books:book-list")),
+        ),
+        Scenario(
+            "books:book-detail", "GET", "anonymous", label="cold", build=cold(book_detail)
+        ),
+        Scenario("users:manage", "GET", "user", get(reverse("users:manage"))),
+        Scenario(
+            "borrowings:borrowing-list-create", "GET", "user",
+            get(reverse("borrowings:borrowing-list-create")),
+        ),
+        Scenario(
+            "borrowings:borrowing-list-create", "GET", "staff", label="?is_active",
+            build=get(f"{reverse('borrowings:borrowing-list-create')}?is_active=true"),
+        ),
+        Scenario("borrowings:borrowing-detail", "GET", "user", get(borrowing_detail)),
+        Scenario(
+            "borrowings:borrowing-export", "GET", "user",
+            get(reverse("borrowings:borrowing-export")),
+        ),
+        Scenario(
+            "borrowings:borrowing-fees", "GET", "user", get(reverse("borrowings:borrowing-fees"))
+        ),
+        Scenario(
+            "borrowings:book-circulation-list", "GET", "staff",
+            get(f"{reverse('borrowings:book-circulation-list')}?ordering=-total_borrows"),
+        ),
+        Scenario(
+            "borrowings:hold-list-create", "GET", "user",
+            get(reverse("borrowings:hold-list-create")),
+        ),
+        Scenario("borrowings:hold-detail", "GET", "user", get(hold_detail)),
+        # Writes. Any setup a request needs happens in `build`, outside the timing.
+        Scenario(
+            "books:book-list", "POST", "staff", expect=201,
+            build=lambda i: (reverse("books:book-list"), {
+                "title": f"Bench Book {i}", "author": "Bench", "cover": "Hard",
+                "inventory": 3, "daily_fee": "1.50",
+            }),
+        ),
+        Scenario(
+            "books:book-detail", "PATCH", "staff",
+            build=lambda i: (book_detail, {"inventory": 10 + i % 5}),
+        ),
+        Scenario(
+            "books:book-detail", "DELETE", "staff", expect=204,
+            build=lambda i: (reverse("books:book-detail", args=[new_book()]), None),
+        ),
+        Scenario(
+            "users:create", "POST", "anonymous", expect=201, requests=10,
+            build=lambda i: (reverse("users:create"), {
+                "email": f"new{next(emails)}@bench.com", "password": PASSWORD
+            }),
+        ),
+        Scenario(
+            "users:token_obtain_pair", "POST", "anonymous", requests=10,
+            build=lambda i: (reverse("users:token_obtain_pair"), {
+                "email": user.email, "password": PASSWORD
+            }),
+        ),
+        Scenario(
+            "users:token_refresh", "POST", "anonymous",
+            build=lambda i: (reverse("users:token_refresh"), {"refresh": fixtures["refresh"]}),
+        ),
+        Scenario(
+            "users:manage", "PATCH", "user",
+            build=lambda i: (reverse("users:manage"), {"first_name": f"Bench{i % 10}"}),
+        ),
+        Scenario("borrowings:borrowing-list-create", "POST", "user", checkout, expect=201),
+        Scenario("borrowings:borrowing-bulk-create", "POST", "user", bulk_checkout, expect=201),
+        Scenario("borrowings:return-borrowing", "PATCH", "user", return_one),
+        Scenario(
+            "borrowings:return-borrowing", "PATCH", "user", label="to a hold",
+            build=return_to_hold,
+        ),
+        Scenario(
+            "borrowings:borrowing-bulk-return", "POST", "user",
+            build=lambda i: (reverse("borrowings:borrowing-bulk-return"), {
+                "borrowings": new_borrowings(10)
+            }),
+        ),
+        Scenario(
+            "borrowings:hold-list-create", "POST", "user", expect=201,
+            build=lambda i: (reverse("borrowings:hold-list-create"), {
+                "book": new_book(inventory=0)
+            }),
+        ),
+        Scenario(
+            "borrowings:hold-detail", "DELETE", "user", expect=204,
+            build=lambda i: (reverse("borrowings:hold-detail", args=[new_hold()]), None),
+        ),
+    ]
+
+
+def seed(scale: int) -> tuple[dict, dict]:
+    from django.contrib.auth import get_user_model
+
+    from benchmarks.seed import seed_books, seed_borrowings, seed_users
+    from borrowings.circulation import rebuild_circulation
+    from borrowings.models import Borrowing
+    from users.serializers import TokenObtainPairSerializer
+
+    User = get_user_model()
+    seconds = {}
+    user = User.objects.create_user("user@bench.com", PASSWORD, first_name="Bench")
+    staff = User.objects.create_user("staff@bench.com", PASSWORD, is_staff=True)
+
+    with timer() as elapsed:
+        book_ids = seed_books(scale)
+    seconds["books"] = elapsed["seconds"]
+    with timer() as elapsed:
+        user_ids = seed_users(999) + [user.id, staff.id]
+        seed_borrowings(scale, book_ids, user_ids)
+        rebuild_circulation()
+    seconds["borrowings"] = elapsed["seconds"]
+
+    refresh = TokenObtainPairSerializer.get_token(user)
+    fixtures = {
+        "user": user,
+        "book_ids": book_ids,
+        "own_borrowing_ids": list(
+            Borrowing.objects.filter(user=user).values_list("id", flat=True)[:1]
+        ) or [0],
+        "refresh": str(refresh),
+        "tokens": {
+            "user": str(refresh.access_token),
+            "staff": str(TokenObtainPairSerializer.get_token(staff).access_token),
+        },
+    }
+    return fixtures, {name: round(value, 2) for name, value in seconds.items()}
+
+
+def run(scenario: Scenario, clients: dict, requests: int, warmup: int) -> dict:
+    from django.db import connection
+
+    client = clients[scenario.user]
+    send = getattr(client, scenario.method.lower())
+    executed = []
+
+    def count_queries(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    total = (scenario.requests or requests) + warmup
+    for i in range(total):
+        path, data = scenario.build(i)
+        executed.clear()
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            response = send(path, data, format="json") if data is not None else send(path)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        if response.status_code != scenario.expect:
+            raise SystemExit(
+                f"{scenario.name}: expected {scenario.expect}, got {response.status_code} "
+                f"for {path}: {getattr(response, 'content', b'')[:300]!r}"
+            )
+        if i >= warmup:
+            scenario.samples.append(elapsed * 1000)
+            scenario.queries.append(len(executed))
+
+    samples = scenario.samples
+    return {
+        "endpoint": scenario.name,
+        "path": path,
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "mean_ms": round(statistics.fmean(samples), 2),
+        "rps": round(1000 / statistics.fmean(samples), 1),
+        "queries": statistics.median_low(scenario.queries),
+    }
+
+
+def compare(results: list[dict], baseline_path: Path) -> None:
+    baseline = {row["endpoint"]: row for row in json.loads(baseline_path.read_text())["results"]}
+    print(f"\n{'endpoint':70} {'p50 before':>11} {'p50 now':>9} {'change':>8} {'queries':>9}")
+    for row in results:
+        before = baseline.get(row["endpoint"])
+        if before is None:
+            print(f"{row['endpoint']:70} {'-':>11} {row['p50_ms']:>9} {'new':>8}")
+            continue
+        change = (row["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        print(
+            f"{row['endpoint']:70} {before['p50_ms']:>11} {row['p50_ms']:>9} "
+            f"{change:>+7.1f}% {before['queries']:>4}->{row['queries']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--requests", type=int, default=100, help="Timed requests per endpoint.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", help="Only run scenarios whose name contains this text.")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", type=Path, help="Print p50 changes against a saved run.")
+    args = parser.parse_args()
+
+    setup()
+    import django
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+    with test_database():
+        fixtures, seed_seconds = seed(SCALES[args.scale])
+        scenarios = build_scenarios(fixtures)
+
+        missing = api_url_names() - {scenario.url_name for scenario in scenarios}
+        if missing:
+            raise SystemExit(f"No benchmark scenario for: {', '.join(sorted(missing))}")
+
+        clients = {"anonymous": APIClient()}
+        for role, token in fixtures["tokens"].items():
+            clients[role] = APIClient()
+            clients[role].credentials(**{jwt_settings.AUTH_HEADER_NAME: f"Bearer {token}"})
+
+        results = []
+        for scenario in scenarios:
+            if args.only and args.only not in scenario.name:
+                continue
+            result = run(scenario, clients, args.requests, args.warmup)
+            results.append(result)
+            print(json.dumps(result))
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "scale": args.scale,
+                "rows": SCALES[args.scale],
+                "seed_seconds": seed_seconds,
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            },
+            "results": results,
+        }
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
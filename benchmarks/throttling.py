@@ -0,0 +1,101 @@
+"""Per-request overhead of the rate limits.
+
+    python -m benchmarks.throttling --requests 100000 --clients 1000
+
+Runs what DRF's check_throttles() does for a catalog request - create the
+anon, user and scoped throttles and ask each to allow the request - for
+authenticated clients taking turns, and reports microseconds per request.
+The token buckets of config.throttling, in process memory and in the
+default cache, are compared with DRF's stock throttles, which keep a list
+of request timestamps per client in the cache. No request is refused at
+the configured rates unless --requests / --clients exceeds them.
+"""
+import argparse
+import json
+
+from benchmarks import setup, timer
+
+BUCKETS = {
+    "local": "config.throttling.LocalBuckets",
+    "cache": "config.throttling.CacheBuckets",
+}
+
+
+def build_requests(clients: int) -> list:
+    from django.contrib.auth import get_user_model
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    factory = APIRequestFactory()
+    requests = []
+    for i in range(clients):
+        request = Request(factory.get("/api/books/", REMOTE_ADDR=f"10.0.{i // 256}.{i % 256}"))
+        request.user = get_user_model()(pk=i + 1, email=f"user{i}@bench.com")
+        requests.append(request)
+    return requests
+
+
+def measure(throttle_classes: list, requests: list, count: int) -> dict:
+    from django.core.cache import cache
+
+    from books.views import BookViewSet
+
+    view = BookViewSet()
+    cache.clear()
+    refused = 0
+    with timer() as elapsed:
+        for i in range(count):
+            request = requests[i % len(requests)]
+            for throttle_class in throttle_classes:
+                if not throttle_class().allow_request(request, view):
+                    refused += 1
+    return {
+        "refused": refused,
+        "seconds": round(elapsed["seconds"], 3),
+        "us_per_request": round(elapsed["seconds"] / count * 1_000_000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.test import override_settings
+    from rest_framework import throttling as drf_throttling
+
+    from config import throttling
+
+    requests = build_requests(args.clients)
+    drf_classes = [
+        drf_throttling.AnonRateThrottle,
+        drf_throttling.UserRateThrottle,
+        drf_throttling.ScopedRateThrottle,
+    ]
+    bucket_classes = [
+        throttling.AnonRateThrottle,
+        throttling.UserRateThrottle,
+        throttling.ScopedRateThrottle,
+    ]
+    runs = [("drf", drf_classes, throttling.DEFAULT_BUCKETS)] + [
+        (f"bucket-{name}", bucket_classes, path) for name, path in BUCKETS.items()
+    ]
+    # DRF's stock throttles read their rates once, at import.
+    drf_throttling.SimpleRateThrottle.THROTTLE_RATES = settings.REST_FRAMEWORK[
+        "DEFAULT_THROTTLE_RATES"
+    ]
+    for name, classes, buckets in runs:
+        # benchmarks.setup() turns THROTTLE_ENABLED off for the other benchmarks.
+        with override_settings(
+            THROTTLE_ENABLED=True,
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "THROTTLE_BUCKETS": buckets},
+        ):
+            result = measure(classes, requests, args.requests)
+        print(json.dumps({"throttles": name, "clients": args.clients, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Versioned caching of catalog reads.
+
+Every write to books bumps one version number, which is part of every
+cached response's key. The version and the single-flight locks live in
+the default cache, so all processes must share it for a write in one to
+invalidate the others; production settings refuse a process-local cache.
+"""
+import hashlib
+import json
+import time
+from typing import Callable
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = "books:catalog-version"
+CATALOG_TIMEOUT = 10 * 60
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 5.0
+
+
+def get_catalog_version() -> int:
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1, so that a version key lost to
+        # eviction can never resurrect entries cached under an old number.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _bump() -> None:
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+
+
+def bump_catalog_version() -> None:
+    """Invalidate every cached catalog response.
+
+    Inside a transaction the version is bumped again on commit, so a reader
+    that cached the pre-commit rows in between does not keep serving them.
+    """
+    _bump()
+    if connection.in_atomic_block:
+        transaction.on_commit(_bump)
+
+
+def single_flight(key: str, compute: Callable[[], dict]) -> dict:
+    """Return cache[key], letting only one caller at a time recompute it.
+
+    Concurrent callers that miss wait for the winner to fill the cache instead
+    of all hitting the database. If the winner takes longer than LOCK_WAIT
+    they give up waiting and compute the value themselves.
+    """
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout=CATALOG_TIMEOUT)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.005)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return cache.get(key) or compute()
+
+
+def catalog_cache_key(request) -> str:
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    resource = f"{request.get_host()}{request.path}?{query}"
+    return "books:catalog:{}:{}:{}".format(
+        get_catalog_version(),
+        request.accepted_renderer.format,
+        hashlib.sha256(resource.encode()).hexdigest(),
+    )
+
+
+def cached_catalog_response(request, build: Callable[[], Response]) -> Response:
+    """Serve a catalog read from cache, answering If-None-Match with 304."""
+
+    def compute() -> dict:
+        response = build()
+        body = json.dumps(response.data, cls=DjangoJSONEncoder, sort_keys=True)
+        digest = hashlib.sha256(
+            f"{request.accepted_renderer.format}:{body}".encode()
+        ).hexdigest()
+        return {"status": response.status_code, "data": response.data, "etag": f'"{digest}"'}
+
+    key = catalog_cache_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        entry = single_flight(key, compute)
+
+    headers = {"ETag": entry["etag"]}
+    if_none_match = request.headers.get("If-None-Match")
+    if entry["status"] == status.HTTP_200_OK and if_none_match:
+        etags = [etag.removeprefix("W/") for etag in parse_etags(if_none_match)]
+        if "*" in etags or entry["etag"] in etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(entry["data"], status=entry["status"], headers=headers)
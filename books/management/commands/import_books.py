@@ -0,0 +1,143 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework import serializers
+
+from books.cache import bump_catalog_version
+from books.models import Book
+from books.serializers import BookSerializer
+from books.signals import stock_added
+
+UPSERT_FIELDS = ["inventory", "daily_fee"]
+MAX_REPORTED_REJECTS = 20
+
+
+class BookRowSerializer(BookSerializer):
+    class Meta(BookSerializer.Meta):
+        # A row for a book that exists is an update, not a duplicate.
+        validators = []
+
+
+def read_csv(path: Path):
+    with path.open(newline="", encoding="utf-8") as file:
+        for line, row in enumerate(csv.DictReader(file), start=2):
+            yield line, row
+
+
+def read_jsonl(path: Path):
+    with path.open(encoding="utf-8") as file:
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as error:
+                yield line, error
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream books from a CSV or JSONL file and upsert them by (author, title, cover). "
+        "Rows are validated with BookSerializer; invalid ones are reported and skipped."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--format",
+            choices=READERS,
+            help="Input format. Defaults to the file extension.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--rejects",
+            type=Path,
+            help="Write rejected rows with their errors to this JSONL file.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in READERS:
+            raise CommandError(f"Unknown format {file_format!r}, use --format csv|jsonl.")
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+
+        self.validator = BookRowSerializer()
+        self.read = self.created = self.updated = self.rejected = 0
+        rejects = options["rejects"].open("w", encoding="utf-8") if options["rejects"] else None
+
+        start = time.perf_counter()
+        rows = READERS[file_format](path)
+        try:
+            while batch := list(islice(rows, options["batch_size"])):
+                self.import_batch(batch, rejects)
+        finally:
+            if rejects:
+                rejects.close()
+            if self.created or self.updated:
+                bump_catalog_version()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Read {self.read} rows in {elapsed:.1f}s "
+            f"({self.read / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{self.created} created, {self.updated} updated, {self.rejected} rejected."
+        )
+
+    def import_batch(self, batch: list, rejects) -> None:
+        self.read += len(batch)
+        books = {}
+        for line, row in batch:
+            try:
+                if not isinstance(row, dict):
+                    raise serializers.ValidationError(f"Invalid row: {row}")
+                data = self.validator.run_validation(row)
+            except serializers.ValidationError as error:
+                self.reject(line, row, error.detail, rejects)
+                continue
+            # A later row for the same book wins, as it would on re-import.
+            book = Book(**data)
+            books[(book.author, book.title, book.cover)] = book
+
+        if not books:
+            return
+
+        titles = {title for _, title, _ in books}
+        with transaction.atomic():
+            # Only to report created and updated counts: the upsert below
+            # relies on book_author_title_cover_unique, not on this lookup. It
+            # goes by title alone because book_title_idx turns that into point
+            # lookups, where pairing it with author__in would scan every book
+            # by any author in the batch.
+            existing = set(
+                Book.objects.filter(title__in=titles).values_list("author", "title", "cover")
+            )
+            Book.objects.bulk_create(
+                books.values(),
+                update_conflicts=True,
+                unique_fields=["author", "title", "cover"],
+                update_fields=UPSERT_FIELDS,
+            )
+            # Copies of books people are waiting for go to their holds.
+            stock_added.send(sender=Book, books=Book.objects.filter(title__in=titles))
+
+        updated = len(existing & books.keys())
+        self.updated += updated
+        self.created += len(books) - updated
+
+    def reject(self, line: int, row, errors, rejects) -> None:
+        self.rejected += 1
+        if rejects:
+            record = {"line": line, "row": row if isinstance(row, dict) else None, "errors": errors}
+            rejects.write(json.dumps(record) + "\n")
+        elif self.rejected <= MAX_REPORTED_REJECTS:
+            self.stderr.write(f"Line {line}: {json.dumps(errors)}")
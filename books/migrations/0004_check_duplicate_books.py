@@ -0,0 +1,40 @@
+from django.core.management.base import CommandError
+from django.db import migrations
+from django.db.models import Count
+
+MAX_REPORTED = 20
+
+
+def check_duplicates(apps, schema_editor) -> None:
+    """Refuse to migrate while two books share an (author, title, cover).
+
+    Which of them is the real one, and what happens to their borrowings,
+    is for a librarian to decide, so nothing is merged here.
+    """
+    Book = apps.get_model("books", "Book")
+    duplicates = list(
+        Book.objects.order_by("author", "title", "cover")
+        .values("author", "title", "cover")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)[:MAX_REPORTED]
+    )
+    if duplicates:
+        listing = "\n".join(
+            f'  {row["count"]} x "{row["title"]}", {row["author"]} ({row["cover"]})'
+            for row in duplicates
+        )
+        raise CommandError(
+            "These books are in the catalog more than once. Merge or rename them "
+            f"before migrating, so (author, title, cover) can be unique:\n{listing}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0003_book_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:08
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module("books.migrations.0003_book_search_index")
+
+
+def reinstall_sqlite_triggers(apps, schema_editor) -> None:
+    """Recreate the full-text triggers dropped with the old books_book table.
+
+    SQLite adds and removes the constraint by copying books_book into a new
+    table, and triggers go with the table they were defined on.
+    """
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in search_index.SQLITE_FORWARD[1:]:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0004_check_duplicate_books"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_sqlite_triggers),
+        migrations.AddConstraint(
+            model_name="book",
+            constraint=models.UniqueConstraint(
+                fields=("author", "title", "cover"), name="book_author_title_cover_unique"
+            ),
+        ),
+        migrations.RunPython(reinstall_sqlite_triggers, migrations.RunPython.noop),
+    ]
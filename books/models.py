@@ -1,4 +1,61 @@
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+
+from books.cache import bump_catalog_version
+
+
+class BookQuerySet(models.QuerySet):
+    def reserve(self, copies: int = 1) -> int:
+        """Take copies out of stock with a single guarded UPDATE.
+
+        Books that don't have enough copies left are untouched, so the result
+        is the number of books actually reserved.
+        """
+        reserved = self.filter(inventory__gte=copies).update(
+            inventory=F("inventory") - copies
+        )
+        if reserved:
+            bump_catalog_version()
+        return reserved
+
+    def release(self, copies: int = 1) -> int:
+        released = self.update(inventory=F("inventory") + copies)
+        if released:
+            bump_catalog_version()
+        return released
+
+    def reserve_many(self, copies: dict[int, int]) -> int:
+        """Reserve `copies[book_id]` copies of several books in one UPDATE.
+
+        Returns how many books had enough stock and were reserved. The result
+        is all-or-nothing only if the caller checks it against `len(copies)`
+        and rolls back its transaction on a mismatch.
+        """
+        in_stock = Q()
+        for book_id, count in copies.items():
+            in_stock |= Q(pk=book_id, inventory__gte=count)
+
+        reserved = self.filter(in_stock).update(
+            inventory=F("inventory") - self._copies_per_book(copies)
+        )
+        if reserved:
+            bump_catalog_version()
+        return reserved
+
+    def release_many(self, copies: dict[int, int]) -> int:
+        released = self.filter(pk__in=copies).update(
+            inventory=F("inventory") + self._copies_per_book(copies)
+        )
+        if released:
+            bump_catalog_version()
+        return released
+
+    @staticmethod
+    def _copies_per_book(copies: dict[int, int]) -> Case:
+        return Case(
+            *(When(pk=book_id, then=Value(count)) for book_id, count in copies.items()),
+            output_field=models.PositiveIntegerField(),
+        )
 
 
 class Book(models.Model):
@@ -14,8 +71,39 @@ class Book(models.Model):
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=6, decimal_places=2)
 
+    objects = BookQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"{self.title}, {self.author}"
 
     class Meta:
-        ordering = ["author", "title"]
+        ordering = ["author", "title", "id"]
+        indexes = [
+            models.Index(fields=["author", "title", "id"], name="book_author_title_idx"),
+            models.Index(fields=["title", "id"], name="book_title_idx"),
+            models.Index(fields=["daily_fee", "id"], name="book_daily_fee_idx"),
+            models.Index(
+                fields=["cover", "author", "title", "id"], name="book_cover_author_idx"
+            ),
+            models.Index(
+                fields=["author", "title", "id"],
+                condition=models.Q(inventory__gt=0),
+                name="book_in_stock_idx",
+            ),
+        ]
+        constraints = [
+            # Editions differ by cover, so a title may be in the catalog in both.
+            models.UniqueConstraint(
+                fields=["author", "title", "cover"], name="book_author_title_cover_unique"
+            ),
+        ]
+
+    def reserve(self, copies: int = 1) -> bool:
+        reserved = bool(Book.objects.filter(pk=self.pk).reserve(copies))
+        if reserved:
+            self.inventory -= copies
+        return reserved
+
+    def release(self, copies: int = 1) -> None:
+        Book.objects.filter(pk=self.pk).release(copies)
+        self.inventory += copies
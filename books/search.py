@@ -0,0 +1,51 @@
+import re
+
+from django.db import connection
+from django.db.models import Q, QuerySet
+
+# Full-text index objects are created by migration 0003_book_search_index:
+# an FTS5 table kept in sync by triggers on SQLite, and a generated tsvector
+# column with a GIN index on PostgreSQL.
+FTS_TABLE = "books_book_fts"
+
+# Column weights: a hit in the title counts for more than one in the author.
+SQLITE_RANK = f"bm25({FTS_TABLE}, 10.0, 5.0)"
+POSTGRESQL_RANK = "-ts_rank(books_book.search_vector, to_tsquery('simple', %s))"
+
+
+def search_terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query)
+
+
+def search_books(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter books matching every word of `query`, best matches first.
+
+    Each word also matches as a prefix, so "tolk" finds "Tolkien". Results
+    carry a `search_rank` where lower is better.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        queryset = queryset.extra(
+            select={"search_rank": SQLITE_RANK},
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = books_book.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        )
+    elif connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        queryset = queryset.extra(
+            select={"search_rank": POSTGRESQL_RANK},
+            select_params=[tsquery],
+            where=["books_book.search_vector @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+        )
+    else:
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(author__icontains=term))
+        return queryset
+
+    return queryset.order_by("search_rank", "id")
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 
 from books.models import Book
+from config.sparse_fields import SparseFieldsSerializerMixin
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+        extra_kwargs = {"inventory": {"min_value": 0}}
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from books.cache import bump_catalog_version
+from books.models import Book
+
+# Sent with `books`, a Book queryset, inside the transaction of a write that
+# may have put copies on the shelf without a return: a staff edit of the
+# inventory or an import. borrowings.signals lends them to waiting holds.
+stock_added = Signal()
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_catalog_cache(sender, **kwargs) -> None:
+    bump_catalog_version()
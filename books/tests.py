@@ -1,11 +1,51 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.translation import gettext_lazy
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIClient
-from rest_framework import status
-
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import serializers, status, viewsets
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from books.cache import single_flight
 from books.models import Book
 from books.serializers import BookSerializer
+from books.views import BookViewSet
+from config.field_plans import compile_field_plan
+from config.middleware import QueryBudgetExceeded, QueryCounter, brotli
+from config.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from config.throttling import (
+    AnonRateThrottle,
+    CacheBuckets,
+    LocalBuckets,
+    ScopedRateThrottle,
+    UserRateThrottle,
+    get_buckets,
+)
+from users.authentication import StatelessJWTAuthentication
+from users.serializers import TokenObtainPairSerializer
 
 
 BOOKS_URL = reverse("books:book-list")
@@ -41,7 +81,7 @@ class PublicBookApiTest(TestCase):
         serializer = BookSerializer(books, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_retrieve_book_detail(self) -> None:
         url = reverse("books:book-detail", args=[self.book1.id])
@@ -70,6 +110,393 @@ class PublicBookApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class BookCatalogApiTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+        self.hard = Book.objects.create(
+            title="B Title", author="Author A", cover="Hard", inventory=0, daily_fee=1.5
+        )
+        self.soft = Book.objects.create(
+            title="A Title", author="Author A", cover="Soft", inventory=3, daily_fee=3
+        )
+        self.other = Book.objects.create(
+            title="C Title", author="Author B", cover="Hard", inventory=1, daily_fee=0.5
+        )
+
+    def get_ids(self, params: dict) -> list[int]:
+        res = self.client.get(BOOKS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [book["id"] for book in res.data["results"]]
+
+    def test_list_is_paginated(self) -> None:
+        res = self.client.get(BOOKS_URL, {"page_size": 2})
+
+        self.assertEqual(res.data["count"], 3)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNotNone(res.data["next"])
+
+    def test_default_ordering_is_author_then_title(self) -> None:
+        self.assertEqual(self.get_ids({}), [self.soft.id, self.hard.id, self.other.id])
+
+    def test_filter_by_author_and_cover(self) -> None:
+        self.assertEqual(self.get_ids({"author": "Author A"}), [self.soft.id, self.hard.id])
+        self.assertEqual(self.get_ids({"cover": "Hard"}), [self.hard.id, self.other.id])
+
+    def test_filter_in_stock(self) -> None:
+        self.assertEqual(self.get_ids({"in_stock": "true"}), [self.soft.id, self.other.id])
+
+    def test_filter_fee_range(self) -> None:
+        self.assertEqual(
+            self.get_ids({"min_fee": "1", "max_fee": "2"}), [self.hard.id]
+        )
+
+    def test_ordering(self) -> None:
+        self.assertEqual(
+            self.get_ids({"ordering": "-daily_fee"}),
+            [self.soft.id, self.hard.id, self.other.id],
+        )
+        self.assertEqual(
+            self.get_ids({"ordering": "title"}), [self.soft.id, self.hard.id, self.other.id]
+        )
+
+    def test_invalid_params_rejected(self) -> None:
+        for params in ({"ordering": "inventory"}, {"cover": "Paper"}, {"min_fee": "cheap"}):
+            res = self.client.get(BOOKS_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_finite_fees_rejected(self) -> None:
+        for value in ("NaN", "sNaN", "Infinity", "-inf"):
+            for name in ("min_fee", "max_fee"):
+                with self.subTest(name=name, value=value):
+                    res = self.client.get(BOOKS_URL, {name: value})
+                    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+    def test_catalog_queries_do_not_sort_in_memory(self) -> None:
+        for params in (
+            {},
+            {"ordering": "title"},
+            {"ordering": "-daily_fee"},
+            {"cover": "Hard"},
+            {"in_stock": "true"},
+        ):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(BOOKS_URL, params)
+            select = [q["sql"] for q in context.captured_queries if "ORDER BY" in q["sql"]]
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + select[-1])
+                plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertNotIn("TEMP B-TREE", plan, params)
+
+
+@skipUnless(connection.vendor == "sqlite", "uses the SQLite FTS5 index")
+class BookSearchApiTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+        self.hobbit = Book.objects.create(
+            title="The Hobbit", author="J. R. R. Tolkien", inventory=1, daily_fee=1
+        )
+        self.rings = Book.objects.create(
+            title="The Fellowship of the Ring", author="J. R. R. Tolkien", inventory=1, daily_fee=1
+        )
+        self.about = Book.objects.create(
+            title="Tolkien: A Biography", author="Humphrey Carpenter", inventory=1, daily_fee=1
+        )
+
+    def search(self, query: str, **params) -> list[int]:
+        res = self.client.get(BOOKS_URL, {"search": query, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [book["id"] for book in res.data["results"]]
+
+    def test_search_matches_title_and_author_words(self) -> None:
+        self.assertEqual(self.search("hobbit"), [self.hobbit.id])
+        self.assertEqual(self.search("carpenter"), [self.about.id])
+        self.assertEqual(self.search("tolkien ring"), [self.rings.id])
+
+    def test_search_matches_prefixes(self) -> None:
+        self.assertEqual(self.search("fellow"), [self.rings.id])
+
+    def test_search_ranks_title_matches_first(self) -> None:
+        self.assertEqual(self.search("tolkien")[0], self.about.id)
+
+    def test_search_combines_with_filters_and_ordering(self) -> None:
+        self.assertEqual(
+            self.search("tolkien", author="J. R. R. Tolkien", ordering="title"),
+            [self.rings.id, self.hobbit.id],
+        )
+
+    def test_search_ignores_query_syntax(self) -> None:
+        self.assertEqual(self.search('hobbit"*)'), [self.hobbit.id])
+        self.assertEqual(self.search("hobbit OR ring"), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_search_index_follows_writes(self) -> None:
+        self.hobbit.title = "There and Back Again"
+        self.hobbit.save()
+        self.rings.delete()
+
+        self.assertEqual(self.search("hobbit"), [])
+        self.assertEqual(self.search("again"), [self.hobbit.id])
+        self.assertEqual(self.search("fellowship"), [])
+
+
+class BookCatalogCacheTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.book = Book.objects.create(
+            title="Test Title",
+            author="Test Author",
+            cover="Hard",
+            inventory=2,
+            daily_fee=2.1
+        )
+        self.detail_url = reverse("books:book-detail", args=[self.book.id])
+
+    def test_conditional_get_returns_not_modified(self) -> None:
+        for url in (BOOKS_URL, self.detail_url):
+            res = self.client.get(url)
+            etag = res["ETag"]
+
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(cached["ETag"], etag)
+            self.assertEqual(cached.content, b"")
+
+    def test_cache_is_keyed_on_query_params(self) -> None:
+        Book.objects.create(
+            title="Sold Out", author="Test Author", cover="Hard", inventory=0, daily_fee=1
+        )
+        etag = self.client.get(BOOKS_URL)["ETag"]
+
+        res = self.client.get(BOOKS_URL, {"in_stock": "true"}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_book_write_invalidates_cache(self) -> None:
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.book.title = "New Title"
+        self.book.save()
+
+        res = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["title"], "New Title")
+
+    def test_inventory_reservation_invalidates_cache(self) -> None:
+        etag = self.client.get(BOOKS_URL)["ETag"]
+        self.book.reserve()
+
+        res = self.client.get(BOOKS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"][0]["inventory"], 1)
+
+    def test_concurrent_misses_compute_once(self) -> None:
+        calls = []
+
+        def compute() -> dict:
+            calls.append(1)
+            time.sleep(0.05)
+            return {"value": 1}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(lambda _: single_flight("test-key", compute), range(8))
+            )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 1}] * 8)
+
+
+class ImportBooksCommandTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.existing = Book.objects.create(
+            title="Test Title",
+            author="Test Author",
+            cover="Hard",
+            inventory=2,
+            daily_fee=2.1
+        )
+
+    def write(self, name: str, content: str) -> Path:
+        path = Path(self.directory.name) / name
+        path.write_text(content)
+        return path
+
+    def run_import(self, path: Path, *args) -> tuple[str, str]:
+        out, err = StringIO(), StringIO()
+        call_command("import_books", str(path), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv_upserts_by_author_title_and_cover(self) -> None:
+        path = self.write(
+            "books.csv",
+            "title,author,cover,inventory,daily_fee\n"
+            "Test Title,Test Author,Hard,7,3.50\n"
+            "Test Title,Test Author,Soft,1,1.25\n"
+            "New Title,New Author,Hard,1,1.25\n",
+        )
+
+        out, _ = self.run_import(path, "--batch-size", "1")
+
+        self.assertIn("2 created, 1 updated, 0 rejected", out)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.cover, self.existing.inventory), ("Hard", 7))
+        self.assertEqual(self.existing.daily_fee, Decimal("3.50"))
+        self.assertTrue(Book.objects.filter(title="Test Title", cover="Soft").exists())
+        self.assertTrue(Book.objects.filter(title="New Title", author="New Author").exists())
+
+    def test_import_jsonl_reports_rejected_rows(self) -> None:
+        path = self.write(
+            "books.jsonl",
+            json.dumps({"title": "Good", "author": "Author", "inventory": 1, "daily_fee": "1"})
+            + "\n"
+            + json.dumps({"title": "Bad", "author": "Author", "inventory": -1, "daily_fee": "1"})
+            + "\n{not json\n",
+        )
+        rejects = Path(self.directory.name) / "rejects.jsonl"
+
+        out, _ = self.run_import(path, "--rejects", str(rejects))
+
+        self.assertIn("Read 3 rows", out)
+        self.assertIn("1 created, 0 updated, 2 rejected", out)
+        records = [json.loads(line) for line in rejects.read_text().splitlines()]
+        self.assertEqual([record["line"] for record in records], [2, 3])
+        self.assertIn("inventory", records[0]["errors"])
+        self.assertFalse(Book.objects.filter(title="Bad").exists())
+
+    def test_import_invalidates_catalog_cache(self) -> None:
+        client = APIClient()
+        etag = client.get(BOOKS_URL)["ETag"]
+        path = self.write(
+            "books.csv", "title,author,inventory,daily_fee\nNew Title,New Author,1,1\n"
+        )
+
+        self.run_import(path)
+
+        res = client.get(BOOKS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 2)
+
+    def test_unknown_format(self) -> None:
+        path = self.write("books.xml", "")
+
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+
+
+class DuplicateBooksMigrationTest(TransactionTestCase):
+    before = ("books", "0003_book_search_index")
+    after = ("books", "0005_book_author_title_cover_unique")
+
+    def setUp(self) -> None:
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.before])
+        executor.loader.build_graph()
+        self.Book = executor.loader.project_state([self.before]).apps.get_model("books", "Book")
+        self.addCleanup(self.migrate_forward)
+
+    def migrate_forward(self) -> None:
+        self.Book.objects.all().delete()
+        MigrationExecutor(connection).migrate([self.after])
+
+    def create(self, cover: str):
+        return self.Book.objects.create(
+            title="Dune", author="Frank Herbert", cover=cover, inventory=1, daily_fee=1
+        )
+
+    def test_editions_with_other_covers_are_kept(self) -> None:
+        hard, soft = self.create("Hard"), self.create("Soft")
+
+        MigrationExecutor(connection).migrate([self.after])
+
+        self.assertEqual(
+            list(self.Book.objects.order_by("id").values_list("id", "cover")),
+            [(hard.id, "Hard"), (soft.id, "Soft")],
+        )
+
+    def test_duplicates_stop_the_migration(self) -> None:
+        self.create("Hard")
+        self.create("Hard")
+
+        with self.assertRaisesMessage(CommandError, '2 x "Dune", Frank Herbert (Hard)'):
+            MigrationExecutor(connection).migrate([self.after])
+
+        self.assertEqual(self.Book.objects.count(), 2)
+
+
+class BookListFastPathTest(TestCase):
+    """BookViewSet.list must render exactly what BookSerializer would."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        Book.objects.bulk_create(
+            Book(
+                title=f"{word} Tale {i}",
+                author=f"Author {i % 4}",
+                cover=("Hard", "Soft")[i % 2],
+                inventory=i % 3,
+                daily_fee=Decimal("0.5") + Decimal(i) / 10,
+            )
+            for i, word in enumerate(["Winter", "Summer", "Ocean", "Forest"] * 5)
+        )
+
+    def serializer_content(self, params: dict) -> bytes:
+        class SerializerBookViewSet(BookViewSet):
+            def list(self, request, *args, **kwargs) -> Response:
+                return viewsets.ModelViewSet.list(self, request, *args, **kwargs)
+
+        view = SerializerBookViewSet.as_view({"get": "list"})
+        response = view(APIRequestFactory().get(BOOKS_URL, params))
+        return response.render().content
+
+    def test_output_is_byte_identical_to_serializer(self) -> None:
+        cases = [
+            {},
+            {"page": 2, "page_size": 7},
+            {"ordering": "-daily_fee"},
+            {"search": "ocean"},
+            {"cover": "Soft", "in_stock": "true", "min_fee": "1"},
+            {"fields": "title,daily_fee", "ordering": "title"},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                res = self.client.get(BOOKS_URL, params, HTTP_ACCEPT="application/json")
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.content, self.serializer_content(params))
+
+    def test_sparse_fieldset(self) -> None:
+        book = Book.objects.first()
+        url = reverse("books:book-detail", args=[book.id])
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, {"fields": "id,title"})
+
+        self.assertEqual(res.data, {"id": book.id, "title": book.title})
+        self.assertNotIn("daily_fee", queries[-1]["sql"])
+        res = self.client.get(BOOKS_URL, {"fields": "isbn"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unsupported_serializer_fields_are_rejected(self) -> None:
+        class NestedSerializer(BookSerializer):
+            label = serializers.CharField(source="author.upper")
+
+            class Meta(BookSerializer.Meta):
+                fields = BookSerializer.Meta.fields + ("label",)
+
+        with self.assertRaises(ImproperlyConfigured):
+            compile_field_plan(NestedSerializer)
+
+
 class PrivateBookApiTest(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
@@ -134,6 +561,34 @@ class AdminUserBookApiTest(TestCase):
         for key in payload:
             self.assertEqual(payload[key], getattr(book, key))
 
+    def test_create_duplicate_book_rejected(self) -> None:
+        payload = {
+            "title": "Test Title",
+            "author": "Test Author",
+            "inventory": 1,
+            "daily_fee": 2.5,
+        }
+        res = self.client.post(BOOKS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.filter(title="Test Title").count(), 1)
+
+    def test_create_other_edition_of_a_book(self) -> None:
+        payload = {
+            "title": "Test Title",
+            "author": "Test Author",
+            "cover": "Soft",
+            "inventory": 1,
+            "daily_fee": 1.5,
+        }
+        res = self.client.post(BOOKS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Book.objects.filter(title="Test Title").values_list("cover", flat=True)),
+            ["Hard", "Soft"],
+        )
+
     def test_update_book(self) -> None:
         payload = {
             "title": "New Book",
@@ -153,3 +608,332 @@ class AdminUserBookApiTest(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        for i in range(3):
+            Book.objects.create(
+                title=f"Book {i}", author="Author", cover="Soft", inventory=1, daily_fee=1
+            )
+
+    def test_server_timing_header(self) -> None:
+        res = self.client.get(BOOKS_URL)
+
+        db, total = res["Server-Timing"].split(", ")
+        self.assertRegex(db, r'^db;dur=\d+\.\d{2};desc="2 queries"$')
+        self.assertRegex(total, r"^total;dur=\d+\.\d{2}$")
+
+    def test_logs_one_json_line_per_request(self) -> None:
+        with self.assertLogs("config.middleware", "INFO") as logs:
+            self.client.get(BOOKS_URL, {"ordering": "title"})
+
+        self.assertEqual(len(logs.records), 1)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].request_metrics, record)
+        self.assertEqual(record["method"], "GET")
+        self.assertEqual(record["path"], BOOKS_URL)
+        self.assertEqual(record["view"], "books.views.BookViewSet")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["queries"], 2)
+        self.assertEqual(record["query_budget"], BookViewSet.query_budget["list"])
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_over_budget_is_logged_as_warning(self) -> None:
+        budget = {**BookViewSet.query_budget, "list": 1}
+        with mock.patch.object(BookViewSet, "query_budget", budget):
+            with self.assertLogs("config.middleware", "WARNING"):
+                res = self.client.get(BOOKS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True)
+    def test_over_budget_raises_when_enforced(self) -> None:
+        budget = {**BookViewSet.query_budget, "list": 1}
+        with mock.patch.object(BookViewSet, "query_budget", budget):
+            with self.assertLogs("config.middleware", "WARNING"):
+                with self.assertRaisesMessage(QueryBudgetExceeded, "ran 2 queries"):
+                    self.client.get(BOOKS_URL)
+
+    def test_transaction_statements_are_not_counted(self) -> None:
+        counter = QueryCounter()
+        for sql in ("BEGIN", "SAVEPOINT s1", "SELECT 1", "RELEASE SAVEPOINT s1", "COMMIT"):
+            counter(lambda *args: None, sql, None, False, {})
+
+        self.assertEqual(counter.queries, 1)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class BookQueryBudgetTest(TestCase):
+    """Every catalog action stays within BookViewSet.query_budget.
+
+    Budgets count the User lookup of the default JWTAuthentication.
+    """
+
+    authentication_class = JWTAuthentication
+
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock.patch.object(
+            APIView, "authentication_classes", [self.authentication_class]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        staff = get_user_model().objects.create_user(
+            "admin@admin.com", "Testpassword123@", is_staff=True
+        )
+        token = TokenObtainPairSerializer.get_token(staff).access_token
+        self.client.credentials(**{jwt_settings.AUTH_HEADER_NAME: f"Bearer {token}"})
+        self.books = [
+            Book.objects.create(
+                title=f"Book {i}", author="Author", cover="Soft", inventory=1, daily_fee=1
+            )
+            for i in range(20)
+        ]
+
+    def test_actions(self) -> None:
+        url = reverse("books:book-detail", args=[self.books[0].id])
+        payload = {"title": "New", "author": "Author", "inventory": 1, "daily_fee": 2}
+        requests = [
+            ("get", BOOKS_URL, {"search": "book", "in_stock": "true"}, status.HTTP_200_OK),
+            ("get", url, {}, status.HTTP_200_OK),
+            ("post", BOOKS_URL, payload, status.HTTP_201_CREATED),
+            ("put", url, {**payload, "title": "Renamed"}, status.HTTP_200_OK),
+            ("patch", url, {"inventory": 3}, status.HTTP_200_OK),
+            ("delete", url, {}, status.HTTP_204_NO_CONTENT),
+        ]
+        for method, path, data, expected_status in requests:
+            with self.subTest(method=method, path=path):
+                res = getattr(self.client, method)(path, data)
+                self.assertEqual(res.status_code, expected_status)
+                self.assertIsNotNone(res.wsgi_request.query_budget)
+
+
+class StatelessBookQueryBudgetTest(BookQueryBudgetTest):
+    """The same budgets hold with JWT_STATELESS_USER on."""
+
+    authentication_class = StatelessJWTAuthentication
+
+
+THROTTLE_CLASSES = [AnonRateThrottle, UserRateThrottle, ScopedRateThrottle]
+
+
+def throttle_settings(**overrides) -> dict:
+    return {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+            "books": "3/min",
+        },
+        **overrides,
+    }
+
+
+class TokenBucketTest(TestCase):
+    def test_bucket_bursts_then_refills(self) -> None:
+        for buckets in (LocalBuckets(), CacheBuckets()):
+            with self.subTest(buckets=type(buckets).__name__):
+                cache.clear()
+                waits = [buckets.take("key", 3, 60, 1000.0) for _ in range(4)]
+                self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+                self.assertAlmostEqual(waits[3], 20.0)
+
+                self.assertAlmostEqual(buckets.take("key", 3, 60, 1010.0), 10.0)
+                self.assertEqual(buckets.take("key", 3, 60, 1020.0), 0.0)
+                self.assertGreater(buckets.take("key", 3, 60, 1020.0), 0.0)
+                self.assertEqual(buckets.take("other", 3, 60, 1020.0), 0.0)
+
+    def test_clearing_cache_buckets_keeps_the_rest_of_the_cache(self) -> None:
+        buckets = CacheBuckets()
+        cache.set("unrelated", "kept")
+        for _ in range(3):
+            buckets.take("key", 3, 60, 1000.0)
+        self.assertGreater(buckets.take("key", 3, 60, 1000.0), 0.0)
+
+        buckets.clear()
+
+        self.assertEqual(cache.get("unrelated"), "kept")
+        self.assertEqual(buckets.take("key", 3, 60, 1000.0), 0.0)
+
+        cache.delete(CacheBuckets.VERSION_KEY)
+        buckets.clear()
+        self.assertEqual(buckets.version(), 2)
+
+    def test_cache_buckets_see_a_clear_from_another_process(self) -> None:
+        buckets, other = CacheBuckets(), CacheBuckets()
+        for _ in range(3):
+            buckets.take("key", 3, 60, 1000.0)
+
+        other.clear()
+        self.assertGreater(buckets.take("key", 3, 60, 1000.0), 0.0)
+
+        buckets.version_read_at -= CacheBuckets.VERSION_TTL
+        self.assertEqual(buckets.take("key", 3, 60, 1000.0), 0.0)
+
+    def test_local_buckets_prune_full_buckets(self) -> None:
+        buckets = LocalBuckets()
+        buckets.PRUNE_AT = buckets.prune_at = 3
+        buckets.take("idle", 2, 60, 0.0)
+        buckets.take("busy", 2, 60, 50.0)
+        buckets.take("busy", 2, 60, 50.0)
+        buckets.take("new", 2, 60, 60.0)
+
+        self.assertEqual(set(buckets.buckets), {"busy", "new"})
+        self.assertGreater(buckets.take("busy", 2, 60, 60.0), 0.0)
+
+    def test_local_buckets_forget_least_recently_used_past_the_limit(self) -> None:
+        buckets = LocalBuckets()
+        buckets.PRUNE_AT = buckets.prune_at = buckets.MAX_BUCKETS = 4
+        buckets.take("regular", 2, 60, 0.0)
+        for i in range(10):
+            buckets.take(f"client{i}", 2, 60, 0.0)
+            buckets.take("regular", 2, 60, 0.0)
+            self.assertLessEqual(len(buckets.buckets), 4)
+
+        self.assertIn("regular", buckets.buckets)
+        self.assertNotIn("client0", buckets.buckets)
+
+
+@override_settings(THROTTLE_ENABLED=True, REST_FRAMEWORK=throttle_settings())
+@mock.patch.object(APIView, "throttle_classes", THROTTLE_CLASSES)
+class BookThrottleTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        get_buckets().clear()
+        self.client = APIClient()
+
+    def assertThrottledAfter(self, requests: int, **extra) -> None:
+        for _ in range(requests):
+            self.assertEqual(self.client.get(BOOKS_URL, **extra).status_code, status.HTTP_200_OK)
+
+        res = self.client.get(BOOKS_URL, **extra)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(res["Retry-After"]), 0)
+
+    def test_catalog_is_limited_per_ip_address(self) -> None:
+        self.assertThrottledAfter(3)
+        self.assertThrottledAfter(3, REMOTE_ADDR="10.0.0.2")
+
+    def test_catalog_is_limited_per_user(self) -> None:
+        for email in ("one@user.com", "two@user.com"):
+            user = get_user_model().objects.create_user(email, "Testpassword123@")
+            self.client.force_authenticate(user)
+            self.assertThrottledAfter(3)
+
+    def test_forwarded_for_header_cannot_pick_the_client_address(self) -> None:
+        for i in range(3):
+            self.client.get(BOOKS_URL, HTTP_X_FORWARDED_FOR=f"203.0.113.{i}")
+
+        res = self.client.get(BOOKS_URL, HTTP_X_FORWARDED_FOR="203.0.113.99")
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=throttle_settings(NUM_PROXIES=1))
+    def test_forwarded_for_header_of_a_trusted_proxy(self) -> None:
+        self.assertThrottledAfter(3, HTTP_X_FORWARDED_FOR="203.0.113.1")
+        self.assertThrottledAfter(3, HTTP_X_FORWARDED_FOR="spoofed, 203.0.113.2")
+
+    def test_throttles_follow_throttle_enabled(self) -> None:
+        with self.settings(THROTTLE_ENABLED=False):
+            for _ in range(5):
+                self.assertEqual(self.client.get(BOOKS_URL).status_code, status.HTTP_200_OK)
+
+    def test_other_endpoints_have_their_own_limits(self) -> None:
+        self.assertThrottledAfter(3)
+
+        res = self.client.post(reverse("users:create"), {"email": "a@a.com", "password": "x"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        REST_FRAMEWORK=throttle_settings(THROTTLE_BUCKETS="config.throttling.CacheBuckets")
+    )
+    def test_cache_buckets(self) -> None:
+        self.assertIsInstance(get_buckets(), CacheBuckets)
+        self.assertThrottledAfter(3)
+
+
+class RendererTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        Book.objects.bulk_create(
+            Book(
+                title=f"Book {i}", author="Author", cover="Soft", inventory=1, daily_fee="1.25"
+            )
+            for i in range(50)
+        )
+
+    def test_orjson_output_is_identical_to_drf(self) -> None:
+        data = {
+            "fee": Decimal("1.50"),
+            "date": date(2023, 9, 14),
+            "at": datetime(2023, 9, 14, 10, 30, 0, 123456, tzinfo=timezone.utc),
+            "naive": datetime(2023, 9, 14, 10, 30),
+            "duration": timedelta(days=1, seconds=5),
+            "id": uuid.UUID(int=7),
+            "detail": gettext_lazy("Not found."),
+            "text": "caf\u00e9 \u2028 \u2029 \"quoted\"",
+            "nested": [{1: None, "ok": True, "n": 1.5}],
+        }
+        for accepted_media_type in (None, "application/json; indent=4"):
+            with self.subTest(accepted_media_type=accepted_media_type):
+                self.assertEqual(
+                    ORJSONRenderer().render(data, accepted_media_type),
+                    JSONRenderer().render(data, accepted_media_type),
+                )
+
+    def test_api_renders_with_orjson(self) -> None:
+        res = self.client.get(BOOKS_URL)
+
+        self.assertIsInstance(res.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(res.content, JSONRenderer().render(res.data))
+        self.assertEqual(res.json()["results"][0]["daily_fee"], "1.25")
+
+    def test_large_json_is_gzipped(self) -> None:
+        plain = self.client.get(BOOKS_URL)
+        res = self.client.get(BOOKS_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", res["Vary"])
+        self.assertTrue(res["ETag"].startswith('W/"'))
+        self.assertLess(len(res.content), len(plain.content))
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+
+    def test_small_and_html_responses_are_not_compressed(self) -> None:
+        url = reverse("books:book-detail", args=[Book.objects.first().id])
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+        res = self.client.get(BOOKS_URL, HTTP_ACCEPT="text/html", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_is_preferred(self) -> None:
+        plain = self.client.get(BOOKS_URL)
+        res = self.client.get(BOOKS_URL, HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(res.content), plain.content)
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_content_negotiation(self) -> None:
+        plain = self.client.get(BOOKS_URL)
+        res = self.client.get(BOOKS_URL, HTTP_ACCEPT=MessagePackRenderer.media_type)
+
+        self.assertEqual(res["Content-Type"], MessagePackRenderer.media_type)
+        self.assertEqual(msgpack.unpackb(res.content), plain.json())
+
+        staff = get_user_model().objects.create_user("admin@admin.com", "test123@", is_staff=True)
+        self.client.force_authenticate(staff)
+        payload = {"title": "New", "author": "Author", "inventory": 1, "daily_fee": "2.00"}
+        res = self.client.post(
+            BOOKS_URL,
+            msgpack.packb(payload),
+            content_type=MessagePackRenderer.media_type,
+            HTTP_ACCEPT=MessagePackRenderer.media_type,
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(res.content)["daily_fee"], "2.00")
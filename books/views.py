@@ -1,11 +1,118 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import QuerySet
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
+from books.cache import cached_catalog_response
 from books.models import Book
+from books.pagination import BookPagination
 from books.permissions import IsAdminOrReadOnly
+from books.search import search_books
 from books.serializers import BookSerializer
+from books.signals import stock_added
+from config.field_plans import ValuesListMixin
+from config.sparse_fields import SparseFieldsMixin
+
+# Every sort option ends with "id" so pages are stable, and each one has a
+# matching index in Book.Meta.indexes so the database never sorts the catalog.
+BOOK_ORDERINGS = {
+    "author": ("author", "title", "id"),
+    "title": ("title", "id"),
+    "daily_fee": ("daily_fee", "id"),
+}
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(SparseFieldsMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = BookPagination
+    throttle_scope = "books"
+    # Writes include the (author, title, cover) uniqueness check. An update
+    # that raises the inventory may lend the new copies to waiting holds,
+    # which is most of its budget (see borrowings.holds).
+    query_budget = {
+        "list": 3,
+        "retrieve": 2,
+        "create": 3,
+        "update": 12,
+        "partial_update": 12,
+        "destroy": 6,
+    }
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+
+        search = self.request.query_params.get("search")
+        author = self.request.query_params.get("author")
+        cover = self.request.query_params.get("cover")
+        in_stock = self.request.query_params.get("in_stock")
+        min_fee = self._get_decimal_param("min_fee")
+        max_fee = self._get_decimal_param("max_fee")
+        ordering = self.request.query_params.get("ordering")
+
+        if search:
+            queryset = search_books(queryset, search)
+
+        if author:
+            queryset = queryset.filter(author=author)
+
+        if cover:
+            if cover not in Book.CoverChoices.values:
+                raise ValidationError({"cover": f"Choose one of {Book.CoverChoices.values}."})
+            queryset = queryset.filter(cover=cover)
+
+        if in_stock and in_stock.lower() == "true":
+            queryset = queryset.filter(inventory__gt=0)
+
+        if min_fee is not None:
+            queryset = queryset.filter(daily_fee__gte=min_fee)
+
+        if max_fee is not None:
+            queryset = queryset.filter(daily_fee__lte=max_fee)
+
+        if ordering:
+            field = ordering.removeprefix("-")
+            if field not in BOOK_ORDERINGS:
+                raise ValidationError({"ordering": f"Choose one of {list(BOOK_ORDERINGS)}."})
+            prefix = "-" if ordering.startswith("-") else ""
+            queryset = queryset.order_by(*(prefix + name for name in BOOK_ORDERINGS[field]))
+
+        return queryset
+
+    def list(self, request, *args, **kwargs) -> Response:
+        return cached_catalog_response(
+            request, lambda: super(BookViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        return cached_catalog_response(
+            request, lambda: super(BookViewSet, self).retrieve(request, *args, **kwargs)
+        )
+
+    def perform_update(self, serializer: BookSerializer) -> None:
+        inventory = serializer.validated_data.get("inventory", serializer.instance.inventory)
+        added = inventory > serializer.instance.inventory
+        with transaction.atomic():
+            book = serializer.save()
+            if added:
+                # New copies go to the hold queue before the shelf.
+                stock_added.send(sender=Book, books=Book.objects.filter(pk=book.pk))
+
+    def _get_decimal_param(self, name: str) -> Decimal | None:
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            number = None
+        # Decimal() also accepts "NaN" and "Infinity", which no fee compares to.
+        if number is None or not number.is_finite():
+            raise ValidationError({name: "A valid number is required."})
+        return number
@@ -1,6 +1,10 @@
 from django.contrib import admin
 
-from borrowings.models import Borrowing
+from borrowings.models import BookCirculation, Borrowing, Hold, OutboxNotification, OverdueReminder
 
 
 admin.site.register(Borrowing)
+admin.site.register(OutboxNotification)
+admin.site.register(OverdueReminder)
+admin.site.register(BookCirculation)
+admin.site.register(Hold)
@@ -0,0 +1,56 @@
+"""Async versions of the busiest borrowing endpoints, served under ASGI.
+
+`borrowings.urls` routes to these instead of the sync views when
+settings.ASYNC_VIEWS is on, which only makes sense under `config.asgi`. Reads
+that map onto a single query use the async ORM. Checkout and return run their
+transactions through `sync_to_async` in the request's thread-sensitive
+executor, because Django cannot run a transaction from async code. The
+notifications they write go to the outbox, so no Telegram I/O happens while
+serving the request.
+"""
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.response import Response
+
+from borrowings.views import BorrowingListView, BorrowingRetrieveView, ReturnBorrowingView
+from config.async_views import AsyncAPIViewMixin
+from config.idempotency import aidempotent
+
+
+class AsyncBorrowingListView(AsyncAPIViewMixin, BorrowingListView):
+    async def get(self, request, *args, **kwargs) -> Response:
+        # Cursor pagination and the values_list() fast path are synchronous.
+        return await sync_to_async(self.list)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs) -> Response:
+        return await sync_to_async(self.create, thread_sensitive=True)(
+            request, *args, **kwargs
+        )
+
+
+class AsyncBorrowingRetrieveView(AsyncAPIViewMixin, BorrowingRetrieveView):
+    async def get(self, request, *args, **kwargs) -> Response:
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+class AsyncReturnBorrowingView(AsyncAPIViewMixin, ReturnBorrowingView):
+    async def put(self, request, *args, **kwargs) -> Response:
+        return await aidempotent(request, partial(self.areturn_borrowing, request))
+
+    async def patch(self, request, *args, **kwargs) -> Response:
+        return await self.put(request, *args, **kwargs)
+
+    async def areturn_borrowing(self, request) -> Response:
+        instance = await self.aget_object()
+        refusal = self.check_returnable(instance)
+        if refusal:
+            return refusal
+
+        serializer = self.get_serializer(instance, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        await sync_to_async(self.perform_return, thread_sensitive=True)(serializer)
+
+        return Response({"detail": "Borrowing returned successfully."}, status=status.HTTP_200_OK)
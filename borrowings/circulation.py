@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from borrowings.fees import DaysBetween
+
+BATCH_SIZE = 1000
+
+
+def rebuild_circulation(borrowing_model=None, circulation_model=None) -> int:
+    """Recompute every BookCirculation row with one GROUP BY over borrowings.
+
+    The models can be passed in so the backfill migration can run this with
+    historical models. Returns the number of books with borrowings.
+    """
+    if borrowing_model is None or circulation_model is None:
+        from borrowings.models import BookCirculation, Borrowing
+
+        borrowing_model, circulation_model = Borrowing, BookCirculation
+
+    returned = Q(actual_return_date__isnull=False)
+    rows = (
+        borrowing_model.objects.order_by()
+        .values("book_id")
+        .annotate(
+            total_borrows=Count("id"),
+            currently_out=Count("id", filter=Q(actual_return_date__isnull=True)),
+            returned=Count("id", filter=returned),
+            total_loan_days=Coalesce(
+                Sum(DaysBetween(F("actual_return_date"), F("borrow_date")), filter=returned),
+                Value(0),
+            ),
+            last_borrowed=Max("borrow_date"),
+        )
+    )
+
+    with transaction.atomic():
+        circulation_model.objects.all().delete()
+        books = circulation_model.objects.bulk_create(
+            (circulation_model(**row) for row in rows.iterator(chunk_size=BATCH_SIZE)),
+            batch_size=BATCH_SIZE,
+        )
+    return len(books)
@@ -0,0 +1,66 @@
+import csv
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+# Output column -> queryset lookup. Related columns come from the same JOIN,
+# so every row is a flat tuple and no model instances are built.
+EXPORT_COLUMNS = {
+    "id": "id",
+    "borrow_date": "borrow_date",
+    "expected_return_date": "expected_return_date",
+    "actual_return_date": "actual_return_date",
+    "book": "book_id",
+    "book_title": "book__title",
+    "book_author": "book__author",
+    "user": "user_id",
+    "user_email": "user__email",
+}
+CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_rows(queryset: QuerySet, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    """Yield borrowings as tuples in EXPORT_COLUMNS order, oldest first.
+
+    `iterator()` fetches `chunk_size` rows at a time (through a server-side
+    cursor on PostgreSQL), so memory does not grow with the result size.
+    """
+    return (
+        queryset.order_by("borrow_date", "id")
+        .values_list(*EXPORT_COLUMNS.values())
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """File-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def ndjson_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_COLUMNS, row))) + "\n"
+
+
+def csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+WRITERS = {"ndjson": ndjson_lines, "csv": csv_lines}
+
+
+def export_borrowings(
+    queryset: QuerySet, file_format: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    return WRITERS[file_format](export_rows(queryset, chunk_size))
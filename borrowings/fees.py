@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import (
+    Count,
+    DateField,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Func,
+    IntegerField,
+    QuerySet,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Greatest, Least
+
+CENT = Decimal("0.01")
+
+
+def money_field() -> DecimalField:
+    return DecimalField(max_digits=14, decimal_places=2)
+
+
+def fine_multiplier() -> Decimal:
+    return Decimal(str(settings.BORROWING_FINE_MULTIPLIER))
+
+
+class DaysBetween(Func):
+    """Whole days from `start` to `end`, negative when `end` comes first."""
+
+    arity = 2
+    template = "(%(expressions)s)"
+    arg_joiner = " - "
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra) -> None:
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="DATEDIFF(%(expressions)s)", arg_joiner=", ",
+            **extra_context,
+        )
+
+
+@dataclass(frozen=True)
+class Fees:
+    rental_days: int
+    overdue_days: int
+    rental_fee: Decimal
+    overdue_fine: Decimal
+
+    @property
+    def total_fee(self) -> Decimal:
+        return self.rental_fee + self.overdue_fine
+
+
+def calculate_fees(borrowing, today: date | None = None) -> Fees:
+    """Fees of a single borrowing, computed the same way as `with_fees()`.
+
+    Rent is charged from the borrow date until the book comes back, capped at
+    the expected return date, for at least one day. Every day past the
+    expected return date costs the daily fee times BORROWING_FINE_MULTIPLIER.
+    Open borrowings are priced as if returned `today`.
+    """
+    end = borrowing.actual_return_date or today or date.today()
+    daily_fee = Decimal(str(borrowing.book.daily_fee))
+    rental_days = max((min(end, borrowing.expected_return_date) - borrowing.borrow_date).days, 1)
+    overdue_days = max((end - borrowing.expected_return_date).days, 0)
+    return Fees(
+        rental_days=rental_days,
+        overdue_days=overdue_days,
+        rental_fee=(rental_days * daily_fee).quantize(CENT),
+        overdue_fine=(overdue_days * daily_fee * fine_multiplier()).quantize(CENT),
+    )
+
+
+def fee_expressions(today: date | None = None) -> dict:
+    end = Coalesce(
+        "actual_return_date", Value(today or date.today(), output_field=DateField())
+    )
+    rental_days = Greatest(
+        DaysBetween(Least(end, F("expected_return_date")), F("borrow_date")), Value(1)
+    )
+    overdue_days = Greatest(DaysBetween(end, F("expected_return_date")), Value(0))
+    rental_fee = ExpressionWrapper(
+        rental_days * F("book__daily_fee"), output_field=money_field()
+    )
+    overdue_fine = ExpressionWrapper(
+        overdue_days * F("book__daily_fee") * Value(fine_multiplier(), output_field=money_field()),
+        output_field=money_field(),
+    )
+    return {
+        "rental_days": rental_days,
+        "overdue_days": overdue_days,
+        "rental_fee": rental_fee,
+        "overdue_fine": overdue_fine,
+        "total_fee": ExpressionWrapper(rental_fee + overdue_fine, output_field=money_field()),
+    }
+
+
+def with_fees(queryset: QuerySet, today: date | None = None) -> QuerySet:
+    """Annotate rental_days, overdue_days, rental_fee, overdue_fine, total_fee.
+
+    Everything is computed by the database, so the annotated queryset can be
+    filtered, ordered or paginated on fees like on any other column.
+    """
+    return queryset.annotate(**fee_expressions(today))
+
+
+def fee_totals(queryset: QuerySet, today: date | None = None) -> dict:
+    """Sum fees over a borrowing queryset in a single aggregate query."""
+    expressions = fee_expressions(today)
+    totals = queryset.aggregate(
+        count=Count("id"),
+        **{
+            name: Coalesce(Sum(expressions[name]), Value(Decimal(0)), output_field=money_field())
+            for name in ("rental_fee", "overdue_fine", "total_fee")
+        },
+    )
+    return {
+        name: value if name == "count" else value.quantize(CENT)
+        for name, value in totals.items()
+    }
@@ -0,0 +1,29 @@
+from typing import Mapping
+
+from django.db.models import QuerySet
+
+
+def filter_borrowings(queryset: QuerySet, user, params: Mapping) -> QuerySet:
+    """Apply the borrowing list filters shared by the list and export views.
+
+    Non-staff users only ever see their own borrowings; staff may narrow the
+    list with `user_id`. `is_active` keeps open ("true") or returned borrowings.
+    `user=None` means a trusted caller such as a management command.
+    """
+    is_active = params.get("is_active")
+    user_id = params.get("user_id")
+    is_staff = user is None or user.is_staff
+
+    if not is_staff:
+        queryset = queryset.filter(user_id=user.id)
+
+    if is_staff and user_id:
+        queryset = queryset.filter(user__id=int(user_id))
+
+    if is_active:
+        if str(is_active).lower() == "true":
+            queryset = queryset.filter(actual_return_date__isnull=True)
+        else:
+            queryset = queryset.exclude(actual_return_date__isnull=True)
+
+    return queryset
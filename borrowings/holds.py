@@ -0,0 +1,136 @@
+"""Hand returned copies straight to the patrons waiting for them.
+
+Returns call `allocate_returned_copies()` inside their transaction, and
+copies put on the shelf otherwise (books.signals.stock_added) go through
+`lend_shelved_copies()`, so nobody takes them ahead of the queue. A
+book's queue is read head first through hold_queue_idx, so handing over a
+copy costs one index seek however long the queue is, and the patron gets
+a message on Telegram instead of polling the book until a copy shows up.
+
+Returns and new holds (HoldSerializer.create) both lock the book row
+first: a hold is either seen by the return or placed after the copy is
+back on the shelf, where it is refused.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import BookCirculation, Borrowing, Hold
+from borrowings.notifications import enqueue_notifications
+
+
+def next_holds(copies: dict[int, int]) -> list[Hold]:
+    """Lock the first `copies[book_id]` waiting holds of each book.
+
+    Holds locked by a concurrent return are skipped, so two returns of the
+    same book serve two different patrons.
+    """
+    # One index-only query finds the queues that have anyone waiting, so a
+    # return nobody is waiting for costs a single statement.
+    book_ids = (
+        Hold.objects.waiting()
+        .filter(book_id__in=list(copies))
+        .order_by()
+        .values_list("book_id", flat=True)
+        .distinct()
+    )
+
+    holds = []
+    for book_id in book_ids:
+        holds.extend(
+            Hold.objects.queue(book_id)
+            .select_related("book", "user")
+            .select_for_update(skip_locked=True, of=("self",))[: copies[book_id]]
+        )
+    return holds
+
+
+def allocate_returned_copies(copies: dict[int, int]) -> Counter:
+    """Lend `copies[book_id]` returned copies of each book to its oldest holds.
+
+    Each fulfilled hold becomes a borrowing of its `loan_days` from today,
+    is counted as a checkout and queues a notification to the staff chat
+    and, if they gave a telegram_chat_id, to the patron. Returns the copies
+    nobody was waiting for, which the caller puts back on the shelf.
+    """
+    # Wait for holds being placed on these books to commit, and make new
+    # ones wait for this return, see the module docstring.
+    books = Book.objects.select_for_update().filter(pk__in=list(copies)).order_by("pk")
+    list(books.values_list("pk", flat=True))
+    return lend_to_holds(copies)
+
+
+def lend_to_holds(copies: dict[int, int]) -> Counter:
+    """Like allocate_returned_copies(), with the books already locked."""
+    leftover = Counter(copies)
+    holds = next_holds(copies)
+    if not holds:
+        return leftover
+
+    today = date.today()
+    borrowings = Borrowing.objects.bulk_create(
+        Borrowing(
+            book_id=hold.book_id,
+            user_id=hold.user_id,
+            expected_return_date=today + timedelta(days=hold.loan_days),
+        )
+        for hold in holds
+    )
+    now = timezone.now()
+    for hold, borrowing in zip(holds, borrowings):
+        hold.status = Hold.FULFILLED
+        hold.fulfilled_at = now
+        hold.borrowing = borrowing
+        leftover[hold.book_id] -= 1
+    Hold.objects.bulk_update(holds, ["status", "fulfilled_at", "borrowing"])
+
+    BookCirculation.objects.record_checkouts(
+        Counter(hold.book_id for hold in holds), borrowings[0].borrow_date
+    )
+    texts, chat_ids = [], []
+    for hold in holds:
+        texts.append(
+            f"{hold.user.first_name} {hold.user.last_name} borrowed {hold.book.title}, "
+            f"{hold.book.author} from the hold queue till {hold.borrowing.expected_return_date}"
+        )
+        chat_ids.append("")
+        if hold.user.telegram_chat_id:
+            texts.append(
+                f"{hold.book.title}, {hold.book.author} is yours: a copy came back and "
+                f"is lent to you till {hold.borrowing.expected_return_date}."
+            )
+            chat_ids.append(hold.user.telegram_chat_id)
+    enqueue_notifications(texts, chat_ids)
+    return +leftover
+
+
+def lend_shelved_copies(books: QuerySet) -> None:
+    """Lend the copies on the shelf of `books` to the holds waiting for them.
+
+    If nobody is waiting for any of them this costs a single query.
+    """
+    waiting = list(
+        Hold.objects.waiting()
+        .filter(book__in=books)
+        .order_by()
+        .values_list("book_id", flat=True)
+        .distinct()
+    )
+    if not waiting:
+        return
+
+    copies = dict(
+        Book.objects.select_for_update()
+        .filter(pk__in=waiting, inventory__gt=0)
+        .order_by("pk")
+        .values_list("pk", "inventory")
+    )
+    if not copies:
+        return
+    lent = Counter(copies)
+    lent.subtract(lend_to_holds(copies))
+    if +lent:
+        Book.objects.reserve_many(+lent)
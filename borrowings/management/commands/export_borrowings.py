@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from borrowings.export import CHUNK_SIZE, WRITERS, export_borrowings
+from borrowings.filters import filter_borrowings
+from borrowings.models import Borrowing
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the borrowing history as NDJSON or CSV, oldest first. "
+        "Takes the same user_id / is_active filters as the borrowing list."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--format", choices=WRITERS, default="ndjson")
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="File to write to. Defaults to stdout.",
+        )
+        parser.add_argument("--user-id", type=int)
+        parser.add_argument("--is-active", choices=["true", "false"])
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options) -> None:
+        queryset = filter_borrowings(
+            Borrowing.objects.all(),
+            None,
+            {"user_id": options["user_id"], "is_active": options["is_active"]},
+        )
+        lines = export_borrowings(queryset, options["format"], options["chunk_size"])
+
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with options["output"].open("w", newline="", encoding="utf-8") as file:
+            file.writelines(lines)
+        self.stderr.write(f"Exported borrowings to {options['output']}.")
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from borrowings.overdue import process_overdue
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue one Telegram reminder per user listing their overdue borrowings. "
+        "Borrowings already reminded about are skipped, so it is safe to rerun."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            help="Treat this day (YYYY-MM-DD) as today. Defaults to the current date.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count overdue borrowings without queueing reminders.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        report = process_overdue(today=options["date"], dry_run=options["dry_run"])
+        action = "Found" if options["dry_run"] else "Queued reminders for"
+        self.stdout.write(
+            f"{action} {report.borrowings} overdue borrowing(s) of {report.users} user(s)."
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from borrowings.circulation import rebuild_circulation
+
+
+class Command(BaseCommand):
+    help = "Recompute per-book circulation statistics from the borrowing history."
+
+    def handle(self, *args, **options) -> None:
+        books = rebuild_circulation()
+        self.stdout.write(f"Rebuilt circulation statistics for {books} book(s).")
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from borrowings.notifications import BATCH_SIZE, MAX_ATTEMPTS, deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver pending Telegram notifications from the outbox."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once it is drained.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when the outbox is empty.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        sent = failed = given_up = 0
+        while True:
+            report = deliver_pending(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+            )
+            sent += report.sent
+            failed += report.failed
+            given_up += report.given_up
+
+            if report.processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(f"Sent {sent} notification(s), {failed} failed.")
+        if given_up:
+            self.stderr.write(
+                f"Gave up on {given_up} notification(s) after "
+                f"{options['max_attempts']} attempts."
+            )
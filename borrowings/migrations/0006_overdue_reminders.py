@@ -0,0 +1,57 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings", "0005_borrowing_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OverdueReminder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return_date__isnull", True)),
+                fields=["user", "expected_return_date"],
+                name="borrowing_overdue_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="overduereminder",
+            name="borrowing",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="overdue_reminder",
+                to="borrowings.borrowing",
+            ),
+        ),
+        migrations.AddField(
+            model_name="overduereminder",
+            name="notification",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="overdue_reminders",
+                to="borrowings.outboxnotification",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from borrowings.circulation import rebuild_circulation
+
+
+def backfill(apps, schema_editor) -> None:
+    rebuild_circulation(
+        apps.get_model("borrowings", "Borrowing"),
+        apps.get_model("borrowings", "BookCirculation"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0003_book_search_index"),
+        ("borrowings", "0006_overdue_reminders"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookCirculation",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="circulation",
+                        serialize=False,
+                        to="books.book",
+                    ),
+                ),
+                ("total_borrows", models.PositiveIntegerField(default=0)),
+                ("currently_out", models.PositiveIntegerField(default=0)),
+                ("returned", models.PositiveIntegerField(default=0)),
+                ("total_loan_days", models.PositiveBigIntegerField(default=0)),
+                ("last_borrowed", models.DateField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["book_id"],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
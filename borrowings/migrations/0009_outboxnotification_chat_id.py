@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings", "0008_holds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxnotification",
+            name="chat_id",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
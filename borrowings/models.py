@@ -1,7 +1,10 @@
+from collections import Counter
 from datetime import date
 from django.conf import settings
-from django.db import models
-from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.utils import timezone
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.core.exceptions import ValidationError
 
 from books.models import Book
@@ -23,6 +26,23 @@ class Borrowing(models.Model):
 
     class Meta:
         ordering = ["borrow_date"]
+        indexes = [
+            models.Index(fields=["borrow_date", "id"], name="borrowing_date_id_idx"),
+            models.Index(
+                fields=["user", "actual_return_date", "borrow_date"],
+                name="borrowing_user_active_idx",
+            ),
+            models.Index(
+                fields=["borrow_date", "id"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_idx",
+            ),
+            models.Index(
+                fields=["user", "expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_overdue_idx",
+            ),
+        ]
 
     def full_clean(self, exclude=None, validate_unique=True):
         super().full_clean(exclude=exclude, validate_unique=validate_unique)
@@ -33,4 +53,199 @@ class Borrowing(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if adding:
+                # Every saved borrowing is a checkout, wherever it was created
+                # (API, admin, shell); bulk_create() callers count their own.
+                BookCirculation.objects.record_checkouts({self.book_id: 1}, self.borrow_date)
+
+
+class OutboxNotification(models.Model):
+    text = models.TextField()
+    # Telegram chat to post to; blank means the staff chat, USER_ID.
+    chat_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self) -> str:
+        return f"Notification #{self.id} ({'sent' if self.sent_at else 'pending'})"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(sent_at__isnull=True),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+
+class OverdueReminder(models.Model):
+    """Records that a borrowing's overdue reminder was queued for sending."""
+
+    borrowing = models.OneToOneField(
+        Borrowing, on_delete=models.CASCADE, related_name="overdue_reminder"
+    )
+    notification = models.ForeignKey(
+        OutboxNotification,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="overdue_reminders",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Overdue reminder for borrowing #{self.borrowing_id}"
+
+
+class BookCirculationQuerySet(models.QuerySet):
+    def record_checkouts(self, copies: dict[int, int], borrow_date: date) -> None:
+        """Count `copies[book_id]` new borrowings of each book.
+
+        Rows are created on first use, then all books are bumped with one
+        UPDATE, inside the caller's checkout transaction.
+        """
+        self.bulk_create(
+            [BookCirculation(book_id=book_id) for book_id in copies], ignore_conflicts=True
+        )
+        per_book = self._per_book(copies)
+        self.filter(book_id__in=copies).update(
+            total_borrows=F("total_borrows") + per_book,
+            currently_out=F("currently_out") + per_book,
+            last_borrowed=borrow_date,
+        )
+
+    def record_returns(self, loans: list[tuple[int, int]]) -> None:
+        """Count returns given as (book_id, loan_days) pairs in one UPDATE."""
+        returned = Counter()
+        loan_days = Counter()
+        for book_id, days in loans:
+            returned[book_id] += 1
+            loan_days[book_id] += days
+
+        per_book = self._per_book(returned)
+        self.filter(book_id__in=returned).update(
+            currently_out=F("currently_out") - per_book,
+            returned=F("returned") + per_book,
+            total_loan_days=F("total_loan_days") + self._per_book(loan_days),
+        )
+
+    @staticmethod
+    def _per_book(values: dict[int, int]) -> Case:
+        return Case(
+            *(When(book_id=book_id, then=Value(value)) for book_id, value in values.items()),
+            output_field=models.PositiveBigIntegerField(),
+        )
+
+
+class BookCirculation(models.Model):
+    """Running circulation totals of a book, maintained by checkout and return.
+
+    `manage.py rebuild_circulation` recomputes the table from borrowings.
+    """
+
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="circulation"
+    )
+    total_borrows = models.PositiveIntegerField(default=0)
+    currently_out = models.PositiveIntegerField(default=0)
+    returned = models.PositiveIntegerField(default=0)
+    total_loan_days = models.PositiveBigIntegerField(default=0)
+    last_borrowed = models.DateField(null=True, blank=True)
+
+    objects = BookCirculationQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f"Circulation of book #{self.book_id}"
+
+    @property
+    def average_loan_days(self) -> float | None:
+        if not self.returned:
+            return None
+        return round(self.total_loan_days / self.returned, 2)
+
+    class Meta:
+        ordering = ["book_id"]
+
+
+class HoldQuerySet(models.QuerySet):
+    def waiting(self) -> "HoldQuerySet":
+        return self.filter(status=Hold.WAITING)
+
+    def queue(self, book_id: int) -> "HoldQuerySet":
+        """A book's waiting holds, first come first served, via hold_queue_idx."""
+        return self.waiting().filter(book_id=book_id).order_by("id")
+
+    def with_positions(self) -> "HoldQuerySet":
+        """Annotate waiting holds with their 1-based place in the book's queue."""
+        ahead = (
+            Hold.objects.waiting()
+            .filter(book_id=OuterRef("book_id"), id__lte=OuterRef("id"))
+            .order_by()
+            .values("book_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return self.annotate(
+            position=Case(When(status=Hold.WAITING, then=Subquery(ahead)), default=None)
+        )
+
+
+class Hold(models.Model):
+    """A patron's place in the FIFO waitlist of an out-of-stock book.
+
+    A returned copy goes straight to the oldest waiting hold of its book,
+    which becomes a borrowing of `loan_days` days.
+    """
+
+    WAITING = "waiting"
+    FULFILLED = "fulfilled"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (WAITING, "Waiting"),
+        (FULFILLED, "Fulfilled"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="holds"
+    )
+    loan_days = models.PositiveSmallIntegerField(
+        default=14, validators=[MinValueValidator(1), MaxValueValidator(60)]
+    )
+    status = models.CharField(max_length=9, choices=STATUS_CHOICES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    fulfilled_at = models.DateTimeField(null=True, blank=True)
+    borrowing = models.OneToOneField(
+        Borrowing, on_delete=models.SET_NULL, null=True, blank=True, related_name="hold"
+    )
+
+    objects = HoldQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f"Hold #{self.id} on book #{self.book_id} ({self.status})"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["book", "id"],
+                condition=models.Q(status="waiting"),
+                name="hold_queue_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "user"],
+                condition=models.Q(status="waiting"),
+                name="hold_one_waiting_per_user",
+            ),
+        ]
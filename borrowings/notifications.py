@@ -1,13 +1,175 @@
 import os
+import logging
 import telegram
 import asyncio
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
 from dotenv import load_dotenv
+from django.db import transaction
+from django.utils import timezone
+
+from borrowings.models import OutboxNotification
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 api_key = os.getenv("API_KEY")
 user_id = os.getenv("USER_ID")
+api_url = os.getenv("API_URL", "https://api.telegram.org/bot")
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+LEASE_SECONDS = 5 * 60
+# Telegram throttles bots that post to one chat in bursts, so messages to
+# the same chat are sent this many at a time.
+PER_CHAT_CONCURRENCY = 1
+# A send that takes longer fails and is retried with backoff. With sends to
+# a chat queued behind each other, a batch takes at most MAX_PER_CHAT
+# messages per chat so that it is done within half of its lease: past the
+# lease, another worker would claim the same rows and send them again.
+SEND_TIMEOUT_SECONDS = 10
+MAX_PER_CHAT = PER_CHAT_CONCURRENCY * (LEASE_SECONDS // 2 // SEND_TIMEOUT_SECONDS)
+
+
+def get_bot() -> telegram.Bot:
+    return telegram.Bot(token=api_key, base_url=api_url)
+
+
+async def send_notification(
+    text: str, bot: telegram.Bot | None = None, chat_id: str | None = None
+) -> None:
+    """Post `text` to `chat_id`, or to the staff chat, USER_ID."""
+    bot = bot or get_bot()
+    await bot.send_message(chat_id=chat_id or user_id, text=text)
+
+
+def enqueue_notification(text: str) -> OutboxNotification:
+    """Store a notification in the outbox, to be sent by `send_notifications`.
+
+    Call it inside the transaction that writes the data the message is about,
+    so the notification is recorded if and only if that transaction commits.
+    """
+    return OutboxNotification.objects.create(text=text)
+
+
+def enqueue_notifications(
+    texts: list[str], chat_ids: list[str] | None = None
+) -> list[OutboxNotification]:
+    """Store many notifications with one INSERT per BATCH_SIZE rows.
+
+    `chat_ids[i]` is the chat of `texts[i]`; without it every message goes
+    to the staff chat.
+    """
+    chat_ids = chat_ids or [""] * len(texts)
+    return OutboxNotification.objects.bulk_create(
+        [
+            OutboxNotification(text=text, chat_id=chat_id)
+            for text, chat_id in zip(texts, chat_ids)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    seconds = BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, BACKOFF_MAX_SECONDS))
+
+
+@dataclass
+class DeliveryReport:
+    sent: int = 0
+    failed: int = 0
+    given_up: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+
+def claim_batch(
+    batch_size: int = BATCH_SIZE, max_attempts: int = MAX_ATTEMPTS
+) -> list[OutboxNotification]:
+    """Lease a batch of due notifications so that parallel workers skip them.
+
+    Notifications past the first MAX_PER_CHAT to a chat are left for the
+    next batch.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        pending = OutboxNotification.objects.select_for_update(skip_locked=True).filter(
+            sent_at__isnull=True, next_attempt_at__lte=now, attempts__lt=max_attempts
+        )
+        per_chat = Counter()
+        batch = []
+        for item in pending[:batch_size]:
+            per_chat[item.chat_id] += 1
+            if per_chat[item.chat_id] <= MAX_PER_CHAT:
+                batch.append(item)
+        OutboxNotification.objects.filter(id__in=[item.id for item in batch]).update(
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+        )
+    return batch
+
+
+async def _send_batch(bot: telegram.Bot, batch: list[OutboxNotification]) -> list:
+    chats = defaultdict(lambda: asyncio.Semaphore(PER_CHAT_CONCURRENCY))
+
+    async def send(item: OutboxNotification) -> None:
+        chat_id = item.chat_id or user_id
+        async with chats[chat_id]:
+            await asyncio.wait_for(
+                send_notification(item.text, bot=bot, chat_id=chat_id), SEND_TIMEOUT_SECONDS
+            )
+
+    async with bot:
+        return await asyncio.gather(*(send(item) for item in batch), return_exceptions=True)
+
+
+def deliver_pending(
+    bot: telegram.Bot | None = None,
+    batch_size: int = BATCH_SIZE,
+    max_attempts: int = MAX_ATTEMPTS,
+) -> DeliveryReport:
+    """Send one batch from the outbox, rescheduling failures with backoff.
+
+    A notification that fails its last attempt is logged as an error and
+    stays in the outbox unsent, with `last_error` set.
+    """
+    report = DeliveryReport()
+    batch = claim_batch(batch_size, max_attempts)
+    if not batch:
+        return report
+
+    try:
+        results = asyncio.run(_send_batch(bot or get_bot(), batch))
+    except Exception as error:
+        results = [error] * len(batch)
+
+    now = timezone.now()
+    sent_ids = []
+    for item, result in zip(batch, results):
+        if isinstance(result, Exception):
+            item.attempts += 1
+            item.next_attempt_at = now + backoff_delay(item.attempts)
+            item.last_error = f"{type(result).__name__}: {result}"
+            item.save(update_fields=["attempts", "next_attempt_at", "last_error"])
+            report.failed += 1
+            if item.attempts >= max_attempts:
+                logger.error(
+                    "Giving up on notification #%s after %s attempts: %s",
+                    item.id,
+                    item.attempts,
+                    item.last_error,
+                )
+                report.given_up += 1
+        else:
+            sent_ids.append(item.id)
 
-async def send_notification(text: str) -> None:
-    bot = telegram.Bot(token=api_key)
-    await bot.send_message(chat_id=user_id, text=text)
+    report.sent = OutboxNotification.objects.filter(id__in=sent_ids).update(
+        sent_at=now, last_error=""
+    )
+    return report
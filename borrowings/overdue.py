@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from borrowings.models import Borrowing, OverdueReminder
+from borrowings.notifications import enqueue_notifications
+
+OVERDUE_COLUMNS = (
+    "id",
+    "user_id",
+    "user__email",
+    "user__first_name",
+    "user__last_name",
+    "book__title",
+    "book__author",
+    "expected_return_date",
+)
+
+
+@dataclass
+class OverdueReport:
+    users: int = 0
+    borrowings: int = 0
+
+
+def pending_overdue(today: date) -> QuerySet:
+    """Open borrowings past their due date that have not been reminded yet.
+
+    Ordered by (user, expected_return_date) so that borrowing_overdue_idx
+    serves both the filter and the grouping without a sort.
+    """
+    return (
+        Borrowing.objects.filter(
+            actual_return_date__isnull=True,
+            expected_return_date__lt=today,
+            overdue_reminder__isnull=True,
+        )
+        .order_by("user_id", "expected_return_date", "id")
+        .values_list(*OVERDUE_COLUMNS)
+    )
+
+
+def reminder_text(rows: list[tuple], today: date) -> str:
+    _, _, email, first_name, last_name, *_ = rows[0]
+    lines = [
+        f"{first_name} {last_name} ({email}) has {len(rows)} overdue book(s):"
+    ]
+    for _, _, _, _, _, title, author, expected_return_date in rows:
+        days = (today - expected_return_date).days
+        lines.append(f"- {title}, {author}: due {expected_return_date}, {days} day(s) late")
+    return "\n".join(lines)
+
+
+def record_reminders(pairs) -> None:
+    """Insert (borrowing_id, notification_id) pairs as OverdueReminder rows.
+
+    Uses one prepared INSERT via executemany rather than bulk_create(),
+    which builds a model instance per overdue borrowing and compiles an
+    INSERT per batch. With 100k overdue borrowings (benchmarks.overdue)
+    that took the whole job from 3.2s to 8.0s.
+    """
+    opts = OverdueReminder._meta
+    created_at = opts.get_field("created_at").get_db_prep_save(timezone.now(), connection)
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}, {}, {}) VALUES (%s, %s, %s)".format(
+        quote(opts.db_table),
+        quote(opts.get_field("borrowing").column),
+        quote(opts.get_field("notification").column),
+        quote(opts.get_field("created_at").column),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*pair, created_at) for pair in pairs])
+
+
+def process_overdue(today: date | None = None, dry_run: bool = False) -> OverdueReport:
+    """Queue one reminder per user covering all their newly overdue borrowings.
+
+    Each reminded borrowing gets an OverdueReminder row in the same
+    transaction as the outbox entries, so a rerun only picks up borrowings
+    that became overdue since; a concurrent run fails on the unique
+    borrowing constraint instead of sending twice.
+    """
+    today = today or date.today()
+    report = OverdueReport()
+    texts = []
+    borrowing_ids = []
+
+    for _, group in groupby(pending_overdue(today), key=itemgetter(1)):
+        rows = list(group)
+        texts.append(reminder_text(rows, today))
+        borrowing_ids.append([row[0] for row in rows])
+        report.users += 1
+        report.borrowings += len(rows)
+
+    if dry_run or not texts:
+        return report
+
+    with transaction.atomic():
+        notifications = enqueue_notifications(texts)
+        record_reminders(
+            (borrowing_id, notification.id)
+            for notification, ids in zip(notifications, borrowing_ids)
+            for borrowing_id in ids
+        )
+
+    return report
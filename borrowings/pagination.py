@@ -0,0 +1,83 @@
+from datetime import date
+
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class BorrowingCursorPagination(CursorPagination):
+    """Keyset pagination over (borrow_date, id).
+
+    DRF's `CursorPagination` only seeks on the first ordering field and skips
+    ties with an OFFSET, which degrades when thousands of borrowings share a
+    `borrow_date`. Here the cursor carries both values, so every page is a
+    range scan on the (borrow_date, id) index, however deep it is.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = ("borrow_date", "id")
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+
+        if self.cursor and self.cursor.position:
+            borrow_date, pk = self._parse_position(self.cursor.position)
+            if reverse:
+                queryset = queryset.filter(borrow_date__lte=borrow_date).filter(
+                    Q(borrow_date__lt=borrow_date) | Q(id__lt=pk)
+                )
+            else:
+                queryset = queryset.filter(borrow_date__gte=borrow_date).filter(
+                    Q(borrow_date__gt=borrow_date) | Q(id__gt=pk)
+                )
+
+        if reverse:
+            queryset = queryset.order_by("-borrow_date", "-id")
+        else:
+            queryset = queryset.order_by("borrow_date", "id")
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        position = self._get_position(self.page[-1]) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous:
+            return None
+        position = self._get_position(self.page[0]) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    @staticmethod
+    def _get_position(borrowing) -> str:
+        return f"{borrowing.borrow_date.isoformat()}|{borrowing.id}"
+
+    def _parse_position(self, position: str) -> tuple[date, int]:
+        try:
+            borrow_date, pk = position.split("|")
+            return date.fromisoformat(borrow_date), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
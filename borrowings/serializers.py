@@ -1,12 +1,21 @@
-import asyncio
+from collections import Counter
+from datetime import date
+from django.core.validators import MinValueValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from books.models import Book
 from books.serializers import BookSerializer
 
-from borrowings.models import Borrowing
-from borrowings.notifications import send_notification
+from borrowings.fees import calculate_fees
+from borrowings.holds import allocate_returned_copies
+from borrowings.models import BookCirculation, Borrowing, Hold
+from borrowings.notifications import enqueue_notification
+from config.sparse_fields import SparseFieldsSerializerMixin
+from users.authentication import get_full_user
+from users.serializers import UserSerializer
 
 
-class BorrowingListSerializer(serializers.ModelSerializer):
+class BorrowingListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Borrowing
         fields = (
@@ -17,11 +26,27 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "book",
             "user",
         )
+        expandable = {"book": BookSerializer, "user": UserSerializer}
 
 
-class BorrowingDetailSerializer(serializers.ModelSerializer):
+class FeeField(serializers.DecimalField):
+    """A fee annotated by `with_fees()`, or computed in Python when missing."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(max_digits=14, decimal_places=2, read_only=True, **kwargs)
+
+    def get_attribute(self, instance: Borrowing):
+        if hasattr(instance, self.source):
+            return getattr(instance, self.source)
+        return getattr(calculate_fees(instance), self.source)
+
+
+class BorrowingDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     book = BookSerializer(many=False, read_only=True)
     user = serializers.CharField(source="user.email", read_only=True)
+    rental_fee = FeeField()
+    overdue_fine = FeeField()
+    total_fee = FeeField()
 
     class Meta:
         model = Borrowing
@@ -32,7 +57,18 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
             "actual_return_date",
             "book",
             "user",
+            "rental_fee",
+            "overdue_fine",
+            "total_fee",
         )
+        expandable = {"user": UserSerializer}
+
+
+class BorrowingFeeTotalsSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    rental_fee = serializers.DecimalField(max_digits=14, decimal_places=2)
+    overdue_fine = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_fee = serializers.DecimalField(max_digits=14, decimal_places=2)
 
 
 class CreateBorrowingSerializer(serializers.ModelSerializer):
@@ -47,26 +83,225 @@ class CreateBorrowingSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data) -> Borrowing:
         book = validated_data["book"]
-        if book.inventory == 0:
-            raise serializers.ValidationError("Book is out of stock")
 
-        book.inventory -= 1
-        book.save()
+        with transaction.atomic():
+            if not book.reserve():
+                raise serializers.ValidationError("Book is out of stock")
+
+            user = get_full_user(self.context["request"].user)
+            borrowing = Borrowing.objects.create(user=user, **validated_data)
+
+            text = (
+                f"{borrowing.user.first_name} {borrowing.user.last_name} borrowed "
+                f"{borrowing.book.title}, {borrowing.book.author} till {borrowing.expected_return_date}"
+            )
+            enqueue_notification(text)
+
+        return borrowing
+
+
+class BulkCreateBorrowingSerializer(serializers.Serializer):
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=50
+    )
+    expected_return_date = serializers.DateField(
+        validators=[MinValueValidator(limit_value=date.today)]
+    )
 
+    def validate_books(self, value: list[int]) -> list[int]:
+        self.book_map = Book.objects.in_bulk(value)
+        missing = sorted(set(value) - set(self.book_map))
+        if missing:
+            raise serializers.ValidationError(f"Books not found: {missing}")
+        return value
+
+    def create(self, validated_data) -> list[Borrowing]:
+        user = get_full_user(self.context["request"].user)
+        copies = Counter(validated_data["books"])
+        expected_return_date = validated_data["expected_return_date"]
+
+        with transaction.atomic():
+            if Book.objects.reserve_many(copies) != len(copies):
+                out_of_stock = sorted(
+                    book_id
+                    for book_id, count in copies.items()
+                    if self.book_map[book_id].inventory < count
+                )
+                raise serializers.ValidationError(
+                    f"Books are out of stock: {out_of_stock or sorted(copies)}"
+                )
+
+            borrowings = Borrowing.objects.bulk_create(
+                Borrowing(
+                    book_id=book_id,
+                    user=user,
+                    expected_return_date=expected_return_date,
+                )
+                for book_id in validated_data["books"]
+            )
+            BookCirculation.objects.record_checkouts(copies, borrowings[0].borrow_date)
+
+            titles = "; ".join(
+                f"{self.book_map[book_id].title}, {self.book_map[book_id].author}"
+                for book_id in validated_data["books"]
+            )
+            enqueue_notification(
+                f"{user.first_name} {user.last_name} borrowed {len(borrowings)} "
+                f"books till {expected_return_date}: {titles}"
+            )
+
+        return borrowings
+
+
+class BulkReturnBorrowingSerializer(serializers.Serializer):
+    RETURNED = "returned"
+    ALREADY_RETURNED = "already_returned"
+    NOT_YOURS = "not_yours"
+    NOT_FOUND = "not_found"
+    BEFORE_BORROW_DATE = "before_borrow_date"
+
+    borrowings = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=5000
+    )
+    actual_return_date = serializers.DateField(default=date.today)
+
+    def create(self, validated_data) -> list[dict]:
+        """Return the listed borrowings and report an outcome for each id.
+
+        Five statements regardless of basket size: one SELECT to classify the
+        borrowings, one conditional UPDATE to mark them returned, one to count
+        the returns in the circulation statistics, one SELECT for books with
+        holds waiting and one grouped UPDATE to put the copies back on the
+        shelf. Copies that go to waiting holds add a few statements per book.
+        """
         user = self.context["request"].user
-        borrowing = Borrowing.objects.create(user=user, **validated_data)
+        ids = list(dict.fromkeys(validated_data["borrowings"]))
+        return_date = validated_data["actual_return_date"]
 
-        text = (
-            f"{borrowing.user.first_name} {borrowing.user.last_name} borrowed "
-            f"{borrowing.book.title}, {borrowing.book.author} till {borrowing.expected_return_date}"
-        )
+        with transaction.atomic():
+            rows = {
+                row["id"]: row
+                for row in Borrowing.objects.select_for_update()
+                .filter(id__in=ids)
+                .values("id", "user_id", "book_id", "borrow_date", "actual_return_date")
+            }
 
-        asyncio.run(send_notification(text))
+            outcomes = {}
+            returnable = []
+            for borrowing_id in ids:
+                row = rows.get(borrowing_id)
+                if row is None:
+                    outcomes[borrowing_id] = self.NOT_FOUND
+                elif row["user_id"] != user.id:
+                    outcomes[borrowing_id] = self.NOT_YOURS
+                elif row["actual_return_date"]:
+                    outcomes[borrowing_id] = self.ALREADY_RETURNED
+                elif return_date < row["borrow_date"]:
+                    outcomes[borrowing_id] = self.BEFORE_BORROW_DATE
+                else:
+                    outcomes[borrowing_id] = self.RETURNED
+                    returnable.append(borrowing_id)
 
-        return borrowing
+            if returnable:
+                updated = Borrowing.objects.filter(
+                    id__in=returnable, user_id=user.id, actual_return_date__isnull=True
+                ).update(actual_return_date=return_date)
+                if updated != len(returnable):
+                    # Someone returned one of these between our SELECT and
+                    # UPDATE; undo everything rather than report wrongly.
+                    raise serializers.ValidationError(
+                        "Borrowings changed while being returned, please retry."
+                    )
+                BookCirculation.objects.record_returns(
+                    [
+                        (
+                            rows[borrowing_id]["book_id"],
+                            (return_date - rows[borrowing_id]["borrow_date"]).days,
+                        )
+                        for borrowing_id in returnable
+                    ]
+                )
+                leftover = allocate_returned_copies(
+                    Counter(rows[borrowing_id]["book_id"] for borrowing_id in returnable)
+                )
+                if leftover:
+                    Book.objects.release_many(leftover)
+
+        return [{"id": borrowing_id, "status": outcomes[borrowing_id]} for borrowing_id in ids]
 
 
 class ReturnBorrowingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Borrowing
         fields = ["actual_return_date"]
+        extra_kwargs = {"actual_return_date": {"required": True, "allow_null": False}}
+
+    def validate(self, attrs: dict) -> dict:
+        # PATCH makes every field optional, but a return needs its date.
+        if not attrs.get("actual_return_date"):
+            raise serializers.ValidationError(
+                {"actual_return_date": "This field is required."}
+            )
+        return attrs
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    IN_STOCK = "Book is in stock, borrow it instead."
+
+    position = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Hold
+        fields = (
+            "id",
+            "book",
+            "loan_days",
+            "status",
+            "position",
+            "created_at",
+            "fulfilled_at",
+            "borrowing",
+        )
+        read_only_fields = ("status", "created_at", "fulfilled_at", "borrowing")
+
+    def validate_book(self, book: Book) -> Book:
+        if book.inventory > 0:
+            raise serializers.ValidationError(self.IN_STOCK)
+        return book
+
+    def create(self, validated_data) -> Hold:
+        try:
+            with transaction.atomic():
+                # A return holds this lock while it serves the queue, so a
+                # copy it put back on the shelf is seen here.
+                book = Book.objects.select_for_update().get(pk=validated_data["book"].pk)
+                if book.inventory > 0:
+                    raise serializers.ValidationError({"book": [self.IN_STOCK]})
+                hold = Hold.objects.create(
+                    user_id=self.context["request"].user.id, **validated_data
+                )
+        except IntegrityError:
+            # hold_one_waiting_per_user
+            raise serializers.ValidationError("You are already waiting for this book.")
+
+        hold.position = Hold.objects.queue(hold.book_id).filter(id__lte=hold.id).count()
+        return hold
+
+
+class BookCirculationSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source="book.title", read_only=True)
+    author = serializers.CharField(source="book.author", read_only=True)
+    average_loan_days = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = BookCirculation
+        fields = (
+            "book",
+            "title",
+            "author",
+            "total_borrows",
+            "currently_out",
+            "returned",
+            "average_loan_days",
+            "last_borrowed",
+        )
@@ -0,0 +1,10 @@
+from django.dispatch import receiver
+
+from books.models import Book
+from books.signals import stock_added
+from borrowings.holds import lend_shelved_copies
+
+
+@receiver(stock_added, sender=Book)
+def serve_waiting_holds(sender, books, **kwargs) -> None:
+    lend_shelved_copies(books)
@@ -1,15 +1,74 @@
+import asyncio
+import gzip
 import json
-from django.test import TestCase
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIClient
+from rest_framework import generics
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import status
-from datetime import datetime
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 
 from books.models import Book
-from borrowings.models import Borrowing
-from borrowings.serializers import BorrowingDetailSerializer, BorrowingListSerializer
+from borrowings.fees import calculate_fees, fee_totals, with_fees
+from borrowings.models import (
+    BookCirculation,
+    Borrowing,
+    Hold,
+    OutboxNotification,
+    OverdueReminder,
+)
+from borrowings.notifications import (
+    LEASE_SECONDS,
+    MAX_PER_CHAT,
+    PER_CHAT_CONCURRENCY,
+    SEND_TIMEOUT_SECONDS,
+    backoff_delay,
+    claim_batch,
+    deliver_pending,
+    enqueue_notification,
+    enqueue_notifications,
+)
+from borrowings.overdue import pending_overdue, process_overdue
+from borrowings.serializers import (
+    BorrowingDetailSerializer,
+    BorrowingListSerializer,
+    HoldSerializer,
+)
+from borrowings.async_views import (
+    AsyncBorrowingListView,
+    AsyncBorrowingRetrieveView,
+    AsyncReturnBorrowingView,
+)
+from borrowings.views import BorrowingListView, BorrowingRetrieveView
+from users.authentication import StatelessJWTAuthentication
+from users.serializers import TokenObtainPairSerializer
+
+
+def day(offset: int) -> str:
+    """The ISO date `offset` days from today, which is day(0)."""
+    return (date.today() + timedelta(days=offset)).isoformat()
 
 
 BORROWINGS_URL = reverse("borrowings:borrowing-list-create")
@@ -30,7 +89,7 @@ class PublicBorrowingApiTest(TestCase):
         self.user = get_user_model().objects.create_user(email="test@test.com", password="test123@")
 
         self.borrowing = Borrowing.objects.create(
-            expected_return_date="2023-09-24",
+            expected_return_date=day(10),
             book=self.book,
             user=self.user
         )
@@ -42,7 +101,7 @@ class PublicBorrowingApiTest(TestCase):
 
     def test_create_borrowing_not_allowed(self) -> None:
         data = {
-            "expected_return_date": "2023-09-25",
+            "expected_return_date": day(11),
             "book": self.book.id,
             "user": self.user.id,
         }
@@ -90,19 +149,19 @@ class PrivateBorrowingApiTest(TestCase):
         self.user1 = get_user_model().objects.create_user(email="test1@test.com", password="test123@")
 
         self.borrowing = Borrowing.objects.create(
-            expected_return_date="2023-09-24",
+            expected_return_date=day(10),
             book=self.book1,
             user=self.user
         )
 
         self.borrowing1 = Borrowing.objects.create(
-            expected_return_date="2023-09-25",
+            expected_return_date=day(11),
             book=self.book1,
             user=self.user1
         )
 
         self.borrowing2 = Borrowing.objects.create(
-            expected_return_date="2023-09-26",
+            expected_return_date=day(12),
             book=self.book2,
             user=self.user
         )
@@ -122,10 +181,10 @@ class PrivateBorrowingApiTest(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_list_borrowings_filtering_by_is_active_status(self) -> None:
-        data = {"actual_return_date": "2023-09-16"}
+        data = {"actual_return_date": day(2)}
         url = reverse("borrowings:return-borrowing", args=[self.borrowing.id])
         self.client.patch(url, data)
 
@@ -134,10 +193,10 @@ class PrivateBorrowingApiTest(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data) 
+        self.assertEqual(res.data["results"], serializer.data) 
 
     def test_list_borrowings_filtering_by_inactive_status(self) -> None:
-        data = {"actual_return_date": "2023-09-16"}
+        data = {"actual_return_date": day(2)}
         url = reverse("borrowings:return-borrowing", args=[self.borrowing.id])
         self.client.patch(url, data)
 
@@ -146,7 +205,7 @@ class PrivateBorrowingApiTest(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)      
+        self.assertEqual(res.data["results"], serializer.data)      
 
     def test_retrieve_borrowing(self) -> None:
         url = reverse("borrowings:borrowing-detail", args=[self.borrowing.id])
@@ -165,7 +224,7 @@ class PrivateBorrowingApiTest(TestCase):
 
     def test_create_borrowing(self) -> None:
         payload = {
-            "expected_return_date": "2023-09-30",
+            "expected_return_date": day(16),
             "book": self.book1.id,
         }
         res = self.client.post(BORROWINGS_URL, payload)
@@ -180,7 +239,7 @@ class PrivateBorrowingApiTest(TestCase):
 
     def test_check_book_inventory_after_create_borrowing(self) -> None:
         payload = {
-            "expected_return_date": "2023-09-30",
+            "expected_return_date": day(16),
             "book": self.book1.id,
         }
         self.client.post(BORROWINGS_URL, payload)
@@ -190,11 +249,11 @@ class PrivateBorrowingApiTest(TestCase):
 
     def test_check_book_out_of_stock(self) -> None:
         payload = {
-            "expected_return_date": "2023-09-30",
+            "expected_return_date": day(16),
             "book": self.book1.id,
         }
         payload1 = {
-            "expected_return_date": "2023-09-20",
+            "expected_return_date": day(6),
             "book": self.book1.id,
         }
         self.client.post(BORROWINGS_URL, payload)
@@ -209,9 +268,23 @@ class PrivateBorrowingApiTest(TestCase):
         expected_message = "Book is out of stock"
         self.assertEqual(response_data, [expected_message])
 
+    def test_create_borrowing_refreshes_cached_book(self) -> None:
+        url = reverse("books:book-detail", args=[self.book2.id])
+        etag = self.client.get(url)["ETag"]
+        payload = {
+            "expected_return_date": day(16),
+            "book": self.book2.id,
+        }
+        self.client.post(BORROWINGS_URL, payload)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["inventory"], 1)
+
     def test_create_borrowing_with_past_expected_return_date(self) -> None:
         payload = {
-            "expected_return_date": "2023-09-13",
+            "expected_return_date": day(-1),
             "book": self.book1.id,
         }
         res = self.client.post(BORROWINGS_URL, payload)
@@ -221,7 +294,7 @@ class PrivateBorrowingApiTest(TestCase):
     def test_return_borrowing(self) -> None:
         url = reverse("borrowings:return-borrowing", args=[self.borrowing.id])
         payload = {
-            "actual_return_date": "2023-09-14",
+            "actual_return_date": day(0),
         }
         res = self.client.patch(url, payload)
 
@@ -230,7 +303,7 @@ class PrivateBorrowingApiTest(TestCase):
     def test_return_borrowing_with_past_date(self) -> None:
         url = reverse("borrowings:return-borrowing", args=[self.borrowing.id])
         payload = {
-            "actual_return_date": "2023-09-13",
+            "actual_return_date": day(-1),
         }
         with self.assertRaises(ValidationError) as context:
             self.client.patch(url, payload)
@@ -266,19 +339,19 @@ class AdminUserBorrowingApiTest(TestCase):
         self.user1 = get_user_model().objects.create_user(email="test1@test.com", password="test123@")
 
         self.borrowing = Borrowing.objects.create(
-            expected_return_date="2023-09-24",
+            expected_return_date=day(10),
             book=self.book1,
             user=self.user
         )
 
         self.borrowing1 = Borrowing.objects.create(
-            expected_return_date="2023-09-25",
+            expected_return_date=day(11),
             book=self.book1,
             user=self.user1
         )
 
         self.borrowing2 = Borrowing.objects.create(
-            expected_return_date="2023-09-26",
+            expected_return_date=day(12),
             book=self.book2,
             user=self.user
         )
@@ -289,10 +362,10 @@ class AdminUserBorrowingApiTest(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_list_borrowings_filtering_by_is_active_status(self) -> None:
-        data = {"actual_return_date": "2023-09-16"}
+        data = {"actual_return_date": day(2)}
         url = reverse("borrowings:return-borrowing", args=[self.borrowing.id])
         self.client.patch(url, data)
 
@@ -301,7 +374,7 @@ class AdminUserBorrowingApiTest(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_list_borrowings_filtering_by_user_id(self) -> None:
         res = self.client.get(BORROWINGS_URL, {"user_id": self.user1.id})
@@ -309,4 +382,1759 @@ class AdminUserBorrowingApiTest(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data) 
+        self.assertEqual(res.data["results"], serializer.data) 
+
+
+class BorrowingFeeTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.staff = get_user_model().objects.create_user(
+            "admin@admin.com", "test123@", is_staff=True
+        )
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=10, daily_fee="2.10"
+        )
+        self.today = date.today() + timedelta(days=6)
+
+    def borrow(self, borrowed: str, due: str, returned: str | None = None, user=None) -> Borrowing:
+        borrowing = Borrowing.objects.create(
+            expected_return_date=day(16), book=self.book, user=user or self.user
+        )
+        # Past dates fail model validation, so move them with update().
+        Borrowing.objects.filter(id=borrowing.id).update(
+            borrow_date=borrowed, expected_return_date=due, actual_return_date=returned
+        )
+        return Borrowing.objects.select_related("book").get(id=borrowing.id)
+
+    def test_late_return_pays_rent_until_due_date_and_fine_after(self) -> None:
+        borrowing = self.borrow(day(-13), day(-4), day(-1))
+
+        fees = calculate_fees(borrowing)
+
+        self.assertEqual((fees.rental_days, fees.overdue_days), (9, 3))
+        self.assertEqual(fees.rental_fee, Decimal("18.90"))
+        self.assertEqual(fees.overdue_fine, Decimal("12.60"))
+        self.assertEqual(fees.total_fee, Decimal("31.50"))
+
+    def test_early_and_same_day_returns(self) -> None:
+        early = calculate_fees(self.borrow(day(-13), day(-4), day(-9)))
+        same_day = calculate_fees(self.borrow(day(-13), day(-4), day(-13)))
+
+        self.assertEqual(early.rental_fee, Decimal("8.40"))
+        self.assertEqual(early.overdue_fine, Decimal("0.00"))
+        self.assertEqual(same_day.rental_days, 1)
+
+    def test_open_borrowing_is_priced_until_today(self) -> None:
+        fees = calculate_fees(self.borrow(day(-13), day(1)), today=self.today)
+
+        self.assertEqual((fees.rental_days, fees.overdue_days), (14, 5))
+
+    @override_settings(BORROWING_FINE_MULTIPLIER="3.5")
+    def test_fine_multiplier_is_configurable(self) -> None:
+        fees = calculate_fees(self.borrow(day(-13), day(-4), day(-2)))
+
+        self.assertEqual(fees.overdue_fine, Decimal("14.70"))
+
+    def test_database_annotations_match_python(self) -> None:
+        self.borrow(day(-13), day(-4), day(-1))
+        self.borrow(day(-13), day(-4), day(-9))
+        self.borrow(day(-13), day(-4), day(-13))
+        self.borrow(day(-13), day(1))
+        self.borrow(day(4), day(11))
+
+        for borrowing in with_fees(Borrowing.objects.select_related("book"), self.today):
+            fees = calculate_fees(borrowing, self.today)
+            with self.subTest(borrowing=borrowing.id):
+                self.assertEqual(borrowing.rental_days, fees.rental_days)
+                self.assertEqual(borrowing.overdue_days, fees.overdue_days)
+                self.assertEqual(borrowing.rental_fee, fees.rental_fee)
+                self.assertEqual(borrowing.overdue_fine, fees.overdue_fine)
+                self.assertEqual(borrowing.total_fee, fees.total_fee)
+
+    def test_fee_totals_are_one_query(self) -> None:
+        self.borrow(day(-13), day(-4), day(-1))
+        self.borrow(day(-13), day(-4), day(-9))
+
+        with self.assertNumQueries(1):
+            totals = fee_totals(Borrowing.objects.all(), self.today)
+
+        self.assertEqual(totals, {
+            "count": 2,
+            "rental_fee": Decimal("27.30"),
+            "overdue_fine": Decimal("12.60"),
+            "total_fee": Decimal("39.90"),
+        })
+
+    def test_detail_shows_fees(self) -> None:
+        borrowing = self.borrow(day(-13), day(-4), day(-1))
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(reverse("borrowings:borrowing-detail", args=[borrowing.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["rental_fee"], "18.90")
+        self.assertEqual(res.data["overdue_fine"], "12.60")
+        self.assertEqual(res.data["total_fee"], "31.50")
+
+    def test_fee_totals_endpoint_uses_list_filters(self) -> None:
+        self.borrow(day(-13), day(-4), day(-1))
+        self.borrow(day(-13), day(-4), day(-9), user=self.staff)
+        url = reverse("borrowings:borrowing-fees")
+
+        self.client.force_authenticate(self.user)
+        own = self.client.get(url).data
+        self.client.force_authenticate(self.staff)
+        everyone = self.client.get(url).data
+        staff_only = self.client.get(url, {"user_id": self.staff.id}).data
+
+        self.assertEqual((own["count"], own["total_fee"]), (1, "31.50"))
+        self.assertEqual((everyone["count"], everyone["total_fee"]), (2, "39.90"))
+        self.assertEqual((staff_only["count"], staff_only["total_fee"]), (1, "8.40"))
+
+
+EXPORT_URL = reverse("borrowings:borrowing-export")
+
+
+class BorrowingExportTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.other = get_user_model().objects.create_user("other@user.com", "test123@")
+        self.staff = get_user_model().objects.create_user(
+            "admin@admin.com", "test123@", is_staff=True
+        )
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=10, daily_fee=1.5
+        )
+        self.mine = Borrowing.objects.create(
+            expected_return_date=day(10), book=self.book, user=self.user
+        )
+        self.returned = Borrowing.objects.create(
+            expected_return_date=day(11),
+            actual_return_date=day(6),
+            book=self.book,
+            user=self.user,
+        )
+        self.theirs = Borrowing.objects.create(
+            expected_return_date=day(12), book=self.book, user=self.other
+        )
+
+    def export(self, **params) -> tuple:
+        res = self.client.get(EXPORT_URL, params)
+        return res, b"".join(res.streaming_content).decode()
+
+    def test_export_requires_authentication(self) -> None:
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ndjson_export_is_streamed_and_limited_to_own_borrowings(self) -> None:
+        self.client.force_authenticate(self.user)
+
+        res, body = self.export(user_id=self.other.id)
+        rows = [json.loads(line) for line in body.splitlines()]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        self.assertEqual([row["id"] for row in rows], [self.mine.id, self.returned.id])
+        self.assertEqual(rows[1]["actual_return_date"], day(6))
+        self.assertEqual(rows[0]["book_title"], "Dune")
+        self.assertEqual(rows[0]["user_email"], "user@user.com")
+
+    def test_export_is_compressed_while_streaming(self) -> None:
+        self.client.force_authenticate(self.user)
+        _, body = self.export()
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertFalse(res.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(res.streaming_content)).decode(), body)
+
+    def test_staff_export_applies_list_filters(self) -> None:
+        self.client.force_authenticate(self.staff)
+
+        _, everything = self.export()
+        _, active = self.export(is_active="true", user_id=self.user.id)
+
+        self.assertEqual(len(everything.splitlines()), 3)
+        self.assertEqual([json.loads(line)["id"] for line in active.splitlines()], [self.mine.id])
+
+    def test_csv_export(self) -> None:
+        self.client.force_authenticate(self.staff)
+
+        res, body = self.export(export_format="csv", is_active="false")
+        lines = body.splitlines()
+
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="borrowings.csv"', res["Content-Disposition"])
+        self.assertEqual(lines[0].split(",")[:3], ["id", "borrow_date", "expected_return_date"])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{self.returned.id},"))
+
+    def test_unknown_export_format_is_rejected(self) -> None:
+        self.client.force_authenticate(self.staff)
+
+        res = self.client.get(EXPORT_URL, {"export_format": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_reads_rows_in_one_query(self) -> None:
+        self.client.force_authenticate(self.staff)
+        res = self.client.get(EXPORT_URL)
+
+        with self.assertNumQueries(1):
+            lines = b"".join(res.streaming_content).splitlines()
+
+        self.assertEqual(len(lines), 3)
+
+    def test_export_command(self) -> None:
+        out = StringIO()
+
+        call_command("export_borrowings", "--format=csv", f"--user-id={self.other.id}", stdout=out)
+        lines = out.getvalue().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{self.theirs.id},"))
+        self.assertIn("other@user.com", lines[1])
+
+
+BULK_BORROWINGS_URL = reverse("borrowings:borrowing-bulk-create")
+
+
+class BulkBorrowingApiTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "Testpassword123@", first_name="Test", last_name="User"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.books = [
+            Book.objects.create(
+                title=f"Test Title{i}",
+                author=f"Test Author{i}",
+                cover="Hard",
+                inventory=2,
+                daily_fee=2.1
+            )
+            for i in range(5)
+        ]
+
+    def checkout(self, book_ids: list[int]):
+        payload = {"books": book_ids, "expected_return_date": day(16)}
+        return self.client.post(BULK_BORROWINGS_URL, payload, format="json")
+
+    def test_bulk_checkout(self) -> None:
+        book_ids = [self.books[0].id, self.books[1].id, self.books[1].id]
+
+        res = self.checkout(book_ids)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([borrowing["book"] for borrowing in res.data], book_ids)
+        borrowings = Borrowing.objects.filter(user=self.user)
+        self.assertEqual(borrowings.count(), 3)
+        self.assertEqual(
+            [book.inventory for book in Book.objects.filter(id__in=book_ids).order_by("id")],
+            [1, 0],
+        )
+        notification = OutboxNotification.objects.get()
+        self.assertIn("Test User borrowed 3 books", notification.text)
+
+    def test_bulk_checkout_is_all_or_nothing(self) -> None:
+        Book.objects.filter(id=self.books[2].id).update(inventory=0)
+
+        res = self.checkout([self.books[0].id, self.books[2].id])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.books[2].id), res.data[0])
+        self.assertFalse(Borrowing.objects.exists())
+        self.assertFalse(OutboxNotification.objects.exists())
+        self.books[0].refresh_from_db()
+        self.assertEqual(self.books[0].inventory, 2)
+
+    def test_bulk_checkout_more_copies_than_in_stock(self) -> None:
+        res = self.checkout([self.books[0].id] * 3)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Borrowing.objects.exists())
+
+    def test_bulk_checkout_unknown_book(self) -> None:
+        res = self.checkout([self.books[0].id, 999])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("books", res.data)
+
+    def test_bulk_checkout_past_return_date(self) -> None:
+        payload = {"books": [self.books[0].id], "expected_return_date": day(-13)}
+        res = self.client.post(BULK_BORROWINGS_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_checkout_query_count_does_not_grow_with_basket(self) -> None:
+        with CaptureQueriesContext(connection) as small:
+            self.checkout([self.books[0].id])
+        with CaptureQueriesContext(connection) as large:
+            self.checkout([book.id for book in self.books[1:]])
+
+        self.assertEqual(len(small), len(large))
+
+
+BULK_RETURN_URL = reverse("borrowings:borrowing-bulk-return")
+
+
+class BulkReturnBorrowingApiTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "Testpassword123@"
+        )
+        self.other = get_user_model().objects.create_user(
+            "other@user.com", "Testpassword123@"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.book1 = Book.objects.create(
+            title="Test Title1",
+            author="Test Author1",
+            cover="Hard",
+            inventory=0,
+            daily_fee=2.1
+        )
+        self.book2 = Book.objects.create(
+            title="Test Title2",
+            author="Test Author2",
+            cover="Hard",
+            inventory=0,
+            daily_fee=2.1
+        )
+
+        self.mine = [
+            Borrowing.objects.create(expected_return_date=day(10), book=book, user=self.user)
+            for book in (self.book1, self.book1, self.book2)
+        ]
+        self.returned = Borrowing.objects.create(
+            expected_return_date=day(10),
+            actual_return_date=day(0),
+            book=self.book2,
+            user=self.user,
+        )
+        self.theirs = Borrowing.objects.create(
+            expected_return_date=day(10), book=self.book2, user=self.other
+        )
+
+    def bulk_return(self, ids: list[int], **payload):
+        return self.client.post(
+            BULK_RETURN_URL, {"borrowings": ids, **payload}, format="json"
+        )
+
+    def test_bulk_return(self) -> None:
+        res = self.bulk_return([borrowing.id for borrowing in self.mine])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["returned"], 3)
+        self.assertFalse(
+            Borrowing.objects.filter(user=self.user, actual_return_date__isnull=True).exists()
+        )
+        self.book1.refresh_from_db()
+        self.book2.refresh_from_db()
+        self.assertEqual((self.book1.inventory, self.book2.inventory), (2, 1))
+
+    def test_bulk_return_reports_per_item_results(self) -> None:
+        ids = [self.mine[0].id, self.returned.id, self.theirs.id, 999, self.mine[0].id]
+
+        res = self.bulk_return(ids)
+
+        self.assertEqual(
+            res.data["results"],
+            [
+                {"id": self.mine[0].id, "status": "returned"},
+                {"id": self.returned.id, "status": "already_returned"},
+                {"id": self.theirs.id, "status": "not_yours"},
+                {"id": 999, "status": "not_found"},
+            ],
+        )
+        self.theirs.refresh_from_db()
+        self.assertIsNone(self.theirs.actual_return_date)
+        self.book2.refresh_from_db()
+        self.assertEqual(self.book2.inventory, 0)
+
+    def test_bulk_return_date_before_borrow_date(self) -> None:
+        res = self.bulk_return([self.mine[0].id], actual_return_date=day(-1))
+
+        self.assertEqual(res.data["results"][0]["status"], "before_borrow_date")
+        self.assertEqual(res.data["returned"], 0)
+
+    def test_bulk_return_query_count_does_not_grow_with_items(self) -> None:
+        with CaptureQueriesContext(connection) as small:
+            self.bulk_return([self.mine[0].id])
+        with CaptureQueriesContext(connection) as large:
+            self.bulk_return([self.mine[1].id, self.mine[2].id, self.theirs.id, 999])
+
+        self.assertEqual(len(small), len(large))
+
+
+CIRCULATION_URL = reverse("borrowings:book-circulation-list")
+
+
+class BookCirculationTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.staff = get_user_model().objects.create_user(
+            "admin@admin.com", "test123@", is_staff=True
+        )
+        self.dune = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=10, daily_fee=1.5
+        )
+        self.emma = Book.objects.create(
+            title="Emma", author="Jane Austen", cover="Hard", inventory=10, daily_fee=1.0
+        )
+        self.client.force_authenticate(self.user)
+
+    def stats(self, book: Book) -> tuple:
+        circulation = BookCirculation.objects.get(book=book)
+        return (
+            circulation.total_borrows,
+            circulation.currently_out,
+            circulation.returned,
+            circulation.total_loan_days,
+            circulation.last_borrowed,
+        )
+
+    def bulk_checkout(self, books: list[int]) -> None:
+        self.client.post(
+            BULK_BORROWINGS_URL,
+            {"books": books, "expected_return_date": day(16)},
+            format="json",
+        )
+
+    def test_checkouts_are_counted(self) -> None:
+        self.client.post(
+            BORROWINGS_URL, {"expected_return_date": day(16), "book": self.dune.id}
+        )
+        self.bulk_checkout([self.dune.id, self.dune.id, self.emma.id])
+
+        self.assertEqual(self.stats(self.dune), (3, 3, 0, 0, date.today()))
+        self.assertEqual(self.stats(self.emma), (1, 1, 0, 0, date.today()))
+
+    def test_failed_checkout_is_not_counted(self) -> None:
+        self.dune.inventory = 0
+        self.dune.save()
+
+        self.client.post(
+            BORROWINGS_URL, {"expected_return_date": day(16), "book": self.dune.id}
+        )
+
+        self.assertFalse(BookCirculation.objects.exists())
+
+    def test_returns_are_counted_with_loan_length(self) -> None:
+        self.bulk_checkout([self.dune.id, self.dune.id, self.emma.id])
+        first, second, third = Borrowing.objects.order_by("id")
+
+        self.client.patch(
+            reverse("borrowings:return-borrowing", args=[first.id]),
+            {"actual_return_date": day(4)},
+        )
+        self.client.post(
+            BULK_RETURN_URL,
+            {"borrowings": [second.id, third.id], "actual_return_date": day(6)},
+            format="json",
+        )
+
+        self.assertEqual(self.stats(self.dune), (2, 0, 2, 10, date.today()))
+        self.assertEqual(self.stats(self.emma), (1, 0, 1, 6, date.today()))
+        self.assertEqual(BookCirculation.objects.get(book=self.dune).average_loan_days, 5.0)
+
+    def test_borrowings_created_outside_checkout_are_counted(self) -> None:
+        borrowing = Borrowing.objects.create(
+            expected_return_date=day(16), book=self.dune, user=self.user
+        )
+
+        res = self.client.patch(
+            reverse("borrowings:return-borrowing", args=[borrowing.id]),
+            {"actual_return_date": day(2)},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stats(self.dune), (1, 0, 1, 2, date.today()))
+
+    def test_rebuild_matches_incremental_statistics(self) -> None:
+        self.bulk_checkout([self.dune.id, self.dune.id, self.emma.id])
+        first = Borrowing.objects.order_by("id").first()
+        self.client.patch(
+            reverse("borrowings:return-borrowing", args=[first.id]),
+            {"actual_return_date": day(3)},
+        )
+        incremental = [self.stats(self.dune), self.stats(self.emma)]
+        BookCirculation.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_circulation", stdout=out)
+
+        self.assertIn("2 book(s)", out.getvalue())
+        self.assertEqual([self.stats(self.dune), self.stats(self.emma)], incremental)
+
+    def test_circulation_api_is_staff_only(self) -> None:
+        res = self.client.get(CIRCULATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_circulation_api_lists_and_orders_books(self) -> None:
+        self.bulk_checkout([self.dune.id, self.emma.id, self.emma.id])
+        self.client.force_authenticate(self.staff)
+
+        res = self.client.get(CIRCULATION_URL, {"ordering": "-total_borrows"})
+        bad = self.client.get(CIRCULATION_URL, {"ordering": "title"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["title"] for row in res.data["results"]], ["Emma", "Dune"])
+        self.assertEqual(res.data["results"][0]["currently_out"], 2)
+        self.assertIsNone(res.data["results"][0]["average_loan_days"])
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+HOLDS_URL = reverse("borrowings:hold-list-create")
+
+
+class HoldQueueTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.reader = get_user_model().objects.create_user(
+            "reader@user.com", "test123@", first_name="Ada", last_name="Reader"
+        )
+        self.first = get_user_model().objects.create_user(
+            "first@user.com", "test123@", first_name="Fay", last_name="First"
+        )
+        self.second = get_user_model().objects.create_user("second@user.com", "test123@")
+        self.dune = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=0, daily_fee=1.5
+        )
+        self.loans = [
+            Borrowing.objects.create(
+                expected_return_date=day(16), book=self.dune, user=self.reader
+            )
+            for _ in range(2)
+        ]
+
+    def place_hold(self, user, **payload):
+        self.client.force_authenticate(user)
+        return self.client.post(HOLDS_URL, {"book": self.dune.id, **payload})
+
+    def return_loan(self, borrowing: Borrowing):
+        self.client.force_authenticate(self.reader)
+        return self.client.patch(
+            reverse("borrowings:return-borrowing", args=[borrowing.id]),
+            {"actual_return_date": day(0)},
+        )
+
+    def test_place_hold_reports_position(self) -> None:
+        first = self.place_hold(self.first)
+        second = self.place_hold(self.second, loan_days=7)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((first.data["position"], first.data["status"]), (1, "waiting"))
+        self.assertEqual((second.data["position"], second.data["loan_days"]), (2, 7))
+
+    def test_hold_requires_out_of_stock_book(self) -> None:
+        self.dune.inventory = 1
+        self.dune.save()
+
+        res = self.place_hold(self.first)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("book", res.data)
+
+    def test_one_waiting_hold_per_user_and_book(self) -> None:
+        self.place_hold(self.first)
+
+        res = self.place_hold(self.first)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Hold.objects.count(), 1)
+
+    def test_return_goes_to_oldest_hold(self) -> None:
+        self.place_hold(self.first)
+        self.place_hold(self.second)
+        OutboxNotification.objects.all().delete()
+
+        res = self.return_loan(self.loans[0])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        hold = Hold.objects.get(user=self.first)
+        self.assertEqual(hold.status, Hold.FULFILLED)
+        self.assertEqual(hold.borrowing.user, self.first)
+        due = date.today() + timedelta(days=14)
+        self.assertEqual(hold.borrowing.expected_return_date, due)
+        self.dune.refresh_from_db()
+        self.assertEqual(self.dune.inventory, 0)
+        self.assertEqual(BookCirculation.objects.get(book=self.dune).currently_out, 2)
+        self.assertEqual(
+            list(OutboxNotification.objects.values_list("text", flat=True)),
+            [f"Fay First borrowed Dune, Frank Herbert from the hold queue till {due}"],
+        )
+
+        self.client.force_authenticate(self.second)
+        res = self.client.get(HOLDS_URL)
+        self.assertEqual(res.data["results"][0]["position"], 1)
+
+    def test_holder_is_notified_in_their_chat(self) -> None:
+        self.first.telegram_chat_id = "4242"
+        self.first.save()
+        self.place_hold(self.first)
+        OutboxNotification.objects.all().delete()
+
+        self.return_loan(self.loans[0])
+
+        due = date.today() + timedelta(days=14)
+        self.assertEqual(
+            list(OutboxNotification.objects.values_list("chat_id", "text")),
+            [
+                ("", f"Fay First borrowed Dune, Frank Herbert from the hold queue till {due}"),
+                (
+                    "4242",
+                    "Dune, Frank Herbert is yours: a copy came back and "
+                    f"is lent to you till {due}.",
+                ),
+            ],
+        )
+
+    def test_hold_is_refused_when_a_copy_comes_back_meanwhile(self) -> None:
+        def return_a_copy(serializer, book: Book) -> Book:
+            # A return nobody was waiting for commits after validation.
+            Book.objects.filter(pk=book.pk).update(inventory=1)
+            return book
+
+        with mock.patch.object(HoldSerializer, "validate_book", return_a_copy):
+            res = self.place_hold(self.first)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["book"], [HoldSerializer.IN_STOCK])
+        self.assertFalse(Hold.objects.exists())
+
+    def test_bulk_return_fills_holds_and_restocks_the_rest(self) -> None:
+        self.place_hold(self.first)
+        self.client.force_authenticate(self.reader)
+
+        res = self.client.post(
+            BULK_RETURN_URL, {"borrowings": [loan.id for loan in self.loans]}, format="json"
+        )
+
+        self.assertEqual(res.data["returned"], 2)
+        self.assertEqual(Hold.objects.get().status, Hold.FULFILLED)
+        self.assertTrue(Borrowing.objects.filter(user=self.first, book=self.dune).exists())
+        self.dune.refresh_from_db()
+        self.assertEqual(self.dune.inventory, 1)
+
+    def test_staff_restock_goes_to_the_queue(self) -> None:
+        self.place_hold(self.first)
+        self.place_hold(self.second)
+        staff = get_user_model().objects.create_user("staff@user.com", "test123@", is_staff=True)
+        self.client.force_authenticate(staff)
+        url = reverse("books:book-detail", args=[self.dune.id])
+
+        res = self.client.patch(url, {"inventory": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Hold.objects.get(user=self.first).status, Hold.FULFILLED)
+        self.assertEqual(Hold.objects.get(user=self.second).status, Hold.WAITING)
+        self.dune.refresh_from_db()
+        self.assertEqual(self.dune.inventory, 0)
+
+        self.client.put(
+            url,
+            {
+                "title": "Dune",
+                "author": "Frank Herbert",
+                "cover": "Soft",
+                "inventory": 3,
+                "daily_fee": "1.50",
+            },
+        )
+
+        self.assertFalse(Hold.objects.waiting().exists())
+        self.dune.refresh_from_db()
+        self.assertEqual(self.dune.inventory, 2)
+        self.assertEqual(BookCirculation.objects.get(book=self.dune).currently_out, 4)
+
+    def test_imported_copies_go_to_the_queue(self) -> None:
+        self.place_hold(self.first)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "books.csv"
+            path.write_text(
+                "title,author,cover,inventory,daily_fee\nDune,Frank Herbert,Soft,2,1.5\n"
+            )
+            call_command("import_books", str(path), stdout=StringIO())
+
+        self.assertEqual(Hold.objects.get().status, Hold.FULFILLED)
+        self.dune.refresh_from_db()
+        self.assertEqual(self.dune.inventory, 1)
+
+    def test_cancelled_hold_is_skipped(self) -> None:
+        hold_id = self.place_hold(self.first).data["id"]
+        self.place_hold(self.second)
+        self.client.force_authenticate(self.first)
+
+        res = self.client.delete(reverse("borrowings:hold-detail", args=[hold_id]))
+        self.return_loan(self.loans[0])
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Hold.objects.get(pk=hold_id).status, Hold.CANCELLED)
+        self.assertEqual(Hold.objects.get(user=self.second).status, Hold.FULFILLED)
+
+    def test_only_waiting_holds_can_be_cancelled(self) -> None:
+        hold_id = self.place_hold(self.first).data["id"]
+        self.return_loan(self.loans[0])
+        self.client.force_authenticate(self.first)
+
+        res = self.client.delete(reverse("borrowings:hold-detail", args=[hold_id]))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Hold.objects.get(pk=hold_id).status, Hold.FULFILLED)
+
+    def test_holds_of_other_users_are_hidden(self) -> None:
+        hold_id = self.place_hold(self.first).data["id"]
+        self.client.force_authenticate(self.second)
+
+        listing = self.client.get(HOLDS_URL)
+        detail = self.client.get(reverse("borrowings:hold-detail", args=[hold_id]))
+
+        self.assertEqual(listing.data["count"], 0)
+        self.assertEqual(detail.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_head_of_queue_is_an_index_seek(self) -> None:
+        plan = Hold.objects.queue(self.dune.id)[:1].explain()
+
+        self.assertIn("hold_queue_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class BorrowingPaginationTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com", "Testpassword123@", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+        book = Book.objects.create(
+            title="Test Title",
+            author="Test Author",
+            cover="Hard",
+            inventory=10,
+            daily_fee=2.1
+        )
+        self.borrowings = [
+            Borrowing.objects.create(
+                expected_return_date=day(10), book=book, user=self.user
+            )
+            for _ in range(5)
+        ]
+        Borrowing.objects.filter(id=self.borrowings[-1].id).update(borrow_date=day(-13))
+        self.ordered_ids = [self.borrowings[-1].id] + [
+            borrowing.id for borrowing in self.borrowings[:-1]
+        ]
+
+    def get_ids(self, res) -> list[int]:
+        return [borrowing["id"] for borrowing in res.data["results"]]
+
+    def test_pages_follow_borrow_date_then_id(self) -> None:
+        ids = self.ordered_ids
+
+        first = self.client.get(BORROWINGS_URL, {"page_size": 2})
+        second = self.client.get(first.data["next"])
+        third = self.client.get(second.data["next"])
+
+        self.assertEqual(self.get_ids(first), ids[:2])
+        self.assertIsNone(first.data["previous"])
+        self.assertEqual(self.get_ids(second), ids[2:4])
+        self.assertEqual(self.get_ids(third), ids[4:])
+        self.assertIsNone(third.data["next"])
+
+    def test_previous_cursor_returns_preceding_page(self) -> None:
+        first = self.client.get(BORROWINGS_URL, {"page_size": 2})
+        second = self.client.get(first.data["next"])
+
+        previous = self.client.get(second.data["previous"])
+
+        self.assertEqual(self.get_ids(previous), self.get_ids(first))
+        self.assertIsNone(previous.data["previous"])
+
+    def test_pagination_keeps_filters(self) -> None:
+        Borrowing.objects.filter(id=self.borrowings[1].id).update(
+            actual_return_date=day(0)
+        )
+
+        first = self.client.get(BORROWINGS_URL, {"page_size": 3, "is_active": True})
+        second = self.client.get(first.data["next"])
+
+        self.assertEqual(
+            self.get_ids(first) + self.get_ids(second),
+            [pk for pk in self.ordered_ids if pk != self.borrowings[1].id],
+        )
+
+    def test_invalid_cursor(self) -> None:
+        res = self.client.get(BORROWINGS_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BorrowingListFastPathTest(TestCase):
+    """BorrowingListView must render exactly what BorrowingListSerializer would."""
+
+    def setUp(self) -> None:
+        self.staff = get_user_model().objects.create_user(
+            "admin@admin.com", "test123@", is_staff=True
+        )
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=10, daily_fee=1.5
+        )
+        for i in range(12):
+            borrowing = Borrowing.objects.create(
+                expected_return_date=day(16),
+                book=book,
+                user=(self.staff, self.user)[i % 2],
+            )
+            Borrowing.objects.filter(id=borrowing.id).update(
+                borrow_date=date.today() - timedelta(days=13 - i % 5),
+                actual_return_date=date.today() - timedelta(days=4) if i % 3 else None,
+            )
+
+    def render(self, view, user, url: str) -> bytes:
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user)
+        return view(request).render().content
+
+    def test_output_is_byte_identical_to_serializer(self) -> None:
+        class SerializerBorrowingListView(BorrowingListView):
+            def list(self, request, *args, **kwargs) -> Response:
+                return generics.ListCreateAPIView.list(self, request, *args, **kwargs)
+
+        fast = BorrowingListView.as_view()
+        slow = SerializerBorrowingListView.as_view()
+        cases = [
+            (self.staff, {}),
+            (self.staff, {"is_active": "true"}),
+            (self.staff, {"user_id": self.user.id, "is_active": "false"}),
+            (self.user, {}),
+            (self.staff, {"expand": "book,user"}),
+            (self.user, {"fields": "book,actual_return_date", "expand": "book"}),
+        ]
+        for user, params in cases:
+            url = f"{BORROWINGS_URL}?{urlencode({'page_size': 3, **params})}"
+            pages = 0
+            while url:
+                with self.subTest(staff=user.is_staff, url=url):
+                    content = self.render(fast, user, url)
+                    self.assertEqual(content, self.render(slow, user, url))
+                url = json.loads(content)["next"]
+                pages += 1
+            self.assertGreater(pages, 1)
+
+
+class SparseFieldsetTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.client.force_authenticate(self.user)
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=10, daily_fee=1.5
+        )
+        self.borrowing = Borrowing.objects.create(
+            expected_return_date=day(16), book=self.book, user=self.user
+        )
+        self.detail_url = reverse("borrowings:borrowing-detail", args=[self.borrowing.id])
+
+    def get(self, url: str, params: dict) -> tuple:
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data, queries[-1]["sql"]
+
+    def test_list_fields_select_only_their_columns(self) -> None:
+        data, sql = self.get(BORROWINGS_URL, {"fields": "id,expected_return_date"})
+
+        self.assertEqual(
+            data["results"], [{"id": self.borrowing.id, "expected_return_date": day(16)}]
+        )
+        self.assertNotIn("actual_return_date", sql)
+        self.assertNotIn("books_book", sql)
+
+    def test_list_expands_relations_in_the_same_query(self) -> None:
+        data, sql = self.get(BORROWINGS_URL, {"expand": "book,user"})
+        borrowing = data["results"][0]
+
+        self.assertEqual(borrowing["book"]["title"], "Dune")
+        self.assertEqual(borrowing["user"]["email"], "user@user.com")
+        self.assertNotIn("password", borrowing["user"])
+        self.assertIn("books_book", sql)
+        self.assertIn("users_user", sql)
+
+    def test_detail_joins_only_what_it_renders(self) -> None:
+        data, sql = self.get(self.detail_url, {})
+        self.assertEqual(data["book"]["title"], "Dune")
+        self.assertEqual(data["user"], "user@user.com")
+        self.assertIn('"books_book"."title"', sql)
+
+        data, sql = self.get(self.detail_url, {"fields": "id,total_fee"})
+        self.assertEqual(set(data), {"id", "total_fee"})
+        self.assertNotIn('"books_book"."title"', sql)
+        self.assertNotIn("users_user", sql)
+
+        data, _ = self.get(self.detail_url, {"fields": "user", "expand": "user"})
+        self.assertEqual(data["user"]["id"], self.user.id)
+
+    def test_unknown_names_are_rejected(self) -> None:
+        for url, params in [
+            (BORROWINGS_URL, {"fields": "id,secret"}),
+            (BORROWINGS_URL, {"expand": "borrow_date"}),
+            (self.detail_url, {"expand": "book"}),
+        ]:
+            with self.subTest(url=url, params=params):
+                res = self.client.get(url, params)
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_ignore_the_selection(self) -> None:
+        res = self.client.post(
+            f"{BORROWINGS_URL}?fields=id",
+            {"book": self.book.id, "expected_return_date": day(16)},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn("expected_return_date", res.data)
+
+
+class BorrowingQueryPlanTest(TestCase):
+    """EXPLAIN every query BorrowingListView runs and reject full table scans.
+
+    Walking an index in order is allowed: the list is paginated, so such a
+    scan stops after one page.
+    """
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            "admin@admin.com", "Testpassword123@", is_staff=True
+        )
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "Testpassword123@"
+        )
+        book = Book.objects.create(
+            title="Test Title",
+            author="Test Author",
+            cover="Hard",
+            inventory=10,
+            daily_fee=2.1
+        )
+        for user in (self.staff, self.user):
+            for _ in range(3):
+                Borrowing.objects.create(
+                    expected_return_date=day(10), book=book, user=user
+                )
+
+    def capture_list_queries(self, user, params: dict) -> list[tuple]:
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith("SELECT"):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        self.client.force_authenticate(user)
+        with connection.execute_wrapper(record):
+            res = self.client.get(BORROWINGS_URL, {"page_size": 2, **params})
+            if res.data["next"]:
+                self.client.get(res.data["next"])
+        return queries
+
+    def full_scans(self, sql: str, params) -> list[str]:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql, params)
+                return [row[0] for row in cursor.fetchall() if "Seq Scan" in row[0]]
+
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [
+                row[-1]
+                for row in cursor.fetchall()
+                if row[-1].startswith("SCAN") and " USING " not in row[-1]
+            ]
+
+    def test_list_queries_use_indexes(self) -> None:
+        cases = [
+            (self.user, {}),
+            (self.user, {"is_active": "true"}),
+            (self.user, {"is_active": "false"}),
+            (self.staff, {}),
+            (self.staff, {"is_active": "true"}),
+            (self.staff, {"is_active": "false"}),
+            (self.staff, {"user_id": self.user.id}),
+            (self.staff, {"user_id": self.user.id, "is_active": "true"}),
+        ]
+        for user, params in cases:
+            queries = self.capture_list_queries(user, params)
+            self.assertTrue(queries)
+            for sql, sql_params in queries:
+                with self.subTest(staff=user.is_staff, params=params, sql=sql):
+                    self.assertEqual(self.full_scans(sql, sql_params), [])
+
+    def test_overdue_query_uses_index(self) -> None:
+        sql, params = pending_overdue(date.today() + timedelta(days=17)).query.sql_with_params()
+
+        self.assertEqual(self.full_scans(sql, params), [])
+
+    def seeks(self, sql: str, params) -> list[str]:
+        """Name the indexes the SQLite plan looks rows up in.
+
+        That is a SEARCH, or a SCAN of a partial index: a partial index only
+        holds the rows its condition selects, so walking it is a lookup too.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            details = [row[-1] for row in cursor.fetchall()]
+
+        partial = {"borrowing_active_idx", "borrowing_overdue_idx"}
+        names = []
+        for detail in details:
+            match = re.match(r"(SEARCH|SCAN) \S+ USING (?:COVERING )?INDEX (\S+)", detail)
+            if match and (match[1] == "SEARCH" or match[2] in partial):
+                names.append(match[2])
+        return names
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+    def test_filtered_queries_seek_their_index(self) -> None:
+        user_fk_idx = "borrowings_borrowing_user_id_"
+        cases = [
+            (self.user, {}, user_fk_idx),
+            (self.user, {"is_active": "true"}, "borrowing_user_active_idx"),
+            (self.user, {"is_active": "false"}, user_fk_idx),
+            (self.staff, {"is_active": "true"}, "borrowing_active_idx"),
+            (self.staff, {"user_id": self.user.id}, user_fk_idx),
+            (
+                self.staff,
+                {"user_id": self.user.id, "is_active": "true"},
+                "borrowing_user_active_idx",
+            ),
+        ]
+        for user, params, index in cases:
+            for sql, sql_params in self.capture_list_queries(user, params):
+                with self.subTest(staff=user.is_staff, params=params, sql=sql):
+                    seeks = self.seeks(sql, sql_params)
+                    self.assertTrue(any(name.startswith(index) for name in seeks), seeks)
+
+        sql, params = pending_overdue(date.today() + timedelta(days=17)).query.sql_with_params()
+        self.assertIn("borrowing_overdue_idx", self.seeks(sql, params))
+
+
+class ReturnBorrowingValidationTest(TestCase):
+    def test_return_requires_date(self) -> None:
+        user = get_user_model().objects.create_user("user@user.com", "test123@")
+        book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=1, daily_fee=1
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=day(16), book=book, user=user
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.patch(reverse("borrowings:return-borrowing", args=[borrowing.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("actual_return_date", res.data)
+        borrowing.refresh_from_db()
+        self.assertIsNone(borrowing.actual_return_date)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class BorrowingQueryBudgetTest(TestCase):
+    """Every borrowing endpoint stays within its view's `query_budget`.
+
+    Requests authenticate with a real JWT and touch many rows, so an N+1
+    regression raises QueryBudgetExceeded from RequestMetricsMiddleware.
+    Budgets count the User lookup of the default JWTAuthentication.
+    """
+
+    authentication_class = JWTAuthentication
+
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock.patch.object(
+            APIView, "authentication_classes", [self.authentication_class]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.staff = get_user_model().objects.create_user(
+            "admin@admin.com", "test123@", is_staff=True
+        )
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.books = [
+            Book.objects.create(
+                title=f"Book {i}", author="Author", cover="Soft", inventory=5, daily_fee=1
+            )
+            for i in range(10)
+        ]
+        self.borrowings = [
+            Borrowing.objects.create(
+                expected_return_date=day(16), book=book, user=self.user
+            )
+            for book in self.books
+        ]
+
+    def client_for(self, user) -> APIClient:
+        client = APIClient()
+        token = TokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(**{jwt_settings.AUTH_HEADER_NAME: f"Bearer {token}"})
+        return client
+
+    def assertWithinBudget(self, response, expected_status: int) -> None:
+        self.assertEqual(response.status_code, expected_status)
+        self.assertIsNotNone(response.wsgi_request.query_budget)
+
+    def test_reads(self) -> None:
+        detail_url = reverse("borrowings:borrowing-detail", args=[self.borrowings[0].id])
+        fees_url = reverse("borrowings:borrowing-fees")
+        for user in (self.user, self.staff):
+            client = self.client_for(user)
+            for url in (BORROWINGS_URL, EXPORT_URL, fees_url, detail_url):
+                with self.subTest(staff=user.is_staff, url=url):
+                    response = client.get(url)
+                    self.assertWithinBudget(response, status.HTTP_200_OK)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+
+        response = self.client_for(self.staff).get(CIRCULATION_URL)
+        self.assertWithinBudget(response, status.HTTP_200_OK)
+
+    def test_checkout_and_return(self) -> None:
+        client = self.client_for(self.staff)
+        response = client.post(
+            BORROWINGS_URL,
+            {"book": self.books[0].id, "expected_return_date": day(16)},
+        )
+        self.assertWithinBudget(response, status.HTTP_201_CREATED)
+
+        response = client.post(
+            BULK_BORROWINGS_URL,
+            {
+                "books": [book.id for book in self.books],
+                "expected_return_date": day(16),
+            },
+            format="json",
+        )
+        self.assertWithinBudget(response, status.HTTP_201_CREATED)
+
+        client = self.client_for(self.user)
+        url = reverse("borrowings:return-borrowing", args=[self.borrowings[0].id])
+        response = client.patch(url, {"actual_return_date": day(2)})
+        self.assertWithinBudget(response, status.HTTP_200_OK)
+
+        response = client.post(
+            BULK_RETURN_URL,
+            {"borrowings": [borrowing.id for borrowing in self.borrowings[1:]]},
+            format="json",
+        )
+        self.assertWithinBudget(response, status.HTTP_200_OK)
+
+    def test_holds(self) -> None:
+        book = self.books[0]
+        Book.objects.filter(pk=book.pk).update(inventory=0)
+        holders = [
+            get_user_model().objects.create_user(f"holder{i}@user.com", "test123@")
+            for i in range(3)
+        ]
+        for holder in holders:
+            response = self.client_for(holder).post(HOLDS_URL, {"book": book.id})
+            self.assertWithinBudget(response, status.HTTP_201_CREATED)
+
+        client = self.client_for(holders[-1])
+        response = client.get(HOLDS_URL)
+        self.assertWithinBudget(response, status.HTTP_200_OK)
+        url = reverse("borrowings:hold-detail", args=[response.data["results"][0]["id"]])
+        self.assertWithinBudget(client.get(url), status.HTTP_200_OK)
+        self.assertWithinBudget(client.delete(url), status.HTTP_204_NO_CONTENT)
+
+        second_copy = Borrowing.objects.create(
+            expected_return_date=day(16), book=book, user=self.user
+        )
+        client = self.client_for(self.user)
+        url = reverse("borrowings:return-borrowing", args=[self.borrowings[0].id])
+        response = client.patch(url, {"actual_return_date": day(2)})
+        self.assertWithinBudget(response, status.HTTP_200_OK)
+
+        response = client.post(
+            BULK_RETURN_URL,
+            {"borrowings": [second_copy.id] + [b.id for b in self.borrowings[1:]]},
+            format="json",
+        )
+        self.assertWithinBudget(response, status.HTTP_200_OK)
+        self.assertFalse(Hold.objects.waiting().exists())
+
+
+class StatelessBorrowingQueryBudgetTest(BorrowingQueryBudgetTest):
+    """The same budgets hold with JWT_STATELESS_USER on."""
+
+    authentication_class = StatelessJWTAuthentication
+
+
+class FakeBot:
+    def __init__(self, fail: bool = False, delay: float = 0) -> None:
+        self.fail = fail
+        self.delay = delay
+        self.messages = []
+        self.chats = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __aenter__(self) -> "FakeBot":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def send_message(self, chat_id, text: str) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError("Telegram is down")
+            self.messages.append(text)
+            self.chats.append(chat_id)
+        finally:
+            self.in_flight -= 1
+
+
+class NotificationOutboxTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "Testpassword123@"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.book = Book.objects.create(
+            title="Test Title",
+            author="Test Author",
+            cover="Hard",
+            inventory=2,
+            daily_fee=2.1
+        )
+
+    def test_create_borrowing_enqueues_notification(self) -> None:
+        payload = {
+            "expected_return_date": day(16),
+            "book": self.book.id,
+        }
+        res = self.client.post(BORROWINGS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        notification = OutboxNotification.objects.get()
+        self.assertIn(self.book.title, notification.text)
+        self.assertIsNone(notification.sent_at)
+
+    def test_deliver_pending_sends_and_marks_notifications(self) -> None:
+        enqueue_notification("first")
+        enqueue_notification("second")
+        bot = FakeBot()
+
+        report = deliver_pending(bot=bot)
+
+        self.assertEqual(report.sent, 2)
+        self.assertEqual(bot.messages, ["first", "second"])
+        self.assertFalse(OutboxNotification.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(deliver_pending(bot=bot).processed, 0)
+
+    def test_deliver_pending_reschedules_failures_with_backoff(self) -> None:
+        notification = enqueue_notification("text")
+
+        report = deliver_pending(bot=FakeBot(fail=True))
+        notification.refresh_from_db()
+
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(notification.attempts, 1)
+        self.assertIsNone(notification.sent_at)
+        self.assertIn("Telegram is down", notification.last_error)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+        self.assertEqual(deliver_pending(bot=FakeBot()).processed, 0)
+
+    def test_deliver_pending_gives_up_after_max_attempts(self) -> None:
+        enqueue_notification("text")
+        OutboxNotification.objects.update(attempts=3)
+
+        report = deliver_pending(bot=FakeBot(), max_attempts=3)
+
+        self.assertEqual(report.processed, 0)
+
+    def test_last_failed_attempt_is_logged(self) -> None:
+        notification = enqueue_notification("text")
+        OutboxNotification.objects.update(attempts=2)
+
+        with self.assertLogs("borrowings.notifications", "ERROR") as logs:
+            report = deliver_pending(bot=FakeBot(fail=True), max_attempts=3)
+
+        self.assertEqual(report.given_up, 1)
+        self.assertIn(f"notification #{notification.id} after 3 attempts", logs.output[0])
+
+    def test_deliver_pending_sends_one_message_at_a_time_per_chat(self) -> None:
+        for i in range(5):
+            enqueue_notification(f"message {i}")
+        bot = FakeBot()
+
+        report = deliver_pending(bot=bot)
+
+        self.assertEqual(report.sent, 5)
+        self.assertEqual(bot.max_in_flight, 1)
+
+    @mock.patch("borrowings.notifications.user_id", "staff")
+    def test_deliver_pending_sends_to_each_chat_in_parallel(self) -> None:
+        enqueue_notifications(["a", "b", "c", "d"], ["", "4242", "", "4242"])
+        bot = FakeBot()
+
+        report = deliver_pending(bot=bot)
+
+        self.assertEqual(report.sent, 4)
+        self.assertEqual(sorted(bot.chats), ["4242", "4242", "staff", "staff"])
+        self.assertEqual(bot.max_in_flight, 2)
+
+    @mock.patch("borrowings.notifications.MAX_PER_CHAT", 2)
+    def test_batch_takes_at_most_max_per_chat(self) -> None:
+        first, second, third = (enqueue_notification(f"staff {i}") for i in range(3))
+        other = enqueue_notifications(["patron"], ["4242"])[0]
+
+        batch = claim_batch()
+
+        self.assertEqual([item.id for item in batch], [first.id, second.id, other.id])
+        self.assertEqual([item.id for item in claim_batch()], [third.id])
+
+    def test_batches_fit_in_their_lease(self) -> None:
+        self.assertLessEqual(
+            MAX_PER_CHAT / PER_CHAT_CONCURRENCY * SEND_TIMEOUT_SECONDS, LEASE_SECONDS / 2
+        )
+
+    @mock.patch("borrowings.notifications.SEND_TIMEOUT_SECONDS", 0.01)
+    def test_slow_send_times_out_and_is_retried(self) -> None:
+        notification = enqueue_notification("text")
+
+        report = deliver_pending(bot=FakeBot(delay=1))
+        notification.refresh_from_db()
+
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(notification.attempts, 1)
+        self.assertIn("TimeoutError", notification.last_error)
+
+    def test_backoff_delay_grows_and_is_capped(self) -> None:
+        self.assertLess(backoff_delay(1), backoff_delay(2))
+        self.assertEqual(backoff_delay(50), backoff_delay(60))
+
+    def test_send_notifications_command(self) -> None:
+        enqueue_notification("text")
+        out = StringIO()
+
+        with mock.patch("borrowings.notifications.get_bot", return_value=FakeBot()):
+            call_command("send_notifications", stdout=out)
+
+        self.assertIn("Sent 1 notification(s), 0 failed.", out.getvalue())
+
+
+class OverdueReminderTest(TestCase):
+    def setUp(self) -> None:
+        self.alice = get_user_model().objects.create_user(
+            "alice@user.com", "test123@", first_name="Alice", last_name="Smith"
+        )
+        self.bob = get_user_model().objects.create_user(
+            "bob@user.com", "test123@", first_name="Bob", last_name="Jones"
+        )
+        self.dune = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=10, daily_fee=1.5
+        )
+        self.emma = Book.objects.create(
+            title="Emma", author="Jane Austen", cover="Hard", inventory=10, daily_fee=1.0
+        )
+        self.today = date.today() + timedelta(days=17)
+
+    def borrow(self, user, book, due: str, returned: str | None = None) -> Borrowing:
+        borrowing = Borrowing.objects.create(
+            expected_return_date=day(16), book=book, user=user
+        )
+        # Past due dates fail model validation, so move them with update().
+        Borrowing.objects.filter(id=borrowing.id).update(
+            expected_return_date=due, actual_return_date=returned
+        )
+        return borrowing
+
+    def test_one_reminder_per_user_lists_every_overdue_book(self) -> None:
+        first = self.borrow(self.alice, self.dune, day(6))
+        second = self.borrow(self.alice, self.emma, day(11))
+        bobs = self.borrow(self.bob, self.dune, day(14))
+
+        report = process_overdue(self.today)
+
+        self.assertEqual((report.users, report.borrowings), (2, 3))
+        alice_text, bob_text = OutboxNotification.objects.values_list("text", flat=True)
+        self.assertIn("Alice Smith (alice@user.com) has 2 overdue book(s)", alice_text)
+        self.assertIn(f"Dune, Frank Herbert: due {day(6)}, 11 day(s) late", alice_text)
+        self.assertIn(f"Emma, Jane Austen: due {day(11)}, 6 day(s) late", alice_text)
+        self.assertIn("Bob Jones", bob_text)
+        self.assertEqual(
+            first.overdue_reminder.notification_id, second.overdue_reminder.notification_id
+        )
+        self.assertNotEqual(
+            first.overdue_reminder.notification_id, bobs.overdue_reminder.notification_id
+        )
+
+    def test_returned_and_not_yet_due_borrowings_are_skipped(self) -> None:
+        self.borrow(self.alice, self.dune, day(6), returned=day(8))
+        self.borrow(self.alice, self.emma, day(17))
+
+        report = process_overdue(self.today)
+
+        self.assertEqual(report.borrowings, 0)
+        self.assertFalse(OutboxNotification.objects.exists())
+
+    def test_rerun_only_reminds_about_newly_overdue_borrowings(self) -> None:
+        self.borrow(self.alice, self.dune, day(6))
+        process_overdue(self.today)
+
+        self.assertEqual(process_overdue(self.today).borrowings, 0)
+
+        self.borrow(self.alice, self.emma, day(17))
+        report = process_overdue(date.today() + timedelta(days=18))
+
+        self.assertEqual(report.borrowings, 1)
+        self.assertEqual(OutboxNotification.objects.count(), 2)
+        self.assertNotIn("Dune", OutboxNotification.objects.last().text)
+
+    def test_dry_run_records_nothing(self) -> None:
+        self.borrow(self.alice, self.dune, day(6))
+
+        report = process_overdue(self.today, dry_run=True)
+
+        self.assertEqual(report.borrowings, 1)
+        self.assertFalse(OverdueReminder.objects.exists())
+        self.assertFalse(OutboxNotification.objects.exists())
+
+    def test_queries_do_not_grow_with_overdue_rows(self) -> None:
+        self.borrow(self.alice, self.dune, day(6))
+        with CaptureQueriesContext(connection) as few:
+            process_overdue(self.today)
+
+        for _ in range(20):
+            self.borrow(self.alice, self.emma, day(11))
+            self.borrow(self.bob, self.dune, day(11))
+        with CaptureQueriesContext(connection) as many:
+            process_overdue(self.today)
+
+        self.assertEqual(len(few), len(many))
+
+    def test_process_overdue_command(self) -> None:
+        self.borrow(self.alice, self.dune, day(6))
+        out = StringIO()
+
+        call_command("process_overdue", f"--date={day(17)}", stdout=out)
+
+        self.assertIn("Queued reminders for 1 overdue borrowing(s) of 1 user(s).", out.getvalue())
+        self.assertEqual(OverdueReminder.objects.count(), 1)
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        caches["idempotency"].clear()
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=5, daily_fee=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payload = {"book": self.book.id, "expected_return_date": day(16)}
+
+    def post(self, key: str | None, payload: dict | None = None, url: str = BORROWINGS_URL):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(url, payload or self.payload, format="json", **headers)
+
+    def test_retry_replays_the_first_checkout(self) -> None:
+        first = self.post("checkout-1")
+        retry = self.post("checkout-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 4)
+        self.assertEqual(Borrowing.objects.count(), 1)
+        self.assertEqual(OutboxNotification.objects.count(), 1)
+        self.assertEqual(BookCirculation.objects.get(book=self.book).total_borrows, 1)
+
+    def test_keys_are_not_evicted_by_other_cache_entries(self) -> None:
+        self.post("checkout-1")
+        # Well past the 300 entries a local-memory cache holds by default.
+        cache.set_many({f"churn:{i}": i for i in range(1000)})
+        caches["idempotency"].set_many({f"churn:{i}": i for i in range(1000)})
+
+        retry = self.post("checkout-1")
+
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Borrowing.objects.count(), 1)
+
+    def test_requests_without_key_or_with_other_keys_are_not_replayed(self) -> None:
+        self.post(None)
+        self.post(None)
+        self.post("checkout-1")
+        self.post("checkout-2")
+
+        other = get_user_model().objects.create_user("other@user.com", "test123@")
+        self.client.force_authenticate(other)
+        self.post("checkout-1")
+
+        self.assertEqual(Borrowing.objects.count(), 5)
+
+    def test_key_reused_for_another_request_is_refused(self) -> None:
+        self.post("checkout-1")
+        res = self.post("checkout-1", {**self.payload, "expected_return_date": day(15)})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Borrowing.objects.count(), 1)
+
+    def test_failed_request_can_be_retried(self) -> None:
+        res = self.post("checkout-1", {**self.payload, "expected_return_date": day(-13)})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.post("checkout-1")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Borrowing.objects.count(), 1)
+
+    def test_too_long_key_is_rejected(self) -> None:
+        res = self.post("k" * 256)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Borrowing.objects.count(), 0)
+
+    def test_retry_of_bulk_checkout_and_returns(self) -> None:
+        payload = {"books": [self.book.id, self.book.id], "expected_return_date": day(16)}
+        first = self.post("bulk-1", payload, BULK_BORROWINGS_URL)
+        self.assertEqual(self.post("bulk-1", payload, BULK_BORROWINGS_URL).data, first.data)
+        self.assertEqual(Borrowing.objects.count(), 2)
+
+        ids = [borrowing["id"] for borrowing in first.data]
+        url = reverse("borrowings:return-borrowing", args=[ids[0]])
+        for _ in range(2):
+            res = self.client.patch(
+                url, {"actual_return_date": day(2)}, HTTP_IDEMPOTENCY_KEY="return-1"
+            )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        for _ in range(2):
+            res = self.post("bulk-return-1", {"borrowings": ids}, BULK_RETURN_URL)
+            self.assertEqual(res.data["results"][1]["status"], "returned")
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 5)
+        self.assertEqual(BookCirculation.objects.get(book=self.book).returned, 2)
+
+    async def test_retry_of_async_return(self) -> None:
+        borrowing = await Borrowing.objects.acreate(
+            expected_return_date=day(16), book=self.book, user=self.user
+        )
+        path = reverse("borrowings:return-borrowing", args=[borrowing.id])
+        view = AsyncReturnBorrowingView.as_view()
+        for _ in range(2):
+            request = AsyncRequestFactory().patch(
+                path,
+                json.dumps({"actual_return_date": day(2)}),
+                "application/json",
+                headers={"Idempotency-Key": "return-1"},
+            )
+            force_authenticate(request, self.user)
+            response = await view(request, pk=borrowing.id)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        await self.book.arefresh_from_db()
+        self.assertEqual(self.book.inventory, 6)
+
+
+class AsyncBorrowingViewsTest(TestCase):
+    """The async views answer exactly like the sync views they replace."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.other = get_user_model().objects.create_user("other@user.com", "test123@")
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=3, daily_fee=1
+        )
+        self.mine = Borrowing.objects.create(
+            expected_return_date=day(16), book=self.book, user=self.user
+        )
+        self.theirs = Borrowing.objects.create(
+            expected_return_date=day(16), book=self.book, user=self.other
+        )
+
+    async def call(self, view_class, method: str, path: str, data=None, **kwargs):
+        factory = AsyncRequestFactory()
+        if data is None:
+            request = getattr(factory, method)(path)
+        else:
+            request = getattr(factory, method)(path, json.dumps(data), "application/json")
+        force_authenticate(request, self.user)
+        response = await view_class.as_view()(request, **kwargs)
+        return response.render()
+
+    def test_views_are_async(self) -> None:
+        for view_class in (AsyncBorrowingListView, AsyncBorrowingRetrieveView, AsyncReturnBorrowingView):
+            with self.subTest(view=view_class.__name__):
+                self.assertTrue(view_class.view_is_async)
+
+    async def test_list_and_detail_match_sync_views(self) -> None:
+        detail = reverse("borrowings:borrowing-detail", args=[self.mine.id])
+        cases = [
+            (AsyncBorrowingListView, BorrowingListView, BORROWINGS_URL, {}),
+            (AsyncBorrowingRetrieveView, BorrowingRetrieveView, detail, {"pk": self.mine.id}),
+        ]
+        for async_view, sync_view, path, kwargs in cases:
+            response = await self.call(async_view, "get", path, **kwargs)
+            request = APIRequestFactory().get(path)
+            force_authenticate(request, self.user)
+            expected = await sync_to_async(
+                lambda: sync_view.as_view()(request, **kwargs).render()
+            )()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, expected.content)
+
+    async def test_detail_of_other_user_is_not_found(self) -> None:
+        path = reverse("borrowings:borrowing-detail", args=[self.theirs.id])
+        response = await self.call(AsyncBorrowingRetrieveView, "get", path, pk=self.theirs.id)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_checkout_and_return(self) -> None:
+        response = await self.call(
+            AsyncBorrowingListView,
+            "post",
+            BORROWINGS_URL,
+            {"book": self.book.id, "expected_return_date": day(16)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        await self.book.arefresh_from_db()
+        self.assertEqual(self.book.inventory, 2)
+        self.assertEqual(await OutboxNotification.objects.acount(), 1)
+
+        path = reverse("borrowings:return-borrowing", args=[self.mine.id])
+        data = {"actual_return_date": day(2)}
+        response = await self.call(AsyncReturnBorrowingView, "patch", path, data, pk=self.mine.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await self.book.arefresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+        circulation = await BookCirculation.objects.aget(book=self.book)
+        self.assertEqual((circulation.total_borrows, circulation.returned), (3, 1))
+
+        response = await self.call(AsyncReturnBorrowingView, "patch", path, data, pk=self.mine.id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        path = reverse("borrowings:return-borrowing", args=[self.theirs.id])
+        response = await self.call(AsyncReturnBorrowingView, "patch", path, data, pk=self.theirs.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_metrics_middleware_counts_async_queries(self) -> None:
+        await sync_to_async(self.client.force_login)(self.user)
+        response = await self.async_client.get(reverse("books:book-list"))
+
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+
+class ConcurrentIdempotentCheckoutTest(TransactionTestCase):
+    """Many simultaneous retries of one checkout do the work exactly once."""
+
+    RETRIES = 16
+
+    def setUp(self) -> None:
+        caches["idempotency"].clear()
+        self.user = get_user_model().objects.create_user("user@user.com", "test123@")
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=5, daily_fee=1
+        )
+
+    def checkout(self, barrier: threading.Barrier):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {"expected_return_date": day(16), "book": self.book.id}
+        barrier.wait()
+        try:
+            return client.post(BORROWINGS_URL, payload, HTTP_IDEMPOTENCY_KEY="checkout-1")
+        finally:
+            connection.close()
+
+    def test_concurrent_retries_check_out_once(self) -> None:
+        barrier = threading.Barrier(self.RETRIES)
+        with ThreadPoolExecutor(max_workers=self.RETRIES) as executor:
+            responses = list(executor.map(lambda _: self.checkout(barrier), range(self.RETRIES)))
+
+        self.assertEqual(
+            {res.status_code for res in responses}, {status.HTTP_201_CREATED}
+        )
+        self.assertEqual(len({res.data["id"] for res in responses}), 1)
+        replayed = [res for res in responses if res.has_header("Idempotent-Replayed")]
+        self.assertEqual(len(replayed), self.RETRIES - 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 4)
+        self.assertEqual(Borrowing.objects.count(), 1)
+        self.assertEqual(OutboxNotification.objects.count(), 1)
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """Hammer a single title from many threads and check it is never oversold."""
+
+    CHECKOUTS = 200
+    INVENTORY = 25
+
+    def setUp(self) -> None:
+        self.book = Book.objects.create(
+            title="Popular Title",
+            author="Popular Author",
+            cover="Hard",
+            inventory=self.INVENTORY,
+            daily_fee=2.1
+        )
+        self.users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"user{i}@user.com") for i in range(self.CHECKOUTS)
+        )
+
+    def checkout(self, user, barrier: threading.Barrier) -> int:
+        # The test client re-raises exceptions from *any* thread's request,
+        # so let errors come back as 500 responses instead.
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        payload = {"expected_return_date": day(16), "book": self.book.id}
+        barrier.wait()
+        try:
+            for _ in range(1000):
+                res = client.post(BORROWINGS_URL, payload)
+                if res.status_code != status.HTTP_500_INTERNAL_SERVER_ERROR:
+                    break
+                # SQLite reports lock contention instead of blocking; retry.
+                time.sleep(0.001)
+            return res.status_code
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_never_oversell(self) -> None:
+        barrier = threading.Barrier(self.CHECKOUTS)
+        with ThreadPoolExecutor(max_workers=self.CHECKOUTS) as executor:
+            codes = list(executor.map(lambda user: self.checkout(user, barrier), self.users))
+        self.book.refresh_from_db()
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), self.INVENTORY)
+        self.assertEqual(
+            codes.count(status.HTTP_400_BAD_REQUEST), self.CHECKOUTS - self.INVENTORY
+        )
+        self.assertEqual(self.book.inventory, 0)
+        self.assertEqual(Borrowing.objects.filter(book=self.book).count(), self.INVENTORY)
+        circulation = BookCirculation.objects.get(book=self.book)
+        self.assertEqual(circulation.total_borrows, self.INVENTORY)
+        self.assertEqual(circulation.currently_out, self.INVENTORY)
@@ -1,12 +1,42 @@
+from django.conf import settings
 from django.urls import path
 
-from borrowings.views import BorrowingListView, BorrowingRetrieveView, ReturnBorrowingView
+from borrowings.views import (
+    BookCirculationListView,
+    BorrowingExportView,
+    BorrowingFeeTotalsView,
+    BorrowingListView,
+    BorrowingRetrieveView,
+    BulkBorrowingView,
+    BulkReturnBorrowingView,
+    HoldDetailView,
+    HoldListView,
+    ReturnBorrowingView,
+)
+
+if settings.ASYNC_VIEWS:
+    from borrowings.async_views import (
+        AsyncBorrowingListView as BorrowingListView,
+        AsyncBorrowingRetrieveView as BorrowingRetrieveView,
+        AsyncReturnBorrowingView as ReturnBorrowingView,
+    )
 
 
 app_name = "borrowings"
 
 urlpatterns = [
     path("borrowings/", BorrowingListView.as_view(), name="borrowing-list-create"),
+    path("borrowings/export/", BorrowingExportView.as_view(), name="borrowing-export"),
+    path("borrowings/fees/", BorrowingFeeTotalsView.as_view(), name="borrowing-fees"),
+    path("borrowings/bulk/", BulkBorrowingView.as_view(), name="borrowing-bulk-create"),
+    path(
+        "borrowings/bulk/return/",
+        BulkReturnBorrowingView.as_view(),
+        name="borrowing-bulk-return",
+    ),
     path("borrowings/<int:pk>/", BorrowingRetrieveView.as_view(), name="borrowing-detail"),
     path("borrowings/<int:pk>/return/", ReturnBorrowingView.as_view(), name="return-borrowing"),
+    path("holds/", HoldListView.as_view(), name="hold-list-create"),
+    path("holds/<int:pk>/", HoldDetailView.as_view(), name="hold-detail"),
+    path("circulation/", BookCirculationListView.as_view(), name="book-circulation-list"),
 ]
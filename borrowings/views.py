@@ -1,23 +1,49 @@
+from functools import partial
+
 from rest_framework import generics, serializers
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
 from rest_framework.response import Response
 from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
-from borrowings.models import Borrowing
+from books.pagination import BookPagination
+from config.field_plans import ValuesListMixin
+from config.idempotency import idempotent
+from config.sparse_fields import SparseFieldsMixin
+from borrowings.export import CONTENT_TYPES, WRITERS, export_borrowings
+from borrowings.fees import fee_totals, with_fees
+from borrowings.filters import filter_borrowings
+from borrowings.holds import allocate_returned_copies
+from borrowings.models import BookCirculation, Borrowing, Hold
+from borrowings.pagination import BorrowingCursorPagination
 from borrowings.serializers import (
+    BookCirculationSerializer,
     BorrowingDetailSerializer,
+    BorrowingFeeTotalsSerializer,
     BorrowingListSerializer,
+    BulkCreateBorrowingSerializer,
+    BulkReturnBorrowingSerializer,
     CreateBorrowingSerializer,
+    HoldSerializer,
     ReturnBorrowingSerializer,
 )
 
 
-class BorrowingListView(generics.ListCreateAPIView):
+CIRCULATION_ORDERINGS = {
+    "total_borrows": ("total_borrows", "book_id"),
+    "currently_out": ("currently_out", "book_id"),
+    "last_borrowed": ("last_borrowed", "book_id"),
+}
+
+
+class BorrowingListView(SparseFieldsMixin, ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = BorrowingListSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {"get": 2, "post": 9}
+    pagination_class = BorrowingCursorPagination
 
     def get_serializer_class(self) -> serializers.Serializer:
         if self.request.method == "POST":
@@ -26,41 +52,100 @@ class BorrowingListView(generics.ListCreateAPIView):
             return BorrowingListSerializer
 
     def get_queryset(self) -> QuerySet:
-        queryset = Borrowing.objects.select_related("book", "user")
+        return filter_borrowings(
+            Borrowing.objects.all(), self.request.user, self.request.query_params
+        )
+
+    def create(self, request, *args, **kwargs) -> Response:
+        return idempotent(request, partial(super().create, request, *args, **kwargs))
 
-        is_active = self.request.query_params.get("is_active")
-        user_id = self.request.query_params.get("user_id")
 
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(user=self.request.user)
+class BorrowingExportView(generics.GenericAPIView):
+    """Stream the filtered borrowing history as NDJSON (default) or CSV."""
 
-        if self.request.user.is_staff and user_id:
-            user = int(user_id)
-            queryset = queryset.filter(user__id=user)
+    permission_classes = [IsAuthenticated]
+    query_budget = 1
 
-        if is_active:
-            is_active = is_active.lower() == "true"
-            if is_active:
-                queryset = queryset.filter(actual_return_date__isnull=True)
-            else:
-                queryset = queryset.exclude(actual_return_date__isnull=True)
+    def get(self, request, *args, **kwargs) -> StreamingHttpResponse:
+        file_format = request.query_params.get("export_format", "ndjson")
+        if file_format not in WRITERS:
+            raise serializers.ValidationError(
+                {"export_format": f"Choose one of: {', '.join(WRITERS)}."}
+            )
 
-        return queryset
+        queryset = filter_borrowings(Borrowing.objects.all(), request.user, request.query_params)
+        response = StreamingHttpResponse(
+            export_borrowings(queryset, file_format),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="borrowings.{file_format}"'
+        return response
+
+
+class BorrowingFeeTotalsView(generics.GenericAPIView):
+    """Total rental fees and overdue fines over the filtered borrowings."""
+
+    serializer_class = BorrowingFeeTotalsSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs) -> Response:
+        queryset = filter_borrowings(Borrowing.objects.all(), request.user, request.query_params)
+        return Response(self.get_serializer(fee_totals(queryset)).data)
+
+
+class BulkBorrowingView(generics.GenericAPIView):
+    serializer_class = BulkCreateBorrowingSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = 7
+
+    def post(self, request, *args, **kwargs) -> Response:
+        return idempotent(request, partial(self.checkout, request))
 
+    def checkout(self, request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrowings = serializer.save()
+
+        return Response(
+            BorrowingListSerializer(borrowings, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class BulkReturnBorrowingView(generics.GenericAPIView):
+    serializer_class = BulkReturnBorrowingSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = 13
+
+    def post(self, request, *args, **kwargs) -> Response:
+        return idempotent(request, partial(self.return_borrowings, request))
+
+    def return_borrowings(self, request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
 
-class BorrowingRetrieveView(generics.RetrieveAPIView):
+        returned = sum(
+            result["status"] == BulkReturnBorrowingSerializer.RETURNED for result in results
+        )
+        return Response({"returned": returned, "results": results}, status=status.HTTP_200_OK)
+
+
+class BorrowingRetrieveView(SparseFieldsMixin, generics.RetrieveAPIView):
     serializer_class = BorrowingDetailSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def get_queryset(self) -> QuerySet:
-        queryset = Borrowing.objects.select_related("book", "user")
+        queryset = with_fees(Borrowing.objects.all())
         if self.request.user.is_staff:
             return queryset
         else:
-            return Borrowing.objects.filter(user=self.request.user)
+            return queryset.filter(user_id=self.request.user.id)
 
     def get_object(self) -> Borrowing:
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
         obj = get_object_or_404(queryset, pk=self.kwargs["pk"])
         self.check_object_permissions(self.request, obj)
         return obj
@@ -69,23 +154,105 @@ class BorrowingRetrieveView(generics.RetrieveAPIView):
 class ReturnBorrowingView(generics.UpdateAPIView):
     queryset = Borrowing.objects.all()
     permission_classes = [IsAuthenticated]
+    query_budget = 14
     serializer_class = ReturnBorrowingSerializer
 
     def update(self, request, *args, **kwargs) -> Response:
+        return idempotent(request, partial(self.return_borrowing, request))
+
+    def return_borrowing(self, request) -> Response:
         instance = self.get_object()
+        refusal = self.check_returnable(instance)
+        if refusal:
+            return refusal
+
+        serializer = self.get_serializer(instance, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_return(serializer)
+
+        return Response({"detail": "Borrowing returned successfully."}, status=status.HTTP_200_OK)
 
-        if instance.user != request.user:
+    def check_returnable(self, instance: Borrowing) -> Response | None:
+        if instance.user_id != self.request.user.id:
             return Response({"detail": "You do not have permission to return this borrowing."}, status=status.HTTP_403_FORBIDDEN)
 
         if instance.actual_return_date:
             return Response({"detail": "This borrowing has already been returned."}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(instance, data=request.data)
-        serializer.is_valid(raise_exception=True)
+        return None
 
+    def perform_return(self, serializer: ReturnBorrowingSerializer) -> None:
         with transaction.atomic():
-            serializer.save()
-            instance.book.inventory += 1
-            instance.book.save()
+            borrowing = serializer.save()
+            BookCirculation.objects.record_returns(
+                [(borrowing.book_id, (borrowing.actual_return_date - borrowing.borrow_date).days)]
+            )
+            # The copy goes to the next patron on hold, if anyone is waiting.
+            if allocate_returned_copies({borrowing.book_id: 1}):
+                borrowing.book.release()
 
-        return Response({"detail": "Borrowing returned successfully."}, status=status.HTTP_200_OK)
+
+class HoldListView(generics.ListCreateAPIView):
+    """Join the waitlist of an out-of-stock book, or list your holds.
+
+    The next returned copy of the book becomes a borrowing of the oldest
+    waiting hold, see borrowings.holds.
+    """
+
+    serializer_class = HoldSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = {"get": 3, "post": 5}
+    pagination_class = BookPagination
+
+    def get_queryset(self) -> QuerySet:
+        queryset = Hold.objects.with_positions()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user_id=self.request.user.id)
+
+
+class HoldDetailView(generics.RetrieveDestroyAPIView):
+    """Show a hold, or leave the waitlist by deleting it."""
+
+    serializer_class = HoldSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = {"get": 2, "delete": 3}
+
+    def get_queryset(self) -> QuerySet:
+        queryset = Hold.objects.with_positions()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user_id=self.request.user.id)
+
+    def perform_destroy(self, instance: Hold) -> None:
+        # Guarded, so a hold fulfilled by a concurrent return stays fulfilled.
+        if not Hold.objects.waiting().filter(pk=instance.pk).update(status=Hold.CANCELLED):
+            raise serializers.ValidationError("Only waiting holds can be cancelled.")
+
+
+class BookCirculationListView(generics.ListAPIView):
+    """Per-book circulation statistics for staff dashboards.
+
+    Reads the incrementally maintained BookCirculation table, so the cost
+    depends on the number of books, not on the borrowing history.
+    """
+
+    serializer_class = BookCirculationSerializer
+    permission_classes = [IsAdminUser]
+    query_budget = 3
+    pagination_class = BookPagination
+
+    def get_queryset(self) -> QuerySet:
+        queryset = BookCirculation.objects.select_related("book")
+
+        ordering = self.request.query_params.get("ordering")
+        if ordering:
+            field = ordering.removeprefix("-")
+            if field not in CIRCULATION_ORDERINGS:
+                raise serializers.ValidationError(
+                    {"ordering": f"Choose one of {list(CIRCULATION_ORDERINGS)}."}
+                )
+            prefix = "-" if ordering.startswith("-") else ""
+            queryset = queryset.order_by(*(prefix + name for name in CIRCULATION_ORDERINGS[field]))
+
+        return queryset
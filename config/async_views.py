@@ -0,0 +1,46 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import Http404
+
+
+class AsyncAPIViewMixin:
+    """Serve a DRF view as a native async Django view.
+
+    DRF only dispatches synchronously. This dispatch runs `initial()` -
+    authentication, permission and throttle checks, which may query the
+    database - in the request's thread-sensitive executor and awaits the
+    view's handlers, which must all be `async def`. Django refuses a view
+    class that mixes sync and async handlers.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = self.http_method_not_allowed
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), handler)
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        """Async `get_object()` for views with a plain `pk` lookup."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        self.check_object_permissions(self.request, obj)
+        return obj
@@ -0,0 +1,91 @@
+"""Cache settings from a URL, as given in CACHE_URL.
+
+    locmem://                 memory of this process only
+    db://<table>              a table in the default database, created by
+                              `manage.py createcachetable`
+    redis://<host>:<port>/<db>, rediss://...
+                              a Redis server (needs redis-py)
+    memcached://<host>:<port> a memcached server (needs pymemcache)
+
+Only the database, Redis and memcached caches are seen by every process of
+a deployment. The catalog version (books.cache), token state
+(users.authentication), idempotency keys and cache-backed rate limits
+have to be, so production refuses any other cache.
+
+The default cache is read on nearly every request, to save database
+queries. A db:// cache spends one to save one, so production needs
+CACHE_URL to name a Redis or memcached server.
+
+Idempotency keys (config.idempotency) have a cache of their own, given by
+IDEMPOTENCY_CACHE_URL: evicting one to make room for catalog pages would
+let a retried checkout run twice.
+"""
+import sys
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "rediss": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+}
+SHARED_BACKENDS = {BACKENDS["db"], BACKENDS["redis"], BACKENDS["memcached"]}
+MEMORY_BACKENDS = {BACKENDS["redis"], BACKENDS["memcached"]}
+
+
+def parse_cache_url(url: str, cull: bool = True) -> dict:
+    """Return the CACHES entry for `url`.
+
+    With `cull=False` a memory or database cache never evicts live entries
+    to make room. Redis evicts according to the server's maxmemory-policy,
+    which has to be noeviction or one of the volatile-* policies. memcached
+    always evicts when full, so it is refused.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'CACHE_URL must start with one of {", ".join(f"{s}://" for s in BACKENDS)}, '
+            f'not "{url}".'
+        )
+
+    cache = {"BACKEND": BACKENDS[parts.scheme]}
+    if parts.scheme.startswith("redis"):
+        cache["LOCATION"] = url
+    elif parts.scheme == "db":
+        cache["LOCATION"] = parts.netloc or parts.path.strip("/")
+        if not cache["LOCATION"]:
+            raise ImproperlyConfigured(f'CACHE_URL "{url}" does not name a table.')
+    else:
+        cache["LOCATION"] = parts.netloc
+    if not cull and parts.scheme == "memcached":
+        raise ImproperlyConfigured(
+            f'"{url}" evicts entries when full; use a db:// or redis:// cache URL.'
+        )
+    if not cull and not parts.scheme.startswith("redis"):
+        cache["OPTIONS"] = {"MAX_ENTRIES": sys.maxsize}
+    return cache
+
+
+def check_shared(caches: dict) -> None:
+    """Raise ImproperlyConfigured for caches that only one process can see."""
+    local = sorted(
+        alias for alias, cache in caches.items() if cache["BACKEND"] not in SHARED_BACKENDS
+    )
+    if local:
+        raise ImproperlyConfigured(
+            f"Caches {local} are not shared between processes; production needs "
+            "db://, redis:// or memcached:// cache URLs (see config.caches)."
+        )
+
+
+def check_in_memory(caches: dict, alias: str = "default") -> None:
+    """Raise ImproperlyConfigured unless cache `alias` is Redis or memcached."""
+    if caches[alias]["BACKEND"] not in MEMORY_BACKENDS:
+        raise ImproperlyConfigured(
+            f"The {alias} cache has to be a redis:// or memcached:// cache URL in "
+            "production; any other one costs as many queries as it saves (see "
+            "config.caches)."
+        )
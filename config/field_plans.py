@@ -0,0 +1,155 @@
+"""Fast read-only list serialization from `values_list()` rows.
+
+A ModelSerializer builds a model instance per row and resolves every field
+through DRF's attribute machinery. For plain column fields the same output
+can be produced from database tuples: `compile_field_plan()` inspects a
+serializer once and records, per field, the column to fetch and the
+converter to apply, and `ValuesListMixin` uses that plan in `list()`.
+"""
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Callable
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from rest_framework import fields, relations
+from rest_framework.response import Response
+from rest_framework.serializers import Serializer
+
+# Values the database driver already returns in their serialized form.
+PASSTHROUGH_FIELDS = (fields.IntegerField, fields.CharField, fields.BooleanField)
+ISO_PROBE = date(2000, 1, 31)
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    """Output names, the columns to fetch and a converter for each name.
+
+    A nested plan in `converters` stands for an expanded relation: its
+    columns come next in the row and it builds that name's nested dict.
+    """
+
+    names: tuple[str, ...]
+    lookups: tuple[str, ...]
+    converters: tuple["Callable | FieldPlan | None", ...]
+
+    def values(self, queryset: QuerySet, extra: tuple[str, ...] = ()) -> QuerySet:
+        """Rows as named tuples, so paginators can still read e.g. `row.id`.
+
+        `extra` columns are fetched after the plan's own but not serialized,
+        e.g. the ordering columns a paginator reads.
+        """
+        lookups = self.lookups + tuple(name for name in extra if name not in self.lookups)
+        return queryset.values_list(*lookups, named=True)
+
+    def serialize(self, rows) -> list[dict]:
+        if any(isinstance(convert, FieldPlan) for convert in self.converters):
+            return [self._build(iter(row)) for row in rows]
+
+        plan = tuple(zip(self.names, self.converters))
+        return [
+            {
+                name: value if convert is None or value is None else convert(value)
+                for (name, convert), value in zip(plan, row)
+            }
+            for row in rows
+        ]
+
+    def _build(self, values) -> dict | None:
+        item = {}
+        for name, convert in zip(self.names, self.converters):
+            if isinstance(convert, FieldPlan):
+                item[name] = convert._build(values)
+            else:
+                value = next(values)
+                item[name] = value if convert is None or value is None else convert(value)
+        # A missing related row comes back as all NULL columns.
+        if all(value is None for value in item.values()):
+            return None
+        return item
+
+
+def _converter(field: fields.Field) -> Callable | None:
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None
+    if isinstance(field, PASSTHROUGH_FIELDS) and not isinstance(field, fields.ChoiceField):
+        return None
+    if isinstance(field, fields.DateField):
+        # The default (ISO 8601) output format is exactly date.isoformat().
+        if field.to_representation(ISO_PROBE) == ISO_PROBE.isoformat():
+            return date.isoformat
+    return field.to_representation
+
+
+def _compile(serializer: Serializer, prefix: str = "") -> FieldPlan:
+    names, lookups, converters = [], [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if (
+            isinstance(field, Serializer)
+            and not prefix
+            and "." not in field.source
+            and field.source != "*"
+        ):
+            nested = _compile(field, prefix=f"{field.source}__")
+            names.append(name)
+            lookups.extend(nested.lookups)
+            converters.append(nested)
+            continue
+        if (
+            isinstance(
+                field, (Serializer, fields.SerializerMethodField, relations.ManyRelatedField)
+            )
+            or field.source == "*"
+            or "." in field.source
+        ):
+            raise ImproperlyConfigured(
+                f"{type(serializer).__name__}.{name} cannot be read from a single column."
+            )
+        names.append(name)
+        lookups.append(prefix + field.source)
+        converters.append(_converter(field))
+    return FieldPlan(tuple(names), tuple(lookups), tuple(converters))
+
+
+@lru_cache
+def compile_field_plan(serializer_class: type[Serializer], **selection) -> FieldPlan:
+    """Turn a serializer of plain model columns into a FieldPlan.
+
+    `selection` is passed to the serializer, e.g. the `fields` and `expand`
+    of a SparseFieldsSerializerMixin. A nested serializer - an expanded
+    relation - is read from the related table's columns, one level deep.
+    Dotted sources and method fields have no single column to read, so
+    they raise ImproperlyConfigured.
+    """
+    return _compile(serializer_class(**selection))
+
+
+class ValuesListMixin:
+    """Serve `list()` from `values_list()` tuples instead of model instances.
+
+    The output is identical to the serializer's. Filtering, ordering and
+    pagination are unchanged: they run on the same queryset, only the
+    SELECT list differs.
+    """
+
+    def get_field_plan(self) -> FieldPlan:
+        return compile_field_plan(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs) -> Response:
+        plan = self.get_field_plan()
+        ordering = getattr(self.paginator, "ordering", ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        queryset = plan.values(
+            self.filter_queryset(self.get_queryset()),
+            extra=tuple(name.lstrip("-") for name in ordering),
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page))
+
+        return Response(plan.serialize(queryset))
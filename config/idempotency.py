@@ -0,0 +1,147 @@
+"""Idempotency-Key support for unsafe requests.
+
+A client that sends the same `Idempotency-Key` header again - typically a
+retry after a timeout - gets the response of the first request replayed
+instead of running it twice. Keys are scoped to the user, method and path,
+and are remembered for RESPONSE_TIMEOUT seconds. Concurrent duplicates are
+serialized with a cache lock: one request does the work while the others
+wait for its response. Responses are stored once returned, so a request
+that raised an error can be retried with the same key.
+
+Keys live in the "idempotency" cache, which never evicts them early (see
+config.caches) and, in production, is shared by every process.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.connection import ConnectionProxy
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+RESPONSE_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 10.0
+POLL_INTERVAL = 0.005
+
+cache = ConnectionProxy(caches, "idempotency")
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress."
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+class IdempotentRequest:
+    def __init__(self, request, key: str) -> None:
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(
+                {HEADER: f"Ensure this value has at most {MAX_KEY_LENGTH} characters."}
+            )
+        scope = f"{request.user.pk}:{request.method}:{request.path}:{key}"
+        self.cache_key = f"idempotency:{hashlib.sha256(scope.encode()).hexdigest()}"
+        self.lock_key = f"{self.cache_key}:lock"
+
+        data = request.data
+        if hasattr(data, "lists"):
+            data = dict(data.lists())
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, default=str)
+        self.fingerprint = hashlib.sha256(body.encode()).hexdigest()
+
+    @classmethod
+    def from_request(cls, request) -> "IdempotentRequest | None":
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return None
+        return cls(request, key)
+
+    def entry(self, response: Response) -> dict | None:
+        if response.status_code >= 500:
+            return None
+        return {
+            "fingerprint": self.fingerprint,
+            "status": response.status_code,
+            "data": response.data,
+        }
+
+    def replay(self, entry: dict) -> Response:
+        if entry["fingerprint"] != self.fingerprint:
+            raise IdempotencyKeyReused()
+        return Response(entry["data"], status=entry["status"], headers={REPLAYED_HEADER: "true"})
+
+
+def idempotent(request, compute: Callable[[], Response]) -> Response:
+    """Return compute(), or the stored response of an earlier request with this key."""
+    idempotent_request = IdempotentRequest.from_request(request)
+    if idempotent_request is None:
+        return compute()
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while True:
+        entry = cache.get(idempotent_request.cache_key)
+        if entry is not None:
+            return idempotent_request.replay(entry)
+        if cache.add(idempotent_request.lock_key, 1, timeout=LOCK_TIMEOUT):
+            break
+        if time.monotonic() > deadline:
+            raise IdempotencyKeyInUse()
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        # Check again: the holder may have stored its response and released
+        # the lock between our cache.get() and cache.add().
+        entry = cache.get(idempotent_request.cache_key)
+        if entry is not None:
+            return idempotent_request.replay(entry)
+        response = compute()
+        entry = idempotent_request.entry(response)
+        if entry is not None:
+            cache.set(idempotent_request.cache_key, entry, timeout=RESPONSE_TIMEOUT)
+        return response
+    finally:
+        cache.delete(idempotent_request.lock_key)
+
+
+async def aidempotent(request, compute: Callable[[], Awaitable[Response]]) -> Response:
+    """Async version of `idempotent()` for async views."""
+    idempotent_request = IdempotentRequest.from_request(request)
+    if idempotent_request is None:
+        return await compute()
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while True:
+        entry = await cache.aget(idempotent_request.cache_key)
+        if entry is not None:
+            return idempotent_request.replay(entry)
+        if await cache.aadd(idempotent_request.lock_key, 1, timeout=LOCK_TIMEOUT):
+            break
+        if time.monotonic() > deadline:
+            raise IdempotencyKeyInUse()
+        await asyncio.sleep(POLL_INTERVAL)
+
+    try:
+        entry = await cache.aget(idempotent_request.cache_key)
+        if entry is not None:
+            return idempotent_request.replay(entry)
+        response = await compute()
+        entry = idempotent_request.entry(response)
+        if entry is not None:
+            await cache.aset(idempotent_request.cache_key, entry, timeout=RESPONSE_TIMEOUT)
+        return response
+    finally:
+        await cache.adelete(idempotent_request.lock_key)
@@ -0,0 +1,252 @@
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Transaction control is not counted: a view's atomic block is a BEGIN in
+# production but a SAVEPOINT inside a test's transaction, and a budget has
+# to mean the same in both.
+TRANSACTION_STATEMENT = re.compile(r"\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.I)
+
+
+class QueryCounter:
+    """Database execute wrapper that counts queries and the time spent in them."""
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not TRANSACTION_STATEMENT.match(sql):
+                self.queries += 1
+            self.seconds += time.perf_counter() - start
+
+
+def get_query_budget(view_func, method: str) -> int | None:
+    """Read the `query_budget` declared on a view class.
+
+    The budget is either a number for every request, or a dict keyed by
+    viewset action ("list", "retrieve", ...) or lowercase HTTP method.
+    """
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+    if not isinstance(budget, dict):
+        return budget
+    method = method.lower()
+    action = (getattr(view_func, "actions", None) or {}).get(method)
+    return budget.get(action, budget.get(method))
+
+
+class RequestMetricsMiddleware:
+    """Measure SQL queries, database time and total time of every request.
+
+    The numbers go out as a `Server-Timing` header and as one JSON log line
+    per request on this module's logger. A request that runs more queries
+    than its view's `query_budget` is logged as a warning, or raises
+    QueryBudgetExceeded when settings.QUERY_BUDGET_ENFORCE is on, as it is
+    in the query budget tests.
+
+    Under ASGI the counter is installed on the connection of the request's
+    thread-sensitive executor, where `sync_to_async` and the async ORM run
+    its queries. Bodies of streaming responses are produced after the
+    headers are sent, so queries made while streaming are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = self.start(request)
+        with ExitStack() as stack:
+            self.install(stack, counter)
+            response = self.get_response(request)
+        return self.finish(request, response, counter)
+
+    async def __acall__(self, request):
+        counter = self.start(request)
+        stack = ExitStack()
+        await sync_to_async(self.install)(stack, counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, counter)
+
+    def start(self, request) -> QueryCounter:
+        request.query_budget = None
+        request.view_name = None
+        return QueryCounter()
+
+    def install(self, stack: ExitStack, counter: QueryCounter) -> None:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+
+    def finish(self, request, response, counter: QueryCounter):
+        total_seconds = time.perf_counter() - counter.started
+
+        timing = (
+            f'db;dur={counter.seconds * 1000:.2f};desc="{counter.queries} queries", '
+            f"total;dur={total_seconds * 1000:.2f}"
+        )
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": request.view_name,
+            "status": response.status_code,
+            "queries": counter.queries,
+            "query_budget": request.query_budget,
+            "db_ms": round(counter.seconds * 1000, 2),
+            "total_ms": round(total_seconds * 1000, 2),
+        }
+        over_budget = request.query_budget is not None and counter.queries > request.query_budget
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps(record),
+            extra={"request_metrics": record},
+        )
+        if over_budget and settings.QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.path} ran {counter.queries} queries, "
+                f"{request.view_name} allows {request.query_budget}."
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs) -> None:
+        view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+        view = view_class or view_func
+        request.view_name = f"{view.__module__}.{view.__qualname__}"
+        request.query_budget = get_query_budget(view_func, request.method)
+
+
+re_accepts_br = re.compile(r"\bbr\b")
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress large API responses with brotli, if installed, or gzip.
+
+    Django's GZipMiddleware, limited to the API's own content types: HTML
+    pages carry CSRF tokens that compression would expose to BREACH.
+    Brotli is preferred when the client accepts it.
+    """
+
+    COMPRESSIBLE_TYPES = (
+        "application/json",
+        "application/msgpack",
+        "application/x-ndjson",
+        "text/csv",
+    )
+    MIN_LENGTH = 1024
+    BROTLI_QUALITY = 4
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.MIN_LENGTH:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if content_type not in self.COMPRESSIBLE_TYPES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is not None and re_accepts_br.search(accept_encoding):
+            encoding = "br"
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = "gzip"
+        else:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response, encoding)
+            # The compressed length is only known once the body is streamed.
+            del response.headers["Content-Length"]
+        else:
+            if encoding == "br":
+                content = brotli.compress(response.content, quality=self.BROTLI_QUALITY)
+            else:
+                content = compress_string(
+                    response.content, max_random_bytes=self.max_random_bytes
+                )
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        # A strong ETag must not be shared by different encodings.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def compress_stream(self, response, encoding: str):
+        # Pull to lexical scope in case streaming_content is set again later.
+        chunks = response.streaming_content
+        if encoding == "gzip" and not response.is_async:
+            return compress_sequence(chunks, max_random_bytes=self.max_random_bytes)
+
+        if encoding == "gzip":
+
+            async def gzip_wrapper():
+                async for chunk in chunks:
+                    yield compress_string(chunk, max_random_bytes=self.max_random_bytes)
+
+            return gzip_wrapper()
+
+        # Flush after every chunk so rows reach the client as they are produced.
+        compressor = brotli.Compressor(quality=self.BROTLI_QUALITY)
+        if response.is_async:
+
+            async def brotli_wrapper():
+                async for chunk in chunks:
+                    yield compressor.process(chunk) + compressor.flush()
+                yield compressor.finish()
+
+            return brotli_wrapper()
+
+        def brotli_sequence():
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+
+        return brotli_sequence()
@@ -0,0 +1,16 @@
+"""Request parsers for the optional MessagePack content type."""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from config.renderers import MessagePackRenderer, msgpack
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except ValueError as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -0,0 +1,65 @@
+"""Faster response renderers.
+
+`ORJSONRenderer` produces the same bytes as DRF's JSONRenderer with orjson
+doing the encoding. Types orjson does not know - Decimal above all, but
+also lazy strings, timedeltas and querysets - go through DRF's own encoder,
+so COERCE_DECIMAL_TO_STRING and friends still apply. `MessagePackRenderer`
+offers the same data as application/msgpack to clients that ask for it.
+
+orjson and msgpack are optional. Without orjson the JSON renderer is DRF's;
+without msgpack the MessagePack renderer is left out of the settings.
+"""
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+
+        ret = orjson.dumps(
+            data,
+            default=_encoder.default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
+        # Like DRF, escape U+2028 and U+2029 so the output is valid JavaScript.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """application/msgpack with the same values as the JSON rendering.
+
+    Decimals, dates and datetimes are packed as the strings JSON has.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_encoder.default, datetime=False)
@@ -10,9 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+from importlib.util import find_spec
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
+from config.caches import check_in_memory, check_shared, parse_cache_url
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,10 +29,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+# "development" (the default) or "production". Production turns off DEBUG and
+# the debug toolbar, keeps database connections open between requests and
+# caches compiled templates.
+DJANGO_ENV = os.getenv("DJANGO_ENV", "development")
+if DJANGO_ENV not in ("development", "production"):
+    raise ImproperlyConfigured(
+        f'DJANGO_ENV must be "development" or "production", not "{DJANGO_ENV}".'
+    )
+PRODUCTION = DJANGO_ENV == "production"
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv("ALLOWED_HOSTS", "").split(",") if host]
 
 INTERNAL_IPS = [
     "127.0.0.1",
@@ -44,7 +58,6 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
-    "debug_toolbar",
     "rest_framework_simplejwt",
     "books",
     "users",
@@ -52,8 +65,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.middleware.RequestMetricsMiddleware",
+    "config.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -62,6 +76,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -80,6 +101,18 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        (
+            "django.template.loaders.cached.Loader",
+            [
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+        ),
+    ]
+
 WSGI_APPLICATION = "config.wsgi.application"
 
 AUTH_USER_MODEL = "users.User"
@@ -87,12 +120,56 @@ AUTH_USER_MODEL = "users.User"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+if os.getenv("POSTGRES_DB"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("POSTGRES_DB"),
+            "USER": os.getenv("POSTGRES_USER", ""),
+            "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+            "HOST": os.getenv("POSTGRES_HOST", ""),
+            "PORT": os.getenv("POSTGRES_PORT", ""),
+        }
+    }
+else:
+    # config.sqlite3 runs the PRAGMAS on every new connection.
+    DATABASES = {
+        "default": {
+            "ENGINE": "config.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "PRAGMAS": {},
+        }
     }
+
+if PRODUCTION:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("CONN_MAX_AGE", "60"))
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    if DATABASES["default"]["ENGINE"] == "config.sqlite3":
+        # WAL lets readers run while a write is in progress, and in WAL mode
+        # synchronous=NORMAL is still safe against corruption while syncing
+        # far less often than the default FULL.
+        DATABASES["default"]["PRAGMAS"] = {"journal_mode": "wal", "synchronous": "normal"}
+
+
+# Caches, see config.caches. Production refuses a cache that other
+# processes cannot see, and has no default CACHE_URL: it must be set to a
+# Redis or memcached server. Idempotency keys default to a table in the
+# database (create it with `manage.py createcachetable`).
+CACHE_URL = os.getenv("CACHE_URL") or ("" if PRODUCTION else "locmem://")
+if PRODUCTION and not CACHE_URL:
+    raise ImproperlyConfigured(
+        "Production needs CACHE_URL, e.g. redis://cache:6379/1 (see config.caches)."
+    )
+IDEMPOTENCY_CACHE_URL = os.getenv("IDEMPOTENCY_CACHE_URL") or (
+    "db://idempotency_cache" if PRODUCTION else "locmem://idempotency"
+)
+CACHES = {
+    "default": parse_cache_url(CACHE_URL),
+    "idempotency": parse_cache_url(IDEMPOTENCY_CACHE_URL, cull=False),
 }
+if PRODUCTION:
+    check_shared(CACHES)
+    check_in_memory(CACHES)
 
 
 # Password validation
@@ -136,9 +213,101 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# With JWT_STATELESS_USER=true requests are authenticated from the access
+# token claims, without loading the User row (see users.authentication).
+JWT_STATELESS_USER = os.getenv("JWT_STATELESS_USER", "false").lower() == "true"
+
+# Token-bucket rate limits (see config.throttling). Buckets are kept in
+# process memory ("local") or, for several processes or nodes, in the
+# default cache ("cache"), which must then be a shared one. The throttles
+# also read THROTTLE_ENABLED per request, so the test runner turns them off.
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "true").lower() == "true"
+THROTTLE_BUCKETS = os.getenv("THROTTLE_BUCKETS", "local")
+if THROTTLE_BUCKETS not in ("local", "cache"):
+    raise ImproperlyConfigured(
+        f'THROTTLE_BUCKETS must be "local" or "cache", not "{THROTTLE_BUCKETS}".'
+    )
+
+# MessagePack (application/msgpack) is offered when msgpack is installed.
+MSGPACK_ENABLED = find_spec("msgpack") is not None
+
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": (
+        "config.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        *(("config.renderers.MessagePackRenderer",) if MSGPACK_ENABLED else ()),
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        *(("config.parsers.MessagePackParser",) if MSGPACK_ENABLED else ()),
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.StatelessJWTAuthentication"
+        if JWT_STATELESS_USER
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZE",
+    # Reverse proxies in front of the API. Clients are identified by the
+    # address the last of them saw in X-Forwarded-For, or with 0 by the
+    # connection's address, so a client cannot pick its own by sending the
+    # header.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TokenObtainPairSerializer",
+    "TOKEN_USER_CLASS": "users.authentication.TokenUser",
+    "DEFAULT_THROTTLE_CLASSES": (
+        (
+            "config.throttling.AnonRateThrottle",
+            "config.throttling.UserRateThrottle",
+            "config.throttling.ScopedRateThrottle",
+        )
+        if THROTTLE_ENABLED
+        else ()
+    ),
+    # "anon" is per IP address and "user" per user; the others are
+    # per-endpoint scopes (a view's throttle_scope), per user or IP address.
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "120/min",
+        "user": "1200/min",
+        "books": "300/min",
+        "token": "10/min",
+    },
+    "THROTTLE_BUCKETS": (
+        "config.throttling.CacheBuckets"
+        if THROTTLE_BUCKETS == "cache"
+        else "config.throttling.LocalBuckets"
+    ),
+}
+
+# Overdue days are charged at daily_fee times this multiplier.
+BORROWING_FINE_MULTIPLIER = os.getenv("BORROWING_FINE_MULTIPLIER", "2")
+
+# Route the busiest borrowing endpoints to their async views
+# (borrowings.async_views). Only worth turning on under an ASGI server.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "false").lower() == "true"
+
+# Raise instead of logging a warning when a request runs more SQL queries
+# than its view's `query_budget` (see config.middleware). The test runner
+# always enforces budgets.
+QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "false").lower() == "true"
+
+# One JSON line per request from config.middleware, on stderr. Set
+# REQUEST_LOG_LEVEL=WARNING to keep only requests over their query budget.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"message": {"format": "%(message)s"}},
+    "handlers": {
+        "request_metrics": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "config.middleware": {
+            "handlers": ["request_metrics"],
+            "level": os.getenv("REQUEST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
 }
+
+TEST_RUNNER = "config.test_runner.TestRunner"
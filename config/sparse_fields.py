@@ -0,0 +1,136 @@
+"""Sparse fieldsets (`?fields=`) and relation expansion (`?expand=`).
+
+`?fields=id,book` keeps only the listed fields of each object and
+`?expand=book,user` renders the listed relations as nested objects instead
+of ids. The query follows the selection: only the selected columns are
+loaded, and related tables are joined only for the relations in the output.
+"""
+from functools import lru_cache
+
+from django.db.models import QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import Serializer
+
+from config.field_plans import FieldPlan, compile_field_plan
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+class SparseFieldsSerializerMixin:
+    """Accept `fields` and `expand` to trim the output and nest relations.
+
+    `Meta.expandable` maps a field name to the serializer that replaces the
+    field, in the same position, when it is expanded.
+    """
+
+    def __init__(
+        self,
+        *args,
+        fields: tuple[str, ...] | None = None,
+        expand: tuple[str, ...] = (),
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        expandable = getattr(self.Meta, "expandable", {})
+        for name in expand:
+            self.fields[name] = expandable[name](read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+@lru_cache
+def readable_fields(serializer_class: type[Serializer]) -> frozenset[str]:
+    return frozenset(
+        name for name, field in serializer_class().fields.items() if not field.write_only
+    )
+
+
+@lru_cache
+def compile_query_plan(
+    serializer_class: type[Serializer], **selection
+) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """Return the relations to select_related() and the columns to load."""
+    model = serializer_class.Meta.model
+    columns = {field.name for field in model._meta.concrete_fields}
+    related, only = [], []
+    for field in serializer_class(**selection).fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, Serializer):
+            related_columns = {f.name for f in field.Meta.model._meta.concrete_fields}
+            related.append(field.source)
+            only.extend(
+                f"{field.source}__{nested.source}"
+                for nested in field.fields.values()
+                if not nested.write_only and nested.source in related_columns
+            )
+        elif "." in field.source:
+            relation, column = field.source.split(".", 1)
+            related.append(relation)
+            only.append(f"{relation}__{column}")
+        elif field.source in columns:
+            only.append(field.source)
+        # Anything else (annotations, methods) is left to the queryset.
+    return tuple(dict.fromkeys(related)), tuple(dict.fromkeys(only)) or ("pk",)
+
+
+def _parse_names(value: str) -> tuple[str, ...]:
+    return tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+
+
+class SparseFieldsMixin:
+    """Honour `?fields=` and `?expand=` on reads of a SparseFieldsSerializerMixin.
+
+    Unknown names are rejected with a 400. Writes are not affected.
+    """
+
+    def get_field_selection(self) -> dict | None:
+        if self.request.method not in SAFE_METHODS:
+            return None
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsSerializerMixin):
+            return None
+
+        params = self.request.query_params
+        selection = {}
+        if FIELDS_PARAM in params:
+            fields = _parse_names(params[FIELDS_PARAM])
+            unknown = sorted(set(fields) - readable_fields(serializer_class))
+            if unknown:
+                raise ValidationError({FIELDS_PARAM: f"Unknown fields: {unknown}."})
+            # Output follows the serializer's field order, so sort the names
+            # to share compiled plans between equivalent requests.
+            selection["fields"] = tuple(sorted(fields))
+
+        expand = _parse_names(params.get(EXPAND_PARAM, ""))
+        expandable = getattr(serializer_class.Meta, "expandable", {})
+        unknown = sorted(set(expand) - set(expandable))
+        if unknown:
+            raise ValidationError(
+                {EXPAND_PARAM: f"Cannot expand {unknown}; choose from {sorted(expandable)}."}
+            )
+        if expand:
+            selection["expand"] = tuple(sorted(expand))
+        return selection
+
+    def get_serializer(self, *args, **kwargs) -> Serializer:
+        selection = self.get_field_selection() or {}
+        return super().get_serializer(*args, **selection, **kwargs)
+
+    def get_field_plan(self) -> FieldPlan:
+        selection = self.get_field_selection() or {}
+        return compile_field_plan(self.get_serializer_class(), **selection)
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        selection = self.get_field_selection()
+        if selection is None:
+            return queryset
+
+        related, only = compile_query_plan(self.get_serializer_class(), **selection)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
@@ -0,0 +1,14 @@
+"""SQLite backend that applies PRAGMA statements to every new connection.
+
+Used as ``"ENGINE": "config.sqlite3"`` with a ``"PRAGMAS"`` dict next to
+``NAME`` in the database settings, e.g. ``{"journal_mode": "wal"}``.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get("PRAGMAS", {}).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
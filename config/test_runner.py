@@ -0,0 +1,31 @@
+import logging
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner of `manage.py test`, with settings meant for the suite.
+
+    Query budgets are enforced, so a request over its view's budget fails
+    its test instead of only logging a warning. Rate limits are off: the
+    test client sends every request from 127.0.0.1, so the suite would trip
+    the per-IP limits. Tests of the throttles turn THROTTLE_ENABLED back on.
+    Request metrics are logged from WARNING up, so the output shows only
+    the requests that went over budget.
+    """
+
+    settings_overrides = {"QUERY_BUDGET_ENFORCE": True, "THROTTLE_ENABLED": False}
+
+    def setup_test_environment(self, **kwargs) -> None:
+        super().setup_test_environment(**kwargs)
+        self.overridden_settings = override_settings(**self.settings_overrides)
+        self.overridden_settings.enable()
+        self.request_logger = logging.getLogger("config.middleware")
+        self.request_log_level = self.request_logger.level
+        self.request_logger.setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        self.request_logger.setLevel(self.request_log_level)
+        self.overridden_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,157 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from config.caches import check_in_memory, check_shared, parse_cache_url
+from config.sqlite3.base import DatabaseWrapper
+
+
+def import_settings(**env) -> subprocess.CompletedProcess:
+    """Import config.settings in a fresh interpreter with `env` set.
+
+    The default cache's backend is printed on stdout.
+    """
+    return subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from config import settings; print(settings.CACHES['default']['BACKEND'])",
+        ],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "SECRET_KEY": "x", **env},
+        capture_output=True,
+        text=True,
+    )
+
+
+class CacheSettingsTest(SimpleTestCase):
+    def test_parse_cache_url(self) -> None:
+        self.assertEqual(
+            parse_cache_url("db://django_cache"),
+            {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "django_cache",
+            },
+        )
+        self.assertEqual(
+            parse_cache_url("redis://cache:6379/1")["LOCATION"], "redis://cache:6379/1"
+        )
+        self.assertEqual(
+            parse_cache_url("locmem://")["BACKEND"],
+            "django.core.cache.backends.locmem.LocMemCache",
+        )
+        self.assertEqual(
+            parse_cache_url("memcached://cache:11211"),
+            {
+                "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+                "LOCATION": "cache:11211",
+            },
+        )
+        for url in ("memcache://cache:11211", "db://"):
+            with self.subTest(url=url), self.assertRaises(ImproperlyConfigured):
+                parse_cache_url(url)
+
+    def test_only_shared_caches_pass(self) -> None:
+        check_shared({"default": parse_cache_url("db://django_cache")})
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "['default']"):
+            check_shared({"default": parse_cache_url("locmem://")})
+
+    def test_uncapped_cache(self) -> None:
+        self.assertEqual(
+            parse_cache_url("locmem://idempotency", cull=False)["OPTIONS"],
+            {"MAX_ENTRIES": sys.maxsize},
+        )
+        self.assertNotIn("OPTIONS", parse_cache_url("redis://localhost:6379/1", cull=False))
+        with self.assertRaisesMessage(ImproperlyConfigured, "evicts entries when full"):
+            parse_cache_url("memcached://cache:11211", cull=False)
+
+    def test_only_memory_caches_pass_as_default(self) -> None:
+        for url in ("redis://cache:6379/1", "memcached://cache:11211"):
+            check_in_memory({"default": parse_cache_url(url)})
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "redis:// or memcached://"):
+            check_in_memory({"default": parse_cache_url("db://django_cache")})
+
+    def test_production_refuses_a_process_local_cache(self) -> None:
+        result = import_settings(DJANGO_ENV="production", CACHE_URL="locmem://")
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("not shared between processes", result.stderr)
+
+        result = import_settings(DJANGO_ENV="production", CACHE_URL="redis://cache:6379/1")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        result = import_settings(
+            DJANGO_ENV="production",
+            CACHE_URL="redis://cache:6379/1",
+            IDEMPOTENCY_CACHE_URL="locmem://",
+        )
+        self.assertIn("['idempotency']", result.stderr)
+
+    def test_production_needs_a_memory_cache(self) -> None:
+        result = import_settings(DJANGO_ENV="production", CACHE_URL="")
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("Production needs CACHE_URL", result.stderr)
+
+        result = import_settings(DJANGO_ENV="production", CACHE_URL="db://django_cache")
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("redis:// or memcached://", result.stderr)
+
+        result = import_settings(DJANGO_ENV="production", CACHE_URL="memcached://cache:11211")
+        self.assertEqual(
+            result.stdout.strip(), "django.core.cache.backends.memcached.PyMemcacheCache"
+        )
+
+        result = import_settings(DJANGO_ENV="development", CACHE_URL="")
+        self.assertEqual(
+            result.stdout.strip(), "django.core.cache.backends.locmem.LocMemCache"
+        )
+
+
+class TestRunnerTest(SimpleTestCase):
+    def test_query_budgets_are_enforced(self) -> None:
+        self.assertIs(settings.QUERY_BUDGET_ENFORCE, True)
+
+    def test_rate_limits_are_off(self) -> None:
+        self.assertIs(settings.THROTTLE_ENABLED, False)
+
+    def test_request_metrics_are_logged_from_warning_up(self) -> None:
+        logger = logging.getLogger("config.middleware")
+
+        self.assertEqual(logger.level, logging.WARNING)
+        self.assertEqual(
+            [handler.formatter._fmt for handler in logger.handlers], ["%(message)s"]
+        )
+
+
+class SqlitePragmaBackendTest(TestCase):
+    def test_pragmas_run_on_every_new_connection(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper(
+                {
+                    **connection.settings_dict,
+                    "NAME": str(Path(directory) / "pragmas.sqlite3"),
+                    "PRAGMAS": {"journal_mode": "wal", "synchronous": "normal"},
+                },
+                alias="pragmas",
+            )
+            try:
+                for _ in range(2):
+                    with wrapper.cursor() as cursor:
+                        cursor.execute("PRAGMA journal_mode")
+                        self.assertEqual(cursor.fetchone()[0], "wal")
+                        cursor.execute("PRAGMA synchronous")
+                        self.assertEqual(cursor.fetchone()[0], 1)
+                    wrapper.close()
+            finally:
+                wrapper.close()
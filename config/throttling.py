@@ -0,0 +1,184 @@
+"""Token-bucket rate limits for the API.
+
+Drop-in replacements for DRF's anon, user and scoped throttles. DRF's own
+throttles keep every request timestamp of the last period per client, so
+each request reads and writes a list as long as the rate. A token bucket
+keeps two numbers per client: a client may burst up to the rate's request
+count and gets tokens back continuously, count / period per second.
+
+The buckets live in the store named by REST_FRAMEWORK["THROTTLE_BUCKETS"].
+`LocalBuckets` keeps them in process memory and is the cheapest, but every
+process enforces the limit on its own. `CacheBuckets` keeps them in the
+default cache, which must then be shared by all processes and nodes.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+from rest_framework.settings import api_settings
+
+DEFAULT_BUCKETS = "config.throttling.LocalBuckets"
+
+
+def take_token(
+    tokens: float, updated: float, capacity: int, period: int, now: float
+) -> tuple[float, float]:
+    """Refill a bucket up to `now` and take a token from it.
+
+    Return the tokens left and 0.0, or, if the bucket is empty, its tokens
+    and the seconds until the next token.
+    """
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) * period / capacity
+
+
+def seconds_until_full(tokens: float, capacity: int, period: int) -> float:
+    return (capacity - tokens) * period / capacity
+
+
+class LocalBuckets:
+    """Buckets in this process's memory.
+
+    A bucket that has refilled completely is the same as no bucket, so once
+    the store reaches `prune_at` keys the full ones are dropped. The store
+    never grows past MAX_BUCKETS: when clients keep more buckets than that
+    busy, the least recently used half is forgotten, which can only let
+    their next requests through early.
+    """
+
+    PRUNE_AT = 10_000
+    MAX_BUCKETS = 100_000
+
+    def __init__(self) -> None:
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.prune_at = self.PRUNE_AT
+
+    def take(self, key: str, capacity: int, period: int, now: float) -> float:
+        with self.lock:
+            # Popping and re-inserting keeps the dict in least recently used order.
+            tokens, updated, _ = self.buckets.pop(key, (capacity, now, now))
+            tokens, wait = take_token(tokens, updated, capacity, period, now)
+            self.buckets[key] = (tokens, now, now + seconds_until_full(tokens, capacity, period))
+            if len(self.buckets) >= self.prune_at:
+                self.prune(now)
+            return wait
+
+    def prune(self, now: float) -> None:
+        buckets = [(key, bucket) for key, bucket in self.buckets.items() if bucket[2] > now]
+        self.buckets = dict(buckets[-(self.MAX_BUCKETS // 2):])
+        self.prune_at = min(self.MAX_BUCKETS, max(self.PRUNE_AT, 2 * len(self.buckets)))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBuckets:
+    """Buckets in the default cache, shared by every process using it.
+
+    A bucket expires when it would be full again. The read and the write
+    are not atomic, so concurrent requests of one client on different
+    processes can each take the last token: a burst may let a few extra
+    requests through, but no request is refused that should not be.
+
+    The buckets are stored under the cache version kept at VERSION_KEY, so
+    `clear()` bumps it instead of clearing a cache other code also uses.
+    Buckets of older versions are never read again and expire on their own.
+    Each process rereads the version every VERSION_TTL seconds rather than
+    on every request, so other processes see a clear within that time.
+    """
+
+    VERSION_KEY = "throttle:buckets:version"
+    VERSION_TTL = 1.0
+
+    def __init__(self) -> None:
+        self.cached_version = None
+        self.version_read_at = 0.0
+
+    def version(self) -> int:
+        now = time.monotonic()
+        if self.cached_version is None or now - self.version_read_at >= self.VERSION_TTL:
+            self.cached_version = cache.get_or_set(self.VERSION_KEY, 1, timeout=None)
+            self.version_read_at = now
+        return self.cached_version
+
+    def take(self, key: str, capacity: int, period: int, now: float) -> float:
+        version = self.version()
+        tokens, updated = cache.get(key, (capacity, now), version=version)
+        tokens, wait = take_token(tokens, updated, capacity, period, now)
+        timeout = math.ceil(seconds_until_full(tokens, capacity, period))
+        cache.set(key, (tokens, now), timeout=max(timeout, 1), version=version)
+        return wait
+
+    def clear(self) -> None:
+        try:
+            self.cached_version = cache.incr(self.VERSION_KEY)
+        except ValueError:
+            self.cached_version = 2
+            cache.set(self.VERSION_KEY, self.cached_version, timeout=None)
+        self.version_read_at = time.monotonic()
+
+
+_buckets = {}
+
+
+def get_buckets() -> LocalBuckets | CacheBuckets:
+    path = getattr(settings, "REST_FRAMEWORK", {}).get("THROTTLE_BUCKETS", DEFAULT_BUCKETS)
+    if path not in _buckets:
+        _buckets[path] = import_string(path)()
+    return _buckets[path]
+
+
+class TokenBucketThrottleMixin:
+    """Take a token from the client's bucket instead of logging the request."""
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+    timer = staticmethod(time.time)
+
+    @property
+    def THROTTLE_RATES(self) -> dict:
+        # DRF reads the rates once at import; read them per request so
+        # settings overrides apply.
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def allow_request(self, request, view) -> bool:
+        if self.rate is None or not settings.THROTTLE_ENABLED:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.delay = get_buckets().take(key, self.num_requests, self.duration, self.timer())
+        return not self.delay
+
+    def wait(self) -> float:
+        return self.delay
+
+
+class AnonRateThrottle(TokenBucketThrottleMixin, throttling.AnonRateThrottle):
+    """Limit anonymous requests per IP address (scope "anon")."""
+
+
+class UserRateThrottle(TokenBucketThrottleMixin, throttling.UserRateThrottle):
+    """Limit requests per user, or per IP address if anonymous (scope "user")."""
+
+
+class ScopedRateThrottle(TokenBucketThrottleMixin, throttling.ScopedRateThrottle):
+    """Limit requests per user or IP address to views with a `throttle_scope`."""
+
+    def allow_request(self, request, view) -> bool:
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import models
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+# Both caches are cleared when a user is saved or deleted (see users.signals).
+# Revoking a token relies on that, so the default cache has to be shared by
+# every process, as production settings require (see config.caches).
+# Updates that bypass save(), such as QuerySet.update(), are not seen before
+# the timeout runs out.
+TOKEN_STATE_TIMEOUT = 60
+USER_CACHE_TIMEOUT = 60
+
+
+def token_state_key(user_id) -> str:
+    return f"users:token-state:{user_id}"
+
+
+def user_cache_key(user_id) -> str:
+    return f"users:user:{user_id}"
+
+
+def forget_user(user_id) -> None:
+    cache.delete_many([token_state_key(user_id), user_cache_key(user_id)])
+
+
+def get_token_state(token_user: "TokenUser") -> tuple[bool, bool] | None:
+    """Return (is_active, is_staff) of a token's user, or None if it does not exist.
+
+    A miss loads the whole user, keeps it on `token_user` and caches it, so
+    a view that needs the full user does not query it a second time.
+    """
+    key = token_state_key(token_user.id)
+    state = cache.get(key)
+    if state is None:
+        user = get_user_model().objects.filter(pk=token_user.id).first()
+        state = (user.is_active, user.is_staff) if user else ()
+        cache.set(key, state, TOKEN_STATE_TIMEOUT)
+        if user:
+            cache.set(user_cache_key(token_user.id), user, USER_CACHE_TIMEOUT)
+            token_user.full_user = user
+    return tuple(state) or None
+
+
+class TokenUser(models.TokenUser):
+    """User built from the claims of an access token."""
+
+    # The User row, when authentication had to load it for this request.
+    full_user = None
+
+    @cached_property
+    def id(self) -> int:
+        # Tokens carry the id as a string, which never equals a user_id.
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self) -> str:
+        return self.token.get("email", "")
+
+    def get_username(self) -> str:
+        return self.email
+
+
+def get_full_user(user, cached: bool = True):
+    """Return the User model instance behind `request.user`.
+
+    A TokenUser is loaded from the database, through a cache kept for
+    USER_CACHE_TIMEOUT seconds unless `cached` is False. Pass False before
+    modifying and saving the user. A row loaded while authenticating this
+    request is returned either way.
+    """
+    if not isinstance(user, models.TokenUser):
+        return user
+    if getattr(user, "full_user", None) is not None:
+        return user.full_user
+    if not cached:
+        return get_user_model().objects.get(pk=user.id)
+
+    key = user_cache_key(user.id)
+    full_user = cache.get(key)
+    if full_user is None:
+        full_user = get_user_model().objects.get(pk=user.id)
+        cache.set(key, full_user, USER_CACHE_TIMEOUT)
+    return full_user
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that reads the user from the token claims.
+
+    Instead of loading the User row on every request it checks the cached
+    active and staff flags of the user. A token whose `is_staff` claim no
+    longer matches is rejected, so a change of staff status revokes the
+    tokens issued before it.
+    """
+
+    def get_user(self, validated_token) -> TokenUser:
+        user = super().get_user(validated_token)
+
+        state = get_token_state(user)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        is_active, is_staff = state
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if is_staff != user.is_staff:
+            raise AuthenticationFailed(
+                _("The user's staff status has changed."), code="staff_status_changed"
+            )
+
+        return user
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_alter_user_managers_remove_user_username_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="telegram_chat_id",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
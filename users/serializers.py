@@ -1,12 +1,21 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
 
 
 class UserSerializer(serializers.ModelSerializer):
 
 	class Meta:
 		model = get_user_model()
-		fields = ("id", "email", "password", "first_name", "last_name", "is_staff")
+		fields = (
+			"id",
+			"email",
+			"password",
+			"first_name",
+			"last_name",
+			"telegram_chat_id",
+			"is_staff",
+		)
 		read_only_fields = ("id", "is_staff")
 		extra_kwargs = {"password": {"write_only": True, "min_length": 5}}
 
@@ -15,10 +24,18 @@ class UserSerializer(serializers.ModelSerializer):
 
 	def update(self, instance, validated_data):
 		password = validated_data.pop("password", None)
-		user = super().update(instance, validated_data)
-
 		if password:
-			user.set_password(password)
-			user.save()
+			instance.set_password(password)
+
+		return super().update(instance, validated_data)
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+	"""Add the claims users.authentication.TokenUser is built from."""
 
-		return user
+	@classmethod
+	def get_token(cls, user):
+		token = super().get_token(user)
+		token["email"] = user.email
+		token["is_staff"] = user.is_staff
+		return token
@@ -1,11 +1,27 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework.test import APIClient
+from rest_framework.views import APIView
 from rest_framework import status
-
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from books.models import Book
+from borrowings.models import Borrowing
+from config.throttling import AnonRateThrottle, ScopedRateThrottle, get_buckets
+from users.authentication import StatelessJWTAuthentication, TokenUser
 from users.models import User
+from users.serializers import TokenObtainPairSerializer
 
 
 CREATE_USER_URL = reverse("users:create")
@@ -126,6 +142,7 @@ class PrivateUserApiTests(TestCase):
                 "is_staff": self.user.is_staff,
                 "first_name": self.user.first_name,
                 "last_name": self.user.last_name,
+                "telegram_chat_id": "",
             },
         )
 
@@ -143,3 +160,174 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.email, payload["email"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_set_telegram_chat_id(self) -> None:
+        res = self.client.patch(ME_URL, {"telegram_chat_id": "4242"})
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.telegram_chat_id, "4242")
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+            "token": "2/min",
+        },
+    },
+)
+@mock.patch.object(APIView, "throttle_classes", [AnonRateThrottle, ScopedRateThrottle])
+class TokenThrottleTests(TestCase):
+    def setUp(self) -> None:
+        get_buckets().clear()
+        self.client = APIClient()
+        create_user(email="test@test.com", password="Testpass123@")
+
+    def test_token_endpoint_is_limited_per_ip_address(self) -> None:
+        payload = {"email": "test@test.com", "password": "wrong"}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        payload["password"] = "Testpass123@"
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn("access", res.data)
+
+        res = self.client.post(TOKEN_URL, payload, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class UserQueryBudgetTests(TestCase):
+    authentication_class = JWTAuthentication
+
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock.patch.object(
+            APIView, "authentication_classes", [self.authentication_class]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_create_and_manage_user(self) -> None:
+        client = APIClient()
+        payload = {"email": "test@test.com", "password": "Testpassword123@"}
+        res = client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        user = get_user_model().objects.get(email=payload["email"])
+        token = TokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(**{jwt_settings.AUTH_HEADER_NAME: f"Bearer {token}"})
+        requests = [
+            ("get", {}),
+            ("put", payload),
+            ("patch", {"first_name": "Test"}),
+            ("patch", {"email": "new@test.com", "password": "Newpassword123@"}),
+        ]
+        for method, data in requests:
+            with self.subTest(method=method, data=data):
+                res = getattr(client, method)(ME_URL, data)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertIsNotNone(res.wsgi_request.query_budget)
+                self.assertIs(
+                    type(res.renderer_context["request"].successful_authenticator),
+                    self.authentication_class,
+                )
+
+
+class StatelessUserQueryBudgetTests(UserQueryBudgetTests):
+    authentication_class = StatelessJWTAuthentication
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock.patch.object(
+            APIView, "authentication_classes", [StatelessJWTAuthentication]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.user = create_user(email="staff@test.com", password="test123@", is_staff=True)
+        self.login()
+
+    def login(self) -> None:
+        res = self.client.post(TOKEN_URL, {"email": "staff@test.com", "password": "test123@"})
+        self.client.credentials(
+            **{jwt_settings.AUTH_HEADER_NAME: f"Bearer {res.data['access']}"}
+        )
+        self.token = AccessToken(res.data["access"])
+
+    def test_token_carries_user_claims(self) -> None:
+        self.assertEqual(self.token["email"], "staff@test.com")
+        self.assertIs(self.token["is_staff"], True)
+
+        res = self.client.get(reverse("borrowings:borrowing-list-create"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.wsgi_request.user, TokenUser)
+        self.assertEqual(res.wsgi_request.user.email, "staff@test.com")
+
+    def test_saves_the_user_query(self) -> None:
+        url = reverse("borrowings:borrowing-list-create")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as stateless:
+            self.client.get(url)
+
+        with mock.patch.object(APIView, "authentication_classes", [JWTAuthentication]):
+            with CaptureQueriesContext(connection) as loaded:
+                self.client.get(url)
+
+        self.assertEqual(len(stateless), len(loaded) - 1)
+
+    def test_staff_change_revokes_token(self) -> None:
+        url = reverse("borrowings:book-circulation-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user.is_staff = False
+        self.user.save()
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.data["code"], "staff_status_changed")
+
+        self.login()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+    def test_inactive_or_deleted_user_is_rejected(self) -> None:
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.delete()
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_reads_cached_user_and_sees_updates(self) -> None:
+        self.client.get(ME_URL)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(res.data["email"], "staff@test.com")
+
+        res = self.client.patch(ME_URL, {"first_name": "Ada"})
+        self.assertEqual(res.data["first_name"], "Ada")
+        self.assertEqual(self.client.get(ME_URL).data["first_name"], "Ada")
+
+    def test_checkout_with_token_user(self) -> None:
+        book = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=1, daily_fee=1
+        )
+        res = self.client.post(
+            reverse("borrowings:borrowing-list-create"),
+            {"book": book.id, "expected_return_date": date.today() + timedelta(days=16)},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Borrowing.objects.get().user, self.user)
@@ -1,16 +1,25 @@
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from users.authentication import get_full_user
 from users.serializers import UserSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
 	serializer_class = UserSerializer
+	query_budget = 2
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView): 
 	serializer_class = UserSerializer
 	permission_classes = [IsAuthenticated]
+	query_budget = {"get": 1, "put": 3, "patch": 3}
 
 	def get_object(self):
-		return self.request.user
+		return get_full_user(self.request.user, cached=self.request.method in SAFE_METHODS)
+
+
+class TokenObtainView(TokenObtainPairView):
+	# Per IP address: a stricter limit than "anon" against password guessing.
+	throttle_scope = "token"